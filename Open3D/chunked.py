@@ -0,0 +1,258 @@
+"""
+Out-of-core variant of the sample → clip → gradient steps for point counts
+that do not fit in memory.
+
+Points are sampled area-weighted from the combined mesh straight into a
+memory-mapped .npy file, and clipping, the min/max extremes and both gradient
+colorings stream over fixed-size chunks in a thread pool (NumPy releases the
+GIL for the per-chunk work). Memory stays bounded by chunk size × workers
+regardless of the point count.
+
+Sampling is seeded per block of BLOCK points, so the sampled cloud depends
+only on the seed and the point count — not on the chunk size or the number of
+workers — and the in-memory path (pipeline.py's sample stage with
+sampler="area", which calls the same sampler, then its clip/gradient stages)
+gives identical results; `--verify` checks that.
+
+    python chunked.py --points 20000000 --out .cache/chunked
+    python chunked.py --verify
+    python chunked.py --benchmark 100000 1000000 10000000
+"""
+
+import argparse
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import mesh_loader
+import pipeline
+
+BLOCK = 1 << 16          # points per RNG block
+CHUNK = 16 * BLOCK       # points per processing chunk (~25 MB of float64 xyz)
+OUT_DIR = os.path.join(mesh_loader.CACHE_DIR, "chunked")
+
+# ---------------- SAMPLING ----------------
+def triangle_areas(vertices, triangles):
+    a = vertices[triangles[:, 0]]
+    b = vertices[triangles[:, 1]]
+    c = vertices[triangles[:, 2]]
+    return 0.5 * np.linalg.norm(np.cross(b - a, c - a), axis=1)
+
+def sample_block(vertices, triangles, cum_areas, block, n, seed):
+    """`n` area-weighted points of block number `block`, from its own RNG stream."""
+    rng = np.random.default_rng([seed, block])
+    picks = np.searchsorted(cum_areas, rng.random(n) * cum_areas[-1], side="right")
+    picks = np.minimum(picks, len(triangles) - 1)
+    r1 = np.sqrt(rng.random(n))
+    r2 = rng.random(n)
+    tri = triangles[picks]
+    a, b, c = vertices[tri[:, 0]], vertices[tri[:, 1]], vertices[tri[:, 2]]
+    return ((1 - r1)[:, None] * a + (r1 * (1 - r2))[:, None] * b + (r1 * r2)[:, None] * c)
+
+def chunk_bounds(n, chunk=CHUNK):
+    return [(start, min(start + chunk, n)) for start in range(0, n, chunk)]
+
+def sample_points(vertices, triangles, n, out, seed=0, chunk=CHUNK, workers=None):
+    """Fill `out` ((n, 3) array or memmap) with `n` area-weighted samples of the mesh."""
+    cum_areas = np.cumsum(triangle_areas(vertices, triangles))
+
+    def fill(bounds):
+        start, stop = bounds
+        for block_start in range(start, stop, BLOCK):
+            block_stop = min(block_start + BLOCK, stop)
+            out[block_start:block_stop] = sample_block(vertices, triangles, cum_areas,
+                                                       block_start // BLOCK, block_stop - block_start, seed)
+
+    # chunks are whole blocks, so the block → RNG stream mapping never depends on `chunk`
+    chunk = max(BLOCK, chunk - chunk % BLOCK)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fill, chunk_bounds(n, chunk)))
+    return out
+
+# ---------------- STREAMING OPERATIONS ----------------
+def open_output(path, shape, dtype=np.float64):
+    if path is None:
+        return np.empty(shape, dtype=dtype)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+def clip(points, axis, threshold, out_path=None, chunk=CHUNK, workers=None):
+    """points[points[:, axis] > threshold], in two streaming passes (count, then copy to offsets)."""
+    bounds = chunk_bounds(len(points), chunk)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        counts = list(pool.map(lambda b: int(np.count_nonzero(points[b[0]:b[1], axis] > threshold)), bounds))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        out = open_output(out_path, (int(offsets[-1]), 3))
+
+        def copy(i):
+            part = points[bounds[i][0]:bounds[i][1]]
+            out[offsets[i]:offsets[i + 1]] = part[part[:, axis] > threshold]
+
+        list(pool.map(copy, range(len(bounds))))
+    return out
+
+def extremes(points, chunk=CHUNK, workers=None):
+    """Per-axis (min, max, argmin, argmax) over all points; ties resolve to the first index like np.argmin."""
+    bounds = chunk_bounds(len(points), chunk)
+
+    def scan(b):
+        part = points[b[0]:b[1]]
+        lo, hi = part.argmin(axis=0), part.argmax(axis=0)
+        axes = np.arange(3)
+        return part[lo, axes], part[hi, axes], lo + b[0], hi + b[0]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(scan, bounds))
+    low, high, argmin, argmax = (np.array(x, dtype=float) for x in results[0])
+    argmin, argmax = argmin.astype(np.int64), argmax.astype(np.int64)
+    for lo, hi, lo_idx, hi_idx in results[1:]:
+        # strict comparisons keep the earlier chunk on ties
+        better_lo, better_hi = lo < low, hi > high
+        low[better_lo], argmin[better_lo] = lo[better_lo], lo_idx[better_lo]
+        high[better_hi], argmax[better_hi] = hi[better_hi], hi_idx[better_hi]
+    return low, high, argmin, argmax
+
+def gradient_colors(points, axis, low, high, out_path=None, chunk=CHUNK, workers=None):
+    """Step 7.1 coloring: t along `axis` → (t, 0, 1 - t)."""
+    out = open_output(out_path, (len(points), 3))
+    span = high[axis] - low[axis]
+
+    def color(b):
+        t = (points[b[0]:b[1], axis] - low[axis]) / span
+        out[b[0]:b[1], 0] = t
+        out[b[0]:b[1], 1] = 0.0
+        out[b[0]:b[1], 2] = 1 - t
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(color, chunk_bounds(len(points), chunk)))
+    return out
+
+def full_gradient_colors(points, low, high, out_path=None, chunk=CHUNK, workers=None):
+    """Step 7.2 coloring: x/y/z normalized to r/g/b."""
+    out = open_output(out_path, (len(points), 3))
+
+    def color(b):
+        out[b[0]:b[1]] = (points[b[0]:b[1]] - low) / (high - low)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(color, chunk_bounds(len(points), chunk)))
+    return out
+
+# ---------------- END TO END ----------------
+def run_chunked(vertices, triangles, n, out_dir=None, seed=0, chunk=CHUNK, workers=None,
+                clip_params=None, gradient_params=None, full_gradient_params=None):
+    """
+    sample → clip → gradient and sample → full_gradient, with every array a
+    memmap under `out_dir` (or plain arrays when `out_dir` is None). Parameters
+    default to pipeline.py's stage parameters.
+    """
+    clip_params = {**pipeline.STAGES["clip"].params, **(clip_params or {})}
+    gradient_params = {**pipeline.STAGES["gradient"].params, **(gradient_params or {})}
+    full_gradient_params = {**pipeline.STAGES["full_gradient"].params, **(full_gradient_params or {})}
+    path = (lambda name: os.path.join(out_dir, f"{name}.npy")) if out_dir else (lambda name: None)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    timings = {}
+
+    start = time.perf_counter()
+    points = sample_points(vertices, triangles, n, open_output(path("points"), (n, 3)), seed, chunk, workers)
+    timings["sample"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    clipped = clip(points, clip_params["axis"], clip_params["threshold"], path("clipped"), chunk, workers)
+    timings["clip"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    axis = gradient_params["axis"]
+    low, high, argmin, argmax = extremes(clipped, chunk, workers)
+    gradient = {
+        "points": clipped,
+        "colors": gradient_colors(clipped, axis, low, high, path("clipped_colors"), chunk, workers),
+        "min_point": np.array(clipped[argmin[axis]]),
+        "max_point": np.array(clipped[argmax[axis]]),
+    }
+    timings["gradient"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    axis = full_gradient_params["axis"]
+    low, high, argmin, argmax = extremes(points, chunk, workers)
+    full_gradient = {
+        "points": points,
+        "colors": full_gradient_colors(points, low, high, path("colors"), chunk, workers),
+        "min_point": np.array(points[argmin[axis]]),
+        "max_point": np.array(points[argmax[axis]]),
+    }
+    timings["full_gradient"] = time.perf_counter() - start
+
+    for arr in (points, clipped, gradient["colors"], full_gradient["colors"]):
+        if isinstance(arr, np.memmap):
+            arr.flush()
+    return gradient, full_gradient, timings
+
+def run_in_memory(vertices, triangles, n, seed=0):
+    """The reference path: pipeline.py's sample (sampler="area"), clip, gradient and full_gradient stages."""
+    runner = pipeline.Pipeline({"sample": {"sampler": "area", "number_of_points": n, "seed": seed}},
+                               use_cache=False, verbose=False)
+    runner.results["combined"] = {"vertices": vertices, "triangles": triangles}
+    return runner.run("gradient"), runner.run("full_gradient")
+
+def verify(vertices, triangles, sizes=(1000, 100000, 300000), out_dir=OUT_DIR):
+    """Chunked (small chunks, memmaps) vs in-memory results must be identical."""
+    ok = True
+    for n in sizes:
+        expected = run_in_memory(vertices, triangles, n)
+        actual = run_chunked(vertices, triangles, n, out_dir=os.path.join(out_dir, "verify"),
+                             chunk=BLOCK, workers=4)[:2]
+        for name, exp, act in zip(("gradient", "full_gradient"), expected, actual):
+            same = all(np.array_equal(exp[k], act[k]) for k in ("points", "colors", "min_point", "max_point"))
+            ok &= same
+            print(f"[Verify] n={n:<8} {name:<14} {'identical' if same else 'DIFFERENT'}")
+    return ok
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+def benchmark(vertices, triangles, sizes, out_dir=OUT_DIR, workers=None, in_memory_limit=20_000_000):
+    """Time and peak heap (tracemalloc; memmap pages are not counted) per point count, for both paths."""
+    print(f"{'points':>12}  {'in-memory s':>12}  {'peak MiB':>9}  {'chunked s':>10}  {'peak MiB':>9}")
+    for n in sizes:
+        if n <= in_memory_limit:
+            mem_s, mem_peak = measure(lambda: run_in_memory(vertices, triangles, n))
+            mem = f"{mem_s:>12.2f}  {mem_peak / 2**20:>9.1f}"
+        else:
+            mem = f"{'-':>12}  {'-':>9}"
+        chunk_s, chunk_peak = measure(lambda: run_chunked(vertices, triangles, n, out_dir=out_dir, workers=workers))
+        print(f"{n:>12,}  {mem}  {chunk_s:>10.2f}  {chunk_peak / 2**20:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked, memory-mapped sample/clip/gradient for large point counts")
+    parser.add_argument("--points", type=int, default=10_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="points per chunk")
+    parser.add_argument("--workers", type=int, help="threads (default: ThreadPoolExecutor's default)")
+    parser.add_argument("--out", default=OUT_DIR, help="directory for the .npy memmaps")
+    parser.add_argument("--verify", action="store_true", help="compare with the in-memory path at small sizes")
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="N", help="time and memory per point count")
+    args = parser.parse_args()
+
+    vertices, _, triangles = mesh_loader.load_arrays(mesh_loader.existing_paths())
+    if args.verify:
+        raise SystemExit(0 if verify(vertices, triangles, out_dir=args.out) else 1)
+    if args.benchmark:
+        benchmark(vertices, triangles, args.benchmark, out_dir=args.out, workers=args.workers)
+        raise SystemExit(0)
+
+    gradient, full_gradient, timings = run_chunked(vertices, triangles, args.points, out_dir=args.out,
+                                                   seed=args.seed, chunk=args.chunk, workers=args.workers)
+    for stage, seconds in timings.items():
+        print(f"[Chunked] {stage:<14} {seconds:8.2f}s")
+    print(f"[Chunked] {args.points:,} points, {len(gradient['points']):,} after clipping, written to {args.out}")
+    print(f"Min X: {gradient['min_point'][0]:.3f}, Max X: {gradient['max_point'][0]:.3f}")
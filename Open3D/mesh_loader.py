@@ -0,0 +1,229 @@
+"""
+Parallel OBJ loading for the Hermes parts, with a binary cache of the
+combined mesh.
+
+The parts are parsed in a process pool straight into NumPy arrays and joined
+with one concatenation (triangle indices shifted by each part's vertex offset)
+instead of repeated `mesh += part`. The result is stored as an .npz file keyed
+on the name, size and mtime of every source file, so later runs skip the text
+parsing entirely.
+
+Only positions, optional per-vertex colors (`v x y z r g b`) and faces are
+read; polygons are fan-triangulated. Texture coordinates and normals are
+ignored — nothing downstream uses them (normals are re-estimated on the
+sampled point cloud).
+
+Open3D's read_triangle_mesh keeps only the triangle faces of these files and
+drops every polygon, so it yields far fewer triangles (and vertices) than
+this parser. `--compare` therefore checks per file that Open3D's triangles
+are exactly the file's triangle faces and that its bounds lie within the
+parsed ones, rather than expecting identical vertex arrays.
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HERMES_DIR = os.path.join(BASE_DIR, "Hermes")
+CACHE_DIR = os.path.join(BASE_DIR, ".cache")
+
+# List of OBJ parts (update names if your files differ)
+FILENAMES = [
+    "hermes1.obj", "hermes2.obj", "hermes3.obj", "hermes4.obj",
+    "hermes5.obj", "hermes6.obj", "hermes7.obj", "hermes8.obj",
+    "hermes9.obj", "hermes10.obj", "hermes11.obj", "hermes12.obj"
+]
+
+def parse_obj(path):
+    """(vertices (n, 3) float64, colors (n, 3) float64 or None, triangles (m, 3) int32) of one OBJ file."""
+    coords = []
+    triangles = []
+    n_vertices = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"v "):
+                coords.append(line[2:])
+                n_vertices += 1
+            elif line.startswith(b"f "):
+                # "f 1 2 3", "f 1/1 2/2 3/3", "f 1//1 ...", negative = relative to the vertices so far
+                idx = []
+                for token in line.split()[1:]:
+                    i = int(token.split(b"/", 1)[0])
+                    idx.append(i - 1 if i > 0 else n_vertices + i)
+                for k in range(1, len(idx) - 1):
+                    triangles.append((idx[0], idx[k], idx[k + 1]))
+
+    values = np.array(b" ".join(coords).split(), dtype=np.float64)
+    width = len(values) // n_vertices if n_vertices else 3
+    values = values.reshape(n_vertices, width)
+    vertices = np.ascontiguousarray(values[:, :3])
+    colors = np.ascontiguousarray(values[:, 3:6]) if width >= 6 else None
+    return vertices, colors, np.array(triangles, dtype=np.int32).reshape(-1, 3)
+
+def combine(parts):
+    """Concatenate parsed parts in one pass, offsetting each part's triangle indices."""
+    counts = [len(v) for v, _, _ in parts]
+    offsets = np.cumsum([0] + counts[:-1])
+    vertices = np.concatenate([v for v, _, _ in parts])
+    triangles = np.concatenate([t + off for (_, _, t), off in zip(parts, offsets)])
+    colors = None
+    if any(c is not None for _, c, _ in parts):
+        # parts without colors get the same 0 that `mesh += part` would give them
+        colors = np.concatenate([c if c is not None else np.zeros_like(v) for v, c, _ in parts])
+    return vertices, colors, triangles
+
+def existing_paths(filenames=FILENAMES, hermes_dir=HERMES_DIR, warn=True):
+    paths = []
+    for name in filenames:
+        path = os.path.join(hermes_dir, name)
+        if not os.path.exists(path):
+            if warn:
+                print(f"⚠️ File not found: {path}")
+            continue
+        paths.append(path)
+    if not paths:
+        raise RuntimeError("No .obj files loaded. Check filenames or paths.")
+    return paths
+
+def cache_key(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+def to_mesh(vertices, colors, triangles):
+    import open3d as o3d
+
+    mesh = o3d.geometry.TriangleMesh()
+    mesh.vertices = o3d.utility.Vector3dVector(vertices)
+    mesh.triangles = o3d.utility.Vector3iVector(triangles)
+    if colors is not None:
+        mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
+    return mesh
+
+def parser_pool(workers):
+    # open3dUpd.py is a plain script without a __main__ guard, so spawned
+    # workers would re-run it on import: fork where the platform has it,
+    # threads otherwise
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+def load_arrays(paths, workers=None, cache_dir=CACHE_DIR, use_cache=True):
+    """Combined (vertices, colors, triangles) of `paths`, from the cache when it matches the sources."""
+    start = time.perf_counter()
+    cache_path = os.path.join(cache_dir, f"combined_{cache_key(paths)}.npz")
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            arrays = data["vertices"], (data["colors"] if "colors" in data else None), data["triangles"]
+        print(f"[Mesh] loaded {os.path.relpath(cache_path, BASE_DIR)} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return arrays
+
+    with parser_pool(workers or min(len(paths), os.cpu_count() or 1)) as pool:
+        parts = list(pool.map(parse_obj, paths))
+    for path, (vertices, _, _) in zip(paths, parts):
+        if len(vertices) == 0:
+            print(f"⚠️ Warning: {os.path.basename(path)} loaded but contains no geometry.")
+    vertices, colors, triangles = combine(parts)
+    print(f"[Mesh] parsed {len(paths)} OBJ files in {time.perf_counter() - start:.2f}s")
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        arrays = {"vertices": vertices, "triangles": triangles}
+        if colors is not None:
+            arrays["colors"] = colors
+        # write under a temp name first so an interrupted run never leaves a truncated cache
+        tmp_path = cache_path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, cache_path)
+    return vertices, colors, triangles
+
+def load_combined_mesh(filenames=FILENAMES, hermes_dir=HERMES_DIR, workers=None, use_cache=True):
+    """The combined Hermes mesh as an Open3D TriangleMesh."""
+    return to_mesh(*load_arrays(existing_paths(filenames, hermes_dir), workers=workers, use_cache=use_cache))
+
+def face_stats(path):
+    """(triangle faces, polygon faces, triangles after fan triangulation) of one OBJ file."""
+    triangle_faces = polygon_faces = triangles = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(b"f "):
+                corners = len(line.split()) - 1
+                if corners == 3:
+                    triangle_faces += 1
+                else:
+                    polygon_faces += 1
+                triangles += corners - 2
+    return triangle_faces, polygon_faces, triangles
+
+def compare_files(paths, rtol=1e-5):
+    """
+    Print parse_obj vs read_triangle_mesh per file. A file is consistent when
+    Open3D's triangles are exactly its triangle faces (the polygons it skips
+    are the whole difference) and Open3D's bounds lie within the parsed ones,
+    equal to them for files without polygons. Open3D parses coordinates as
+    float32, so bounds are compared to `rtol` × max(|bound|, 1) rather than
+    exactly. Returns True if all files are.
+    """
+    import open3d as o3d
+
+    print(f"{'file':<14} {'vertices':>9} {'triangles':>10} {'polygons':>9} "
+          f"{'o3d vert.':>10} {'o3d tri.':>9}  consistent")
+    consistent = True
+    for path in paths:
+        vertices, _, triangles = parse_obj(path)
+        triangle_faces, polygon_faces, _ = face_stats(path)
+        # one "skipping non-triangle primitive" INFO line per polygon otherwise
+        with o3d.utility.VerbosityContextManager(o3d.utility.VerbosityLevel.Warning):
+            reference = o3d.io.read_triangle_mesh(path)
+        ref_vertices = np.asarray(reference.vertices)
+        ok = len(reference.triangles) == triangle_faces
+        if len(ref_vertices) and len(vertices):
+            low, high = ref_vertices.min(axis=0), ref_vertices.max(axis=0)
+            vmin, vmax = vertices.min(axis=0), vertices.max(axis=0)
+            tol_min, tol_max = rtol * np.abs(vmin).clip(1), rtol * np.abs(vmax).clip(1)
+            ok = ok and bool(np.all(low >= vmin - tol_min) and np.all(high <= vmax + tol_max))
+            if polygon_faces == 0:
+                ok = ok and bool(np.all(np.abs(low - vmin) <= tol_min) and np.all(np.abs(high - vmax) <= tol_max))
+        consistent = consistent and ok
+        print(f"{os.path.basename(path):<14} {len(vertices):>9} {len(triangles):>10} {polygon_faces:>9} "
+              f"{len(ref_vertices):>10} {len(reference.triangles):>9}  {ok}")
+    return consistent
+
+def load_sequential(paths):
+    """The original loader: read_triangle_mesh per file and `+=` — kept for comparison."""
+    import open3d as o3d
+
+    combined = None
+    for path in paths:
+        part = o3d.io.read_triangle_mesh(path)
+        combined = part if combined is None else combined + part
+    return combined
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load (and cache) the combined Hermes mesh")
+    parser.add_argument("--workers", type=int, help="parser processes (default: one per file, up to CPU count)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the OBJ files")
+    parser.add_argument("--compare", action="store_true", help="also time read_triangle_mesh + '+=' and compare per file")
+    args = parser.parse_args()
+
+    paths = existing_paths()
+    start = time.perf_counter()
+    vertices, colors, triangles = load_arrays(paths, workers=args.workers, use_cache=not args.no_cache)
+    print(f"Vertices: {len(vertices)}  Triangles: {len(triangles)}  "
+          f"Has vertex colors: {colors is not None}  ({time.perf_counter() - start:.2f}s)")
+
+    if args.compare:
+        start = time.perf_counter()
+        reference = load_sequential(paths)
+        print(f"[Mesh] read_triangle_mesh + '+=': {time.perf_counter() - start:.2f}s, "
+              f"{len(reference.vertices)} vertices, {len(reference.triangles)} triangles")
+        # read_triangle_mesh drops polygon faces, so the totals differ by design
+        print(f"[Mesh] triangle counts and bounds consistent with read_triangle_mesh: {compare_files(paths)}")
@@ -5,8 +5,7 @@ Project: USS Hermes (Open3D)
 """
 
 import open3d as o3d
-import numpy as np
-import os
+from pipeline import Pipeline, to_mesh, to_point_cloud, to_voxel_grid
 
 def show_and_save(geometry, window_name, filename):
     vis = o3d.visualization.Visualizer()
@@ -24,49 +23,17 @@ def show_and_save(geometry, window_name, filename):
     vis.capture_screen_image(filename)
     vis.destroy_window()
 
-# ============================================================
-# Setup: define model folder path
-# ============================================================
-
-# Path to the Hermes folder (relative to this script)
-base_dir = os.path.dirname(os.path.abspath(__file__))
-hermes_dir = os.path.join(base_dir, "Hermes")
-
-# Verify that directory exists
-if not os.path.exists(hermes_dir):
-    raise FileNotFoundError(f"Hermes folder not found at: {hermes_dir}")
-
-# List of OBJ parts (update names if your files differ)
-filenames = [
-    "hermes1.obj", "hermes2.obj", "hermes3.obj", "hermes4.obj",
-    "hermes5.obj", "hermes6.obj", "hermes7.obj", "hermes8.obj",
-    "hermes9.obj", "hermes10.obj", "hermes11.obj", "hermes12.obj"
-]
-
 # ============================================================
 # Step 1: Loading and Visualization
 # ============================================================
 
 print("\n=== Step 1: Loading and Combining Meshes ===")
 
-all_meshes = []
-for f in filenames:
-    path = os.path.join(hermes_dir, f)
-    if not os.path.exists(path):
-        print(f"⚠️ File not found: {path}")
-        continue
-    mesh_part = o3d.io.read_triangle_mesh(path)
-    if mesh_part.is_empty():
-        print(f"⚠️ Warning: {f} loaded but contains no geometry.")
-    all_meshes.append(mesh_part)
-
-if len(all_meshes) == 0:
-    raise RuntimeError("No .obj files loaded. Check filenames or paths.")
-
-# Combine all meshes into one
-combined_mesh = all_meshes[0]
-for m in all_meshes[1:]:
-    combined_mesh += m
+# Every step's geometry comes from pipeline.py, which caches each stage on
+# disk; change a parameter there (or with `python pipeline.py --set ...`) and
+# only the affected stages are recomputed.
+pipeline = Pipeline()
+combined_mesh = to_mesh(pipeline.run("combined"))
 
 print("Vertices:", len(combined_mesh.vertices))
 print("Triangles:", len(combined_mesh.triangles))
@@ -81,7 +48,7 @@ show_and_save(combined_mesh, "Step 1: Original Mesh", "step1_mesh.png")
 # ============================================================
 
 print("\n=== Step 2: Converting to Point Cloud ===")
-pcd = combined_mesh.sample_points_uniformly(number_of_points=50000)
+pcd = to_point_cloud(pipeline.run("sample"))
 print("Points:", len(pcd.points))
 print("Has colors:", pcd.has_colors())
 o3d.visualization.draw_geometries([pcd], window_name="Step 2 — Point Cloud")
@@ -92,12 +59,9 @@ show_and_save(pcd, "Step 2: Point Cloud", "step2_pointcloud.png")
 # ============================================================
 
 print("\n=== Step 3: Surface Reconstruction (Poisson) ===")
-pcd.estimate_normals()
-mesh_poisson, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd, depth=8)
-
-# Crop to remove outer artifacts
-bbox = pcd.get_axis_aligned_bounding_box()
-mesh_crop = mesh_poisson.crop(bbox)
+# estimate normals → Poisson (depth 8) → crop to the point cloud's bounding box
+pcd = to_point_cloud(pipeline.run("normals"))
+mesh_crop = to_mesh(pipeline.run("crop"))
 
 print("Vertices:", len(mesh_crop.vertices))
 print("Triangles:", len(mesh_crop.triangles))
@@ -111,7 +75,7 @@ show_and_save(mesh_crop, "Step 3: Poission Reconstruction", "step3_poisson.png")
 # ============================================================
 
 print("\n=== Step 4: Voxelization ===")
-voxel_grid = o3d.geometry.VoxelGrid.create_from_point_cloud(pcd, voxel_size=0.05)
+voxel_grid = to_voxel_grid(pipeline.run("voxel"))
 print("Number of voxels:", len(voxel_grid.get_voxels()))
 o3d.visualization.draw_geometries([voxel_grid], window_name="Step 4 — Voxel Grid")
 show_and_save(voxel_grid, "Step 4: Voxel Grid", "step4_voxels.png")
@@ -133,13 +97,10 @@ show_and_save([mesh_crop, plane], "Step 5: Mesh + PLane", "step5_mesh_plane.png"
 # ============================================================
 
 print("\n=== Step 6: Clipping Points Above Plane ===")
-points = np.asarray(pcd.points)
-mask = points[:, 2] > -0.2  # keep points above z=-0.2
-clipped_points = points[mask]
-clipped_pcd = o3d.geometry.PointCloud()
-clipped_pcd.points = o3d.utility.Vector3dVector(clipped_points)
+clipped = pipeline.run("clip")  # keep points above z=-0.2
+clipped_pcd = to_point_cloud(clipped)
 
-print("Remaining vertices:", len(clipped_points))
+print("Remaining vertices:", len(clipped["points"]))
 print("Has color:", clipped_pcd.has_colors())
 o3d.visualization.draw_geometries([clipped_pcd], window_name="Step 6 — Clipped Model")
 show_and_save(clipped_pcd, "Step 6: Clipped Point Cloud", "step6_clipped.png")
@@ -149,25 +110,20 @@ show_and_save(clipped_pcd, "Step 6: Clipped Point Cloud", "step6_clipped.png")
 # ============================================================
 
 print("\n=== Step 7: Gradient Coloring and Extremes ===")
-points = np.asarray(clipped_pcd.points)
-x_vals = points[:, 0]  # Using X-axis for gradient
-min_x, max_x = np.min(x_vals), np.max(x_vals)
-
-# Color gradient: red (min) → blue (max)
-colors = (x_vals - min_x) / (max_x - min_x)
-colors = np.stack([colors, np.zeros_like(colors), 1 - colors], axis=1)
-clipped_pcd.colors = o3d.utility.Vector3dVector(colors)
+# Color gradient along the X-axis
+gradient = pipeline.run("gradient")
+clipped_pcd = to_point_cloud(gradient)
 
 # Highlight extremes
 min_sphere = o3d.geometry.TriangleMesh.create_sphere(radius=0.03)
-min_sphere.translate(points[np.argmin(x_vals)])
+min_sphere.translate(gradient["min_point"])
 min_sphere.paint_uniform_color([1, 0, 0])  # red
 
 max_sphere = o3d.geometry.TriangleMesh.create_sphere(radius=0.03)
-max_sphere.translate(points[np.argmax(x_vals)])
+max_sphere.translate(gradient["max_point"])
 max_sphere.paint_uniform_color([0, 1, 0])  # green
 
-print(f"Min X: {min_x:.3f}, Max X: {max_x:.3f}")
+print(f"Min X: {gradient['min_point'][0]:.3f}, Max X: {gradient['max_point'][0]:.3f}")
 o3d.visualization.draw_geometries(
     [clipped_pcd, min_sphere, max_sphere],
     window_name="Step 7.1 — Gradient & Extremes"
@@ -178,19 +134,13 @@ show_and_save([clipped_pcd, min_sphere, max_sphere], "Step 7.1: Gradient + Extre
 # Step 7.2: Full Gradient Coloring + Extremes
 # ============================================================
 
-# Use the original full point cloud from Step 2
-points_full = np.asarray(pcd.points)  # original full ship
-pcd_full = pcd  # full ship point cloud
-
-# Apply gradient along X-axis
-colors_full = (points_full - points_full.min(axis=0)) / (points_full.max(axis=0) - points_full.min(axis=0))
-pcd_full.colors = o3d.utility.Vector3dVector(colors_full)
+# Use the original full point cloud from Step 2, x/y/z mapped to r/g/b
+full_gradient = pipeline.run("full_gradient")
+pcd_full = to_point_cloud(full_gradient)  # full ship point cloud
 
-# Find extrema along X-axis
-min_idx = np.argmin(points_full[:, 0])
-max_idx = np.argmax(points_full[:, 0])
-min_point = points_full[min_idx]
-max_point = points_full[max_idx]
+# Extrema along X-axis
+min_point = full_gradient["min_point"]
+max_point = full_gradient["max_point"]
 
 # Highlight extrema with named spheres
 min_sphere = o3d.geometry.TriangleMesh.create_sphere(radius=0.05)
@@ -0,0 +1,279 @@
+"""
+The open3dUpd.py processing steps as a graph of named, cached stages.
+
+    combined ─ sample ─┬─ normals ─ poisson ─ crop
+                       ├─ voxel           (crop also uses sample's bounds)
+                       ├─ clip ─ gradient
+                       └─ full_gradient
+
+Every stage takes explicit parameters and returns a dict of NumPy arrays,
+which is saved to .cache/stages/<stage>_<key>.npz. The key hashes the
+stage's parameters together with the keys of its inputs, so changing one
+parameter only recomputes that stage and the ones downstream of it; the rest
+load from disk. A cached stage is loaded without touching its inputs. The
+combined mesh is stored where mesh_loader.py keeps it
+(.cache/combined_<key>.npz), so both share one cache file.
+
+    python pipeline.py crop                    # run crop and whatever it needs
+    python pipeline.py gradient --set clip.threshold=-0.1
+    python pipeline.py --list                  # stages, parameters and cache state
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+import mesh_loader
+
+CACHE_DIR = os.path.join(mesh_loader.CACHE_DIR, "stages")
+
+Stage = namedtuple("Stage", ["name", "inputs", "params", "func"])
+
+# ---------------- CONVERSIONS ----------------
+def to_point_cloud(data):
+    import open3d as o3d
+
+    pcd = o3d.geometry.PointCloud()
+    pcd.points = o3d.utility.Vector3dVector(data["points"])
+    if "normals" in data:
+        pcd.normals = o3d.utility.Vector3dVector(data["normals"])
+    if "colors" in data:
+        pcd.colors = o3d.utility.Vector3dVector(data["colors"])
+    return pcd
+
+def to_mesh(data):
+    return mesh_loader.to_mesh(data["vertices"], data.get("colors"), data["triangles"])
+
+def to_voxel_grid(data):
+    import open3d as o3d
+
+    grid = o3d.geometry.VoxelGrid()
+    grid.origin = data["origin"]
+    grid.voxel_size = float(data["voxel_size"])
+    for index, color in zip(data["grid_index"], data["colors"]):
+        grid.add_voxel(o3d.geometry.Voxel(index, color))
+    return grid
+
+def mesh_arrays(mesh):
+    data = {"vertices": np.asarray(mesh.vertices), "triangles": np.asarray(mesh.triangles)}
+    if mesh.has_vertex_colors():
+        data["colors"] = np.asarray(mesh.vertex_colors)
+    return data
+
+def cloud_arrays(pcd):
+    data = {"points": np.asarray(pcd.points)}
+    if pcd.has_normals():
+        data["normals"] = np.asarray(pcd.normals)
+    if pcd.has_colors():
+        data["colors"] = np.asarray(pcd.colors)
+    return data
+
+# ---------------- STAGES ----------------
+def stage_combined(params):
+    # the runner reads and writes mesh_loader's cache file for this stage
+    vertices, colors, triangles = mesh_loader.load_arrays(mesh_loader.existing_paths(params["files"]),
+                                                          use_cache=False)
+    data = {"vertices": vertices, "triangles": triangles}
+    if colors is not None:
+        data["colors"] = colors
+    return data
+
+def stage_sample(params, combined):
+    if params["sampler"] not in ("open3d", "area"):
+        raise ValueError(f"sample.sampler must be 'open3d' or 'area', not {params['sampler']!r}")
+    if params["sampler"] == "area":
+        # chunked.py's block-seeded area-weighted sampler: points only, identical to its out-of-core path
+        import chunked
+
+        n = params["number_of_points"]
+        seed = params["seed"] if params["seed"] is not None else np.random.SeedSequence().entropy
+        return {"points": chunked.sample_points(combined["vertices"], combined["triangles"], n,
+                                                np.empty((n, 3)), seed)}
+
+    import open3d as o3d
+
+    if params["seed"] is not None:
+        o3d.utility.random.seed(params["seed"])
+    pcd = to_mesh(combined).sample_points_uniformly(number_of_points=params["number_of_points"])
+    return cloud_arrays(pcd)
+
+def stage_normals(params, sample):
+    import open3d as o3d
+
+    pcd = to_point_cloud(sample)
+    if params["radius"] is None:
+        search = o3d.geometry.KDTreeSearchParamKNN(params["max_nn"])
+    else:
+        search = o3d.geometry.KDTreeSearchParamHybrid(radius=params["radius"], max_nn=params["max_nn"])
+    pcd.estimate_normals(search)
+    return cloud_arrays(pcd)
+
+def stage_poisson(params, normals):
+    import open3d as o3d
+
+    mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(
+        to_point_cloud(normals), depth=params["depth"])
+    data = mesh_arrays(mesh)
+    data["densities"] = np.asarray(densities)
+    return data
+
+def stage_crop(params, poisson, sample):
+    import open3d as o3d
+
+    # Crop to remove outer artifacts
+    bbox = o3d.geometry.AxisAlignedBoundingBox(sample["points"].min(axis=0), sample["points"].max(axis=0))
+    if params["padding"]:
+        bbox = bbox.scale(1 + params["padding"], bbox.get_center())
+    return mesh_arrays(to_mesh(poisson).crop(bbox))
+
+def stage_voxel(params, sample):
+    import open3d as o3d
+
+    grid = o3d.geometry.VoxelGrid.create_from_point_cloud(to_point_cloud(sample), voxel_size=params["voxel_size"])
+    voxels = grid.get_voxels()
+    return {
+        "grid_index": np.array([v.grid_index for v in voxels], dtype=np.int32).reshape(-1, 3),
+        "colors": np.array([v.color for v in voxels], dtype=np.float64).reshape(-1, 3),
+        "origin": np.asarray(grid.origin),
+        "voxel_size": np.array(grid.voxel_size),
+    }
+
+def stage_clip(params, sample):
+    points = sample["points"]
+    mask = points[:, params["axis"]] > params["threshold"]
+    return {"points": points[mask]}
+
+def extremes(points, axis):
+    values = points[:, axis]
+    return {"min_point": points[np.argmin(values)], "max_point": points[np.argmax(values)]}
+
+def stage_gradient(params, clip):
+    # Color gradient along one axis: t = 0 → blue, t = 1 → red (as in step 7.1)
+    points = clip["points"]
+    values = points[:, params["axis"]]
+    t = (values - values.min()) / (values.max() - values.min())
+    colors = np.stack([t, np.zeros_like(t), 1 - t], axis=1)
+    return {"points": points, "colors": colors, **extremes(points, params["axis"])}
+
+def stage_full_gradient(params, sample):
+    # x/y/z mapped to r/g/b over the whole ship (step 7.2)
+    points = sample["points"]
+    low, high = points.min(axis=0), points.max(axis=0)
+    colors = (points - low) / (high - low)
+    return {"points": points, "colors": colors, **extremes(points, params["axis"])}
+
+STAGES = {s.name: s for s in [
+    Stage("combined", [], {"files": mesh_loader.FILENAMES}, stage_combined),
+    Stage("sample", ["combined"], {"number_of_points": 50000, "seed": None, "sampler": "open3d"}, stage_sample),
+    Stage("normals", ["sample"], {"max_nn": 30, "radius": None}, stage_normals),
+    Stage("poisson", ["normals"], {"depth": 8}, stage_poisson),
+    Stage("crop", ["poisson", "sample"], {"padding": 0.0}, stage_crop),
+    Stage("voxel", ["sample"], {"voxel_size": 0.05}, stage_voxel),
+    Stage("clip", ["sample"], {"axis": 2, "threshold": -0.2}, stage_clip),
+    Stage("gradient", ["clip"], {"axis": 0}, stage_gradient),
+    Stage("full_gradient", ["sample"], {"axis": 0}, stage_full_gradient),
+]}
+
+# ---------------- RUNNER ----------------
+class Pipeline:
+    """Resolves stages with their inputs, reusing in-process results and the disk cache."""
+
+    def __init__(self, overrides=None, cache_dir=CACHE_DIR, use_cache=True, verbose=True):
+        self.overrides = overrides or {}
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.verbose = verbose
+        self.results = {}
+        self.keys = {}
+        self.timings = []  # (stage, seconds, "computed" | "cached")
+
+    def params(self, name):
+        return {**STAGES[name].params, **self.overrides.get(name, {})}
+
+    def key(self, name):
+        if name not in self.keys:
+            stage = STAGES[name]
+            payload = {"stage": name, "params": self.params(name), "inputs": [self.key(i) for i in stage.inputs]}
+            if name == "combined":
+                # the source OBJ files themselves are an input
+                paths = mesh_loader.existing_paths(payload["params"]["files"], warn=False)
+                payload["sources"] = mesh_loader.cache_key(paths)
+            self.keys[name] = hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+        return self.keys[name]
+
+    def cache_path(self, name):
+        if name == "combined":
+            # the same file mesh_loader.load_arrays reads and writes
+            paths = mesh_loader.existing_paths(self.params(name)["files"], warn=False)
+            return os.path.join(mesh_loader.CACHE_DIR, f"combined_{mesh_loader.cache_key(paths)}.npz")
+        return os.path.join(self.cache_dir, f"{name}_{self.key(name)}.npz")
+
+    def run(self, name):
+        if name in self.results:
+            return self.results[name]
+        stage = STAGES[name]
+        path = self.cache_path(name)
+        if self.use_cache and os.path.exists(path):
+            start = time.perf_counter()
+            with np.load(path) as data:
+                result = {k: data[k] for k in data.files}
+            how = "cached"
+        else:
+            # inputs are only resolved (and loaded) when this stage has to be computed
+            inputs = [self.run(i) for i in stage.inputs]
+            start = time.perf_counter()
+            result = stage.func(self.params(name), *inputs)
+            if self.use_cache:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = path[:-len(".npz")] + ".tmp.npz"
+                np.savez(tmp_path, **result)
+                os.replace(tmp_path, path)
+            how = "computed"
+        seconds = time.perf_counter() - start
+        self.timings.append((name, seconds, how))
+        if self.verbose:
+            print(f"[Stage] {name:<14} {how:<8} {seconds * 1000:>9.1f} ms  {self.params(name)}")
+        self.results[name] = result
+        return result
+
+def parse_overrides(items):
+    """["poisson.depth=9", "clip.threshold=-0.1"] → {"poisson": {"depth": 9}, "clip": {"threshold": -0.1}}"""
+    overrides = {}
+    for item in items:
+        target, value = item.split("=", 1)
+        name, param = target.split(".", 1)
+        if name not in STAGES or param not in STAGES[name].params:
+            raise SystemExit(f"Unknown parameter {target}")
+        overrides.setdefault(name, {})[param] = json.loads(value)
+    return overrides
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Hermes processing stages with on-disk caching")
+    parser.add_argument("stages", nargs="*", help=f"stages to run (default: all of {', '.join(STAGES)})")
+    parser.add_argument("--set", action="append", default=[], metavar="STAGE.PARAM=VALUE",
+                        help="override a parameter (JSON value), e.g. poisson.depth=9")
+    parser.add_argument("--no-cache", action="store_true", help="recompute everything and write nothing")
+    parser.add_argument("--list", action="store_true", help="show stages, parameters and whether they are cached")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+    pipeline = Pipeline(parse_overrides(args.set), use_cache=not args.no_cache)
+
+    if args.list:
+        for name, stage in STAGES.items():
+            state = "cached" if os.path.exists(pipeline.cache_path(name)) else "-"
+            print(f"{name:<14} {state:<7} inputs={stage.inputs} params={pipeline.params(name)}")
+        raise SystemExit(0)
+
+    for name in args.stages or list(STAGES):
+        pipeline.run(name)
+    total = sum(seconds for _, seconds, _ in pipeline.timings)
+    computed = [name for name, _, how in pipeline.timings if how == "computed"]
+    print(f"[Pipeline] {len(pipeline.timings)} stages in {total:.2f}s; computed: {', '.join(computed) or 'none'}")
@@ -0,0 +1,214 @@
+"""
+Headless batch rendering of the open3dUpd.py step images.
+
+Instead of a blocking draw_geometries window plus a second Visualizer per
+step, every image goes through one OffscreenRenderer that is reused for all
+steps. Open3D's CPU (Mesa llvmpipe) path is enabled before open3d is
+imported, so no GPU or display is needed.
+
+The combined and reconstructed meshes are rendered from level-of-detail
+variants: quadric decimation at LOD_TRIANGLES target counts, each one from
+the previous (larger) variant, cached in .cache/lod/ next to the pipeline
+stage they come from. The variant is chosen by output resolution
+(TRIANGLES_PER_PIXEL), so the default 1280x720 and thumbnails don't pay for
+the full mesh.
+
+    python render_batch.py                         # 1280x720 into renders/
+    python render_batch.py --size 320x180 --out-dir renders/thumbs
+    python render_batch.py --full-resolution       # no LOD, for comparison
+"""
+
+import argparse
+import os
+import time
+
+# must be set before open3d is imported: software rendering, no X/Wayland
+os.environ.setdefault("OPEN3D_CPU_RENDERING", "true")
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+import numpy as np
+
+import mesh_loader
+from pipeline import Pipeline, mesh_arrays, to_mesh, to_point_cloud
+
+LOD_DIR = os.path.join(mesh_loader.CACHE_DIR, "lod")
+OUT_DIR = os.path.join(mesh_loader.BASE_DIR, "renders")
+LOD_TRIANGLES = [200000, 50000, 10000]
+# a variant that decimation leaves above this multiple of its target is not used
+LOD_TOLERANCE = 1.5
+# enough triangles that decimation is not visible at that resolution;
+# 1280x720 → 184k, so the default size renders the 200k variant
+TRIANGLES_PER_PIXEL = 0.2
+
+# ---------------- LEVEL OF DETAIL ----------------
+def lod_variants(pipeline, name, targets=LOD_TRIANGLES, lod_dir=LOD_DIR):
+    """
+    {triangle count: mesh arrays} for stage `name`: the full mesh plus every
+    smaller decimated target. Targets are decimated in a cascade, each from
+    the previous result instead of the full mesh. A result that decimation
+    left above LOD_TOLERANCE × its target is reported and not used.
+    """
+    full = pipeline.run(name)
+    variants = {len(full["triangles"]): full}
+    source, source_label = full, "full"
+    for target in sorted(targets, reverse=True):
+        if target >= len(source["triangles"]):
+            continue
+        # the file name records the source, so cascaded and direct variants never mix
+        path = os.path.join(lod_dir, f"{name}_{pipeline.key(name)}_{source_label}_{target}.npz")
+        start = time.perf_counter()
+        if os.path.exists(path):
+            with np.load(path) as data:
+                arrays = {k: data[k] for k in data.files}
+            how = "cached"
+        else:
+            arrays = mesh_arrays(to_mesh(source).simplify_quadric_decimation(target_number_of_triangles=target))
+            os.makedirs(lod_dir, exist_ok=True)
+            tmp_path = path[:-len(".npz")] + ".tmp.npz"
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, path)
+            how = "computed"
+        count = len(arrays["triangles"])
+        print(f"[LOD] {name:<8} {source_label:>7} → {target:>7}: {count:>7} triangles  {how} "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        if count > target * LOD_TOLERANCE:
+            print(f"[LOD] {name:<8} {target:>7} skipped: decimation stopped {count / target:.1f}x above the target")
+        else:
+            variants[count] = arrays
+        if count < len(source["triangles"]):
+            source, source_label = arrays, str(target)
+    return variants
+
+def pick_lod(variants, width, height):
+    """The coarsest variant with at least TRIANGLES_PER_PIXEL × pixels triangles (else the finest)."""
+    budget = width * height * TRIANGLES_PER_PIXEL
+    enough = [count for count in variants if count >= budget]
+    return variants[min(enough) if enough else max(variants)]
+
+# ---------------- GEOMETRY ----------------
+CUBE_CORNERS = np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+CUBE_TRIANGLES = np.array([
+    [0, 1, 2], [1, 3, 2], [4, 6, 5], [5, 6, 7],  # x = 0, x = 1
+    [0, 4, 1], [1, 4, 5], [2, 3, 6], [3, 7, 6],  # y = 0, y = 1
+    [0, 2, 4], [2, 6, 4], [1, 5, 3], [3, 5, 7],  # z = 0, z = 1
+], dtype=np.int32)  # counter-clockwise seen from outside
+
+def voxel_mesh(voxel):
+    """The voxel stage's grid as one triangle mesh of colored cubes (the offscreen renderer draws meshes, not VoxelGrids)."""
+    size = float(voxel["voxel_size"])
+    corners = voxel["origin"] + (voxel["grid_index"][:, None, :] + CUBE_CORNERS) * size
+    offsets = np.arange(len(corners), dtype=np.int32)[:, None, None] * len(CUBE_CORNERS)
+    return mesh_loader.to_mesh(corners.reshape(-1, 3),
+                               np.repeat(voxel["colors"], len(CUBE_CORNERS), axis=0),
+                               (CUBE_TRIANGLES + offsets).reshape(-1, 3))
+
+def sphere(center, radius, color):
+    import open3d as o3d
+
+    s = o3d.geometry.TriangleMesh.create_sphere(radius=radius)
+    s.translate(center)
+    s.paint_uniform_color(color)
+    return s
+
+def plane():
+    import open3d as o3d
+
+    p = o3d.geometry.TriangleMesh.create_box(width=3.0, height=3.0, depth=0.02)
+    p.translate((0, 0, -0.5))
+    p.paint_uniform_color([0.8, 0.8, 0.8])
+    return p
+
+def steps(pipeline, width, height, use_lod=True):
+    """(filename, [geometries]) for every open3dUpd.py step image."""
+    def mesh(name):
+        data = pick_lod(lod_variants(pipeline, name), width, height) if use_lod else pipeline.run(name)
+        return to_mesh(data)
+
+    crop = mesh("crop")
+    gradient = pipeline.run("gradient")
+    full_gradient = pipeline.run("full_gradient")
+    return [
+        ("step1_mesh.png", [mesh("combined")]),
+        ("step2_pointcloud.png", [to_point_cloud(pipeline.run("sample"))]),
+        ("step3_poisson.png", [crop]),
+        ("step4_voxels.png", [voxel_mesh(pipeline.run("voxel"))]),
+        ("step5_mesh_plane.png", [crop, plane()]),
+        ("step6_clipped.png", [to_point_cloud(pipeline.run("clip"))]),
+        ("step7.1_gradient_extremes.png", [to_point_cloud(gradient),
+                                           sphere(gradient["min_point"], 0.03, [1, 0, 0]),
+                                           sphere(gradient["max_point"], 0.03, [0, 1, 0])]),
+        ("step7.2_fullship_gradient.png", [to_point_cloud(full_gradient),
+                                           sphere(full_gradient["min_point"], 0.05, [1, 0, 0]),
+                                           sphere(full_gradient["max_point"], 0.05, [0, 1, 0])]),
+    ]
+
+# ---------------- RENDERING ----------------
+class BatchRenderer:
+    """One OffscreenRenderer for every image: the scene is cleared between images, never recreated."""
+
+    def __init__(self, width, height, point_size=2.0, background=(1, 1, 1, 1)):
+        import open3d as o3d
+
+        self.o3d = o3d
+        self.renderer = o3d.visualization.rendering.OffscreenRenderer(width, height)
+        self.renderer.scene.set_background(list(background))
+        self.lit = o3d.visualization.rendering.MaterialRecord()
+        self.lit.shader = "defaultLit"
+        self.points = o3d.visualization.rendering.MaterialRecord()
+        self.points.shader = "defaultUnlit"
+        self.points.point_size = point_size
+
+    def render(self, geometries, path):
+        """Render `geometries` to `path`; returns (setup seconds, render seconds)."""
+        start = time.perf_counter()
+        scene = self.renderer.scene
+        scene.clear_geometry()
+        bbox = None
+        for i, g in enumerate(geometries):
+            if isinstance(g, self.o3d.geometry.TriangleMesh):
+                if not g.has_vertex_normals():
+                    g.compute_vertex_normals()
+                scene.add_geometry(f"g{i}", g, self.lit)
+            else:
+                scene.add_geometry(f"g{i}", g, self.points)
+            if bbox is None:
+                bbox = g.get_axis_aligned_bounding_box()
+            else:
+                bbox += g.get_axis_aligned_bounding_box()
+        self.renderer.setup_camera(60.0, bbox, bbox.get_center())
+        setup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        image = self.renderer.render_to_image()
+        self.o3d.io.write_image(path, image)
+        return setup, time.perf_counter() - start
+
+def parse_size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every Hermes step image headlessly with one renderer")
+    parser.add_argument("--size", type=parse_size, default=(1280, 720), help="WIDTHxHEIGHT (default 1280x720)")
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--point-size", type=float, default=2.0)
+    parser.add_argument("--full-resolution", action="store_true", help="render the full meshes, no LOD")
+    args = parser.parse_args()
+
+    width, height = args.size
+    os.makedirs(args.out_dir, exist_ok=True)
+    pipeline = Pipeline()
+    start = time.perf_counter()
+    images = steps(pipeline, width, height, use_lod=not args.full_resolution)
+    print(f"[Render] geometry ready in {time.perf_counter() - start:.2f}s")
+
+    renderer = BatchRenderer(width, height, point_size=args.point_size)
+    total = 0.0
+    print(f"{'image':<32} {'triangles':>10} {'points':>9} {'setup ms':>9} {'render ms':>10}")
+    for filename, geometries in images:
+        triangles = sum(len(g.triangles) for g in geometries if hasattr(g, "triangles"))
+        points = sum(len(g.points) for g in geometries if hasattr(g, "points"))
+        setup, render = renderer.render(geometries, os.path.join(args.out_dir, filename))
+        total += setup + render
+        print(f"{filename:<32} {triangles:>10} {points:>9} {setup * 1000:>9.1f} {render * 1000:>10.1f}")
+    print(f"[Render] {len(images)} images at {width}x{height} in {total:.2f}s → {args.out_dir}")
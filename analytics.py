@@ -1,26 +1,65 @@
+import argparse
 import os
-import pandas as pd
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-import plotly.express as px
-from sqlalchemy import create_engine, text
-from openpyxl import load_workbook
-from openpyxl.formatting.rule import ColorScaleRule
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# pandas, matplotlib, plotly, sqlalchemy and openpyxl are imported inside the
+# functions that need them, so `--help` or a single chart only pays for what
+# the selected command uses.
 
 # ---------------- CONFIG ----------------
-from config import DB_URI  # assume config.py stores DB connection string
+import batch_metrics
+from daily_rollup import daily_flights_sql
+
+_engine = None
+_query_cache = None
+
+# QUERY_CACHE=0 / --no-cache always hits the database
+CACHE_ENABLED = os.environ.get("QUERY_CACHE", "1") != "0"
 
-engine = create_engine(DB_URI)
+# TRACE_MEMORY=1 / export --trace-memory reports the export's peak Python memory (slows it down considerably)
+TRACE_MEMORY = os.environ.get("TRACE_MEMORY") == "1"
 
-os.makedirs("charts", exist_ok=True)
-os.makedirs("exports", exist_ok=True)
+# USE_ROLLUP=1 / --rollup reads the daily counts from flights_daily_rollup (see daily_rollup.py)
+USE_ROLLUP = os.environ.get("USE_ROLLUP") == "1"
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        from sqlalchemy import create_engine
+        from config import DB_URI  # assume config.py stores DB connection string
+        _engine = create_engine(DB_URI)
+    return _engine
+
+def get_query_cache():
+    global _query_cache
+    if not CACHE_ENABLED:
+        return None
+    if _query_cache is None:
+        from query_cache import QueryCache
+        _query_cache = QueryCache(get_engine())
+    return _query_cache
 
 # ---------------- HELPER FUNCTIONS ----------------
+def _read_sql(conn, query: str):
+    import pandas as pd
+    from sqlalchemy import text
+    return pd.read_sql(text(query), conn)
+
 def run_query(query: str):
-    with engine.connect() as conn:
-        return pd.read_sql(text(query), conn)
+    query_cache = get_query_cache()
+    if query_cache is not None:
+        return query_cache.get(query, _read_sql)
+    with get_engine().connect() as conn:
+        return _read_sql(conn, query)
 
 def save_chart(df, chart_type, filename, title, xlabel=None, ylabel=None):
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    os.makedirs("charts", exist_ok=True)
     plt.figure(figsize=(10, 7))
     
     if chart_type == "pie":
@@ -131,6 +170,28 @@ queries = {
     """
 }
 
+def use_rollup(enabled=True):
+    global USE_ROLLUP
+    USE_ROLLUP = enabled
+    if enabled:
+        queries["line"] = daily_flights_sql(30)
+
+if USE_ROLLUP:
+    use_rollup()
+
+def daily_flights_query(limit=None) -> str:
+    if USE_ROLLUP:
+        return daily_flights_sql(limit)
+    limit_clause = f"LIMIT {int(limit)}" if limit is not None else ""
+    return f""" 
+        SELECT DATE(scheduled_departure) AS dep_date, COUNT(*) AS total_flights 
+        FROM flights 
+        WHERE scheduled_departure IS NOT NULL 
+        GROUP BY dep_date 
+        ORDER BY dep_date 
+        {limit_clause};
+    """
+
 # ---------------- TITLES ----------------
 titles = {
     "pie": "Hottest Destinations by Number of Passengers",
@@ -150,9 +211,111 @@ labels = {
     "scatter": ("Aircraft Model", "Passengers")
 }
 
+# ---------------- FUSED AGGREGATE ----------------
+# pie, hist and scatter all scan ticket_flights → flights → airports_data /
+# aircrafts_data and only differ in group-by keys and filters. The fused
+# mode runs one grouped aggregate over that join graph and derives each
+# chart's DataFrame from it in pandas. LEFT JOINs keep rows whose airport or
+# aircraft is missing, so each derivation still sees exactly the rows its own
+# inner join would.
+FUSED_BASE_QUERY = """
+    SELECT
+        a.city AS destination_city,
+        ad.model AS aircraft_model,
+        tf.fare_conditions,
+        COUNT(*) AS passengers
+    FROM ticket_flights tf
+    JOIN flights f ON tf.flight_id = f.flight_id
+    LEFT JOIN airports_data a ON f.arrival_airport = a.airport_code
+    LEFT JOIN aircrafts_data ad ON f.aircraft_code = ad.aircraft_code
+    GROUP BY a.city, ad.model, tf.fare_conditions;
+"""
+
+JOIN_PATTERN = re.compile(
+    r"\b(?:from|join)\s+(\w+)\s+(?:as\s+)?(\w+)?(?:\s+on\s+(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+))?",
+    re.IGNORECASE,
+)
+
+def join_graph(query: str):
+    """Set of (table.column, table.column) join edges of a query, aliases resolved."""
+    aliases, edges = {}, set()
+    for table, alias, l_alias, l_col, r_alias, r_col in JOIN_PATTERN.findall(query):
+        aliases[(alias or table).lower()] = table.lower()
+        if l_alias:
+            left = f"{aliases.get(l_alias.lower(), l_alias.lower())}.{l_col.lower()}"
+            right = f"{aliases.get(r_alias.lower(), r_alias.lower())}.{r_col.lower()}"
+            edges.add(tuple(sorted((left, right))))
+    return frozenset(edges)
+
+def _top(df, key, value, n):
+    grouped = df.dropna(subset=[key]).groupby(key, as_index=False)["passengers"].sum()
+    grouped = grouped.rename(columns={"passengers": value})
+    return grouped.sort_values(value, ascending=False, kind="stable").head(n).reset_index(drop=True)
+
+fused_derivations = {
+    "pie": lambda base: _top(base, "destination_city", "total_passengers", 6),
+    "hist": lambda base: _top(base[base["fare_conditions"] == "Business"],
+                              "destination_city", "business_class_passenger_count", 30),
+    "scatter": lambda base: _top(base, "aircraft_model", "passengers", 15),
+}
+
+def driving_table(query: str):
+    match = JOIN_PATTERN.search(query)
+    return match.group(1).lower() if match else None
+
+def fusable_charts(charts=None):
+    """
+    Charts that scan the same driving table as FUSED_BASE_QUERY, whose join
+    graph it covers, and that have a derivation.
+    """
+    base_graph = join_graph(FUSED_BASE_QUERY)
+    base_table = driving_table(FUSED_BASE_QUERY)
+    return [chart_type for chart_type, query in queries.items()
+            if (charts is None or chart_type in charts)
+            and chart_type in fused_derivations
+            and driving_table(query) == base_table
+            and join_graph(query) <= base_graph]
+
+def fetch_fused_frames(chart_types):
+    base = run_query(FUSED_BASE_QUERY)
+    return {chart_type: fused_derivations[chart_type](base) for chart_type in chart_types}
+
+def fetch_tasks(fused=False, charts=None):
+    """
+    Split the chart queries (all, or only `charts`) into independent fetch
+    tasks. Each task returns a {chart_type: DataFrame} dict; with `fused`,
+    the fusable charts share one task.
+    """
+    selected = [chart_type for chart_type in queries if charts is None or chart_type in charts]
+    fused_group = fusable_charts(selected) if fused else []
+    # deriving a single chart from the base aggregate is no cheaper than its own query
+    if len(fused_group) < 2:
+        fused_group = []
+    tasks = []
+    if fused_group:
+        tasks.append(lambda: fetch_fused_frames(fused_group))
+    for chart_type in selected:
+        if chart_type not in fused_group:
+            tasks.append(lambda chart_type=chart_type: {chart_type: run_query(queries[chart_type])})
+    return tasks
+
+def fetch_chart_frames(fused=False, charts=None):
+    frames = {}
+    for task in fetch_tasks(fused, charts):
+        frames.update(task())
+    return {chart_type: frames[chart_type] for chart_type in queries if chart_type in frames}
+
 # ---------------- CHART GENERATION ----------------
-for chart_type, query in queries.items():
-    df = run_query(query)
+def _init_render_worker():
+    # worker processes never open a window; render straight to PNG
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _record_fetch(frames, seconds, prefix=""):
+    batch_metrics.record(f"{prefix}fetch_{'+'.join(frames)}", seconds, sum(len(df) for df in frames.values()))
+
+def _render_job(df, chart_type):
+    start = time.perf_counter()
     save_chart(
         df, 
         chart_type, 
@@ -161,125 +324,435 @@ for chart_type, query in queries.items():
         labels.get(chart_type, (None, None))[0],
         labels.get(chart_type, (None, None))[1]
     )
+    return time.perf_counter() - start
+
+def render_charts(workers=None, fused=False, charts=None, stage_prefix=""):
+    """
+    Fetch every chart query (or only `charts`) concurrently and render the
+    charts in a process pool of `workers` processes (Agg backend). workers=1
+    keeps the original serial loop. With `fused`, the charts sharing the
+    ticket_flights join are derived from a single aggregate query.
+    `stage_prefix` is prepended to the recorded fetch/render stage names.
+    Returns the wall-clock seconds of the whole batch.
+    """
+    tasks = fetch_tasks(fused, charts)
+    # a pool is not worth starting for a single chart
+    workers = 1 if len(tasks) == 1 and not fused else (workers or os.cpu_count() or 1)
+    wall_start = time.perf_counter()
+
+    if workers == 1:
+        query_time = render_time = 0.0
+        for task in tasks:
+            start = time.perf_counter()
+            frames = task()
+            seconds = time.perf_counter() - start
+            query_time += seconds
+            _record_fetch(frames, seconds, stage_prefix)
+            for chart_type, df in frames.items():
+                seconds = _render_job(df, chart_type)
+                batch_metrics.record(f"{stage_prefix}render_{chart_type}", seconds, len(df))
+                render_time += seconds
+        wall = time.perf_counter() - wall_start
+        print(f"[Timing] serial: queries {query_time:.2f}s + render {render_time:.2f}s = wall {wall:.2f}s")
+        return wall
+
+    query_times = []
+
+    def fetch(task):
+        start = time.perf_counter()
+        frames = task()
+        query_times.append(time.perf_counter() - start)
+        _record_fetch(frames, query_times[-1], stage_prefix)
+        return frames
+
+    render_times = {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as fetcher, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_render_worker) as renderer:
+        # each chart is handed to the pool as soon as its query returns
+        fetches = [fetcher.submit(fetch, task) for task in tasks]
+        jobs = {}
+        for future in as_completed(fetches):
+            for chart_type, df in future.result().items():
+                jobs[renderer.submit(_render_job, df, chart_type)] = (chart_type, len(df))
+        for future in as_completed(jobs):
+            chart_type, rows = jobs[future]
+            render_times[chart_type] = future.result()
+            batch_metrics.record(f"{stage_prefix}render_{chart_type}", render_times[chart_type], rows)
+
+    wall = time.perf_counter() - wall_start
+    serial = sum(query_times) + sum(render_times.values())
+    print(f"[Timing] parallel ({workers} workers): wall {wall:.2f}s vs serial sum "
+          f"{serial:.2f}s (queries {sum(query_times):.2f}s + render "
+          f"{sum(render_times.values()):.2f}s) — speedup {serial / wall if wall else 0:.1f}x")
+    return wall
+
+def compare_rendering(workers=None, fused=False, charts=None):
+    """
+    Render the batch serially and then in parallel and print both wall-clocks.
+    Both passes bypass the query cache, otherwise the second one would be
+    served the first one's results from memory. Each pass records its
+    stages under its own prefix (serial_/parallel_) so they are not summed.
+    """
+    global CACHE_ENABLED
+    enabled, CACHE_ENABLED = CACHE_ENABLED, False
+    try:
+        serial = render_charts(workers=1, fused=fused, charts=charts, stage_prefix="serial_")
+        parallel = render_charts(workers=workers, fused=fused, charts=charts, stage_prefix="parallel_")
+    finally:
+        CACHE_ENABLED = enabled
+    print(f"[Timing] serial {serial:.2f}s vs parallel {parallel:.2f}s — {serial / parallel if parallel else 0:.1f}x")
 
 # ---------------- INTERACTIVE PLOTLY (Weekly Slider with Lines) ----------------
-df_time = run_query(""" 
-    SELECT DATE(scheduled_departure) AS dep_date, COUNT(*) AS total_flights 
-    FROM flights 
-    WHERE scheduled_departure IS NOT NULL 
-    GROUP BY dep_date 
-    ORDER BY dep_date 
-    LIMIT 100;
-""")
-
-import plotly.graph_objects as go
-import pandas as pd
-
-# Ensure dates are datetime
-df_time["dep_date"] = pd.to_datetime(df_time["dep_date"])
-
-# Group into weeks (7-day intervals starting Monday)
-df_time["week_start"] = df_time["dep_date"] - pd.to_timedelta(df_time["dep_date"].dt.weekday, unit="d")
-weeks = df_time["week_start"].unique()
-
-# Create base figure
-fig = go.Figure()
-
-# First week's data
-first_week = weeks[0]
-week_df = df_time[df_time["week_start"] == first_week]
-
-fig.add_trace(go.Scatter(
-    x=week_df["dep_date"],
-    y=week_df["total_flights"],
-    mode="lines+markers",   # <--- dots + connecting lines
-    line=dict(color="blue", width=2),
-    marker=dict(size=8),
-    name="Flights"
-))
-
-# Frames for each week
-frames = []
-for wk in weeks:
-    week_df = df_time[df_time["week_start"] == wk]
-    frames.append(go.Frame(
-        data=[go.Scatter(
-            x=week_df["dep_date"],
-            y=week_df["total_flights"],
-            mode="lines+markers",   # <--- dots + connecting lines
-            line=dict(color="blue", width=2),
-            marker=dict(size=8)
-        )],
-        name=str(wk.date())
+def weekly_slider_figure():
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    df_time = run_query(daily_flights_query(100))
+
+    # Ensure dates are datetime
+    df_time["dep_date"] = pd.to_datetime(df_time["dep_date"])
+
+    # Group into weeks (7-day intervals starting Monday)
+    df_time["week_start"] = df_time["dep_date"] - pd.to_timedelta(df_time["dep_date"].dt.weekday, unit="d")
+    weeks = df_time["week_start"].unique()
+
+    # Create base figure
+    fig = go.Figure()
+
+    # First week's data
+    first_week = weeks[0]
+    week_df = df_time[df_time["week_start"] == first_week]
+
+    fig.add_trace(go.Scatter(
+        x=week_df["dep_date"],
+        y=week_df["total_flights"],
+        mode="lines+markers",   # <--- dots + connecting lines
+        line=dict(color="blue", width=2),
+        marker=dict(size=8),
+        name="Flights"
     ))
 
-# Slider steps
-steps = []
-for wk in weeks:
-    step = dict(
-        method="animate",
-        args=[[str(wk.date())],
-              {"mode": "immediate", "frame": {"duration": 500, "redraw": True},
-               "transition": {"duration": 0}}],
-        label=str(wk.date())
+    # Frames for each week
+    frames = []
+    for wk in weeks:
+        week_df = df_time[df_time["week_start"] == wk]
+        frames.append(go.Frame(
+            data=[go.Scatter(
+                x=week_df["dep_date"],
+                y=week_df["total_flights"],
+                mode="lines+markers",   # <--- dots + connecting lines
+                line=dict(color="blue", width=2),
+                marker=dict(size=8)
+            )],
+            name=str(wk.date())
+        ))
+
+    # Slider steps
+    steps = []
+    for wk in weeks:
+        step = dict(
+            method="animate",
+            args=[[str(wk.date())],
+                  {"mode": "immediate", "frame": {"duration": 500, "redraw": True},
+                   "transition": {"duration": 0}}],
+            label=str(wk.date())
+        )
+        steps.append(step)
+
+    sliders = [dict(
+        active=0,
+        currentvalue={"prefix": "Week starting: "},
+        pad={"t": 50},
+        steps=steps
+    )]
+
+    # Layout
+    fig.update_layout(
+        title="Flights Over Time (Weekly View with Lines)",
+        sliders=sliders,
+        xaxis_title="Date",
+        yaxis_title="Total Flights",
+        yaxis=dict(dtick=50),  # keep tick spacing larger
+        updatemenus=[dict(type="buttons", showactive=False,
+                          buttons=[dict(label="Play",
+                                        method="animate",
+                                        args=[None, {"frame": {"duration": 800, "redraw": True},
+                                                     "fromcurrent": True}]),
+                                   dict(label="Pause",
+                                        method="animate",
+                                        args=[[None], {"frame": {"duration": 0, "redraw": False},
+                                                       "mode": "immediate"}])])]
     )
-    steps.append(step)
-
-sliders = [dict(
-    active=0,
-    currentvalue={"prefix": "Week starting: "},
-    pad={"t": 50},
-    steps=steps
-)]
-
-# Layout
-fig.update_layout(
-    title="Flights Over Time (Weekly View with Lines)",
-    sliders=sliders,
-    xaxis_title="Date",
-    yaxis_title="Total Flights",
-    yaxis=dict(dtick=50),  # keep tick spacing larger
-    updatemenus=[dict(type="buttons", showactive=False,
-                      buttons=[dict(label="Play",
-                                    method="animate",
-                                    args=[None, {"frame": {"duration": 800, "redraw": True},
-                                                 "fromcurrent": True}]),
-                               dict(label="Pause",
-                                    method="animate",
-                                    args=[[None], {"frame": {"duration": 0, "redraw": False},
-                                                   "mode": "immediate"}])])]
-)
 
-fig.frames = frames
+    fig.frames = frames
+
+    return fig
+
+
+# ---------------- HEADLESS WEEKLY SLIDER EXPORT ----------------
+def downsample_daily(df_time, max_points):
+    """Average the daily series into k-day buckets so it has at most `max_points` points."""
+    if len(df_time) <= max_points:
+        return df_time
+    days = (df_time["dep_date"].max() - df_time["dep_date"].min()).days + 1
+    bucket = -(-days // max_points)  # ceil
+    resampled = (df_time.set_index("dep_date")["total_flights"]
+                 .resample(f"{bucket}D").mean().dropna().round(1).reset_index())
+    return resampled
+
+def compact_weekly_figure(df_time, max_points=2000, max_frames=60):
+    """
+    Weekly-slider figure that stores the daily series once: the single trace
+    holds every point and each frame only moves the x-axis window, so frames
+    carry no data and steps need no redraw. Long histories are downsampled to
+    `max_points` and the slider is thinned to at most `max_frames` windows.
+    """
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    df_time = df_time[["dep_date", "total_flights"]].copy()
+    df_time["dep_date"] = pd.to_datetime(df_time["dep_date"])
+    series = downsample_daily(df_time, max_points)
+
+    week_starts = (df_time["dep_date"] - pd.to_timedelta(df_time["dep_date"].dt.weekday, unit="d")).unique()
+    stride = -(-len(week_starts) // max_frames)
+    week_starts = week_starts[::stride]
+    window = pd.Timedelta(days=7 * stride)
+
+    def x_range(wk):
+        return [str(wk.date()), str((wk + window).date())]
+
+    fig = go.Figure(go.Scatter(
+        x=series["dep_date"].dt.strftime("%Y-%m-%d"),
+        y=series["total_flights"],
+        mode="lines+markers",
+        line=dict(color="blue", width=2),
+        marker=dict(size=6),
+        name="Flights"
+    ))
+    fig.frames = [go.Frame(name=str(wk.date()), layout=dict(xaxis=dict(range=x_range(wk))))
+                  for wk in week_starts]
+
+    steps = [dict(method="animate", label=str(wk.date()),
+                  args=[[str(wk.date())], {"mode": "immediate", "frame": {"duration": 300, "redraw": False},
+                                           "transition": {"duration": 0}}])
+             for wk in week_starts]
+    fig.update_layout(
+        title="Flights Over Time (Weekly View with Lines)",
+        xaxis=dict(title="Date", range=x_range(week_starts[0])),
+        yaxis=dict(title="Total Flights", dtick=50),
+        sliders=[dict(active=0, currentvalue={"prefix": "Week starting: "}, pad={"t": 50}, steps=steps)],
+        updatemenus=[dict(type="buttons", showactive=False,
+                          buttons=[dict(label="Play", method="animate",
+                                        args=[None, {"frame": {"duration": 800, "redraw": False},
+                                                     "fromcurrent": True}]),
+                                   dict(label="Pause", method="animate",
+                                        args=[[None], {"frame": {"duration": 0, "redraw": False},
+                                                       "mode": "immediate"}])])]
+    )
+    return fig
+
+# smallest figure the size budget may shrink the slider to
+MIN_SLIDER_POINTS = 50
+MIN_SLIDER_FRAMES = 4
 
-fig.show()
+def export_weekly_slider(path, max_bytes=2 * 1024 * 1024, max_points=2000, max_frames=60, plotlyjs="cdn",
+                         limit=None):
+    """
+    Write the weekly slider without opening a browser: `.json` writes the
+    figure spec, anything else a standalone HTML page (`plotlyjs="inline"`
+    embeds plotly.js, ~3.5 MB, for fully offline use). Points and slider
+    frames are halved together until the figure spec fits `max_bytes`; if it
+    still doesn't at MIN_SLIDER_POINTS / MIN_SLIDER_FRAMES, a warning is
+    printed.
+    """
+    start = time.perf_counter()
+    df_time = run_query(daily_flights_query(limit))
+    points, frames = min(max_points, max(len(df_time), 1)), max_frames
+    while True:
+        fig = compact_weekly_figure(df_time, max_points=points, max_frames=frames)
+        # the budget covers the figure spec; plotly.js is a fixed cost on top
+        spec = fig.to_json()
+        spec_size = len(spec.encode())
+        if spec_size <= max_bytes or (points <= MIN_SLIDER_POINTS and frames <= MIN_SLIDER_FRAMES):
+            break
+        points = max(MIN_SLIDER_POINTS, points // 2)
+        frames = max(MIN_SLIDER_FRAMES, frames // 2)
+    if spec_size > max_bytes:
+        print(f"⚠️ Warning: weekly slider spec is {spec_size / 1024:.1f} KiB even at {len(fig.data[0].x)} points "
+              f"and {len(fig.frames)} frames, over the {max_bytes / 1024:.1f} KiB budget")
+
+    if path.endswith(".json"):
+        payload = spec
+    else:
+        payload = fig.to_html(include_plotlyjs=True if plotlyjs == "inline" else "cdn",
+                              full_html=True, auto_play=False)
+    size = len(payload.encode())
 
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(payload)
+    batch_metrics.record("weekly_slider", time.perf_counter() - start, len(df_time))
+    print(f"[Weekly Slider] {path} — {len(df_time)} days as {len(fig.data[0].x)} points, "
+          f"{len(fig.frames)} frames, {size / 1024:.1f} KiB in {time.perf_counter() - start:.2f}s")
+    return size
 
 # ---------------- EXPORT TO EXCEL ----------------
-def export_to_excel(dataframes_dict, filename):
+def _iter_chunks(data):
+    import pandas as pd
+
+    # a sheet is either a DataFrame or an iterable of DataFrame chunks
+    # (e.g. pd.read_sql(..., chunksize=...)), which is never held in full
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+def export_to_excel(dataframes_dict, filename, max_rows=None, trace_memory=None):
+    """
+    Write every sheet in a single streaming pass with openpyxl's write-only
+    mode: rows go straight to the file and freeze panes, autofilters and the
+    color-scale rules are attached to the same pass, so the workbook is never
+    loaded back or saved twice. `max_rows` caps the data rows per sheet
+    (an int for all sheets or a {sheet: limit} dict). `trace_memory`
+    (default TRACE_MEMORY) also reports the peak memory via tracemalloc.
+    """
+    import pandas as pd
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.formatting.rule import ColorScaleRule
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    os.makedirs("exports", exist_ok=True)
     filepath = f"exports/{filename}"
-    with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-        for sheet_name, df in dataframes_dict.items():
-            # use descriptive titles as sheet names
-            df.to_excel(writer, sheet_name=titles.get(sheet_name, sheet_name), index=False)
-    
-    wb = load_workbook(filepath)
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
+    trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+    if trace_memory:
+        import tracemalloc
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    wb = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    total_rows = 0
+    for sheet_name, data in dataframes_dict.items():
+        limit = max_rows.get(sheet_name) if isinstance(max_rows, dict) else max_rows
+        # use descriptive titles as sheet names
+        ws = wb.create_sheet(title=titles.get(sheet_name, sheet_name))
+        # freeze panes belong to the sheet header, so they must be set before the first row
         ws.freeze_panes = "B2"
-        ws.auto_filter.ref = ws.dimensions
-        for col in ws.iter_cols(min_row=2, min_col=2):
-            col_letter = col[0].column_letter
-            max_row = ws.max_row
+
+        n_rows, n_cols = 0, 0
+        for chunk in _iter_chunks(data):
+            if n_cols == 0:
+                n_cols = len(chunk.columns)
+                header = []
+                for name in chunk.columns:
+                    cell = WriteOnlyCell(ws, value=str(name))
+                    cell.font = header_font
+                    header.append(cell)
+                ws.append(header)
+            if limit is not None:
+                chunk = chunk.head(limit - n_rows)
+            for row in chunk.itertuples(index=False, name=None):
+                # NaN / NaT become empty cells, like DataFrame.to_excel
+                ws.append([None if pd.isna(v) else v for v in row])
+            n_rows += len(chunk)
+            total_rows += len(chunk)
+            if limit is not None and n_rows >= limit:
+                break
+
+        if n_cols == 0:
+            continue
+        max_row = n_rows + 1
+        ws.auto_filter.ref = f"A1:{get_column_letter(n_cols)}{max_row}"
+        for col_idx in range(2, n_cols + 1):
+            col_letter = get_column_letter(col_idx)
             rule = ColorScaleRule(
                 start_type="min", start_color="FFAA0000", 
                 mid_type="percentile", mid_value=50, mid_color="FFFFFF00", 
                 end_type="max", end_color="FF00AA00"
             )
             ws.conditional_formatting.add(f"{col_letter}2:{col_letter}{max_row}", rule)
-    
+
     wb.save(filepath)
-    print(f"[Excel Export] Created file {filename}, {len(dataframes_dict)} sheets")
+    seconds = time.perf_counter() - start
+    memory = ""
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        memory = f", peak memory {peak / 1024 / 1024:.1f} MiB"
+    batch_metrics.record("excel_export", seconds, total_rows)
+    print(f"[Excel Export] Created file {filename}, {len(dataframes_dict)} sheets in {seconds:.2f}s{memory}")
+
+# ---------------- CLI ----------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CloudJet analytics: charts, interactive figure and Excel report")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the query-result cache")
+    parser.add_argument("--rollup", action="store_true", help="read daily counts from flights_daily_rollup")
+    parser.add_argument("--metrics-textfile-dir",
+                        help="write run metrics for node_exporter's textfile collector here (or METRICS_TEXTFILE_DIR)")
+    parser.add_argument("--metrics-pushgateway", help="push run metrics to this Pushgateway (or METRICS_PUSHGATEWAY)")
+    sub = parser.add_subparsers(dest="command")
+
+    charts = sub.add_parser("charts", help="render PNG charts to charts/")
+    charts.add_argument("names", nargs="*", metavar="CHART",
+                        help=f"charts to render (default: all of {', '.join(queries)})")
+    charts.add_argument("--workers", type=int, help="render processes (1 = serial, default: CPU count)")
+    charts.add_argument("--fused", action="store_true", help="share one aggregate across the ticket_flights charts")
+    charts.add_argument("--compare", action="store_true", help="time serial vs parallel rendering")
+
+    interactive = sub.add_parser("interactive", help="weekly slider figure")
+    interactive.add_argument("--export", metavar="PATH", help="write .html/.json headlessly instead of opening a browser")
+    interactive.add_argument("--max-bytes", type=int, default=2 * 1024 * 1024, help="figure spec size budget for --export")
+    interactive.add_argument("--plotlyjs", choices=["cdn", "inline"], default="cdn", help="how --export HTML loads plotly.js")
+
+    export = sub.add_parser("export", help="Excel report of every chart query to exports/")
+    export.add_argument("--filename", default="report.xlsx")
+    export.add_argument("--max-rows", type=int, help="cap the data rows per sheet")
+    export.add_argument("--fused", action="store_true", help="share one aggregate across the ticket_flights charts")
+    export.add_argument("--trace-memory", action="store_true", help="report peak memory (tracemalloc; much slower)")
+
+    sub.add_parser("all", help="charts, interactive figure and Excel report (default)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in getattr(args, "names", []) if name not in queries]
+    if unknown:
+        parser.error(f"unknown chart(s): {', '.join(unknown)} (choose from {', '.join(queries)})")
+    return args
+
+def run_command(command, args):
+    if command == "charts":
+        names = args.names or None
+        if args.compare:
+            compare_rendering(args.workers, fused=args.fused, charts=names)
+        else:
+            render_charts(args.workers, fused=args.fused, charts=names)
+    elif command == "interactive":
+        if args.export:
+            export_weekly_slider(args.export, max_bytes=args.max_bytes, plotlyjs=args.plotlyjs)
+        else:
+            weekly_slider_figure().show()
+    elif command == "export":
+        export_to_excel(fetch_chart_frames(fused=args.fused), args.filename, max_rows=args.max_rows,
+                        trace_memory=args.trace_memory or None)
+    else:
+        render_charts()
+        weekly_slider_figure().show()
+        export_to_excel(fetch_chart_frames(), "report.xlsx")
+
+def main(argv=None):
+    global CACHE_ENABLED
+    args = parse_args(argv)
+    if args.no_cache:
+        CACHE_ENABLED = False
+    if args.rollup:
+        use_rollup()
+    command = args.command or "all"
+
+    with batch_metrics.run("analytics", args.metrics_textfile_dir, args.metrics_pushgateway):
+        run_command(command, args)
+
+    if _query_cache is not None:
+        print(f"[Cache] hits: {_query_cache.hits}")
 
-# Example export
-export_to_excel({name: run_query(q) for name, q in queries.items()}, "report.xlsx")
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import argparse
+import io
 import time
 import random
 from datetime import datetime, timedelta
@@ -6,52 +8,57 @@ from config import DB_URI
 
 engine = create_engine(DB_URI, echo=False)
 
-def auto_insert_flights(interval: int = 10):
-    departure_airports = ['SVO', 'LED', 'DME', 'ULY', 'IAR', 'MQF', 'NYM', 'EGO', 'NFG']
-    arrival_airports = ['KZN', 'ROV', 'KUF', 'KVX', 'IJK', 'RTW', 'PEE']
-    aircraft_codes = ['773', '319', '320', '319', 'CN1']
+departure_airports = ['SVO', 'LED', 'DME', 'ULY', 'IAR', 'MQF', 'NYM', 'EGO', 'NFG']
+arrival_airports = ['KZN', 'ROV', 'KUF', 'KVX', 'IJK', 'RTW', 'PEE']
+aircraft_codes = ['773', '319', '320', '319', 'CN1']
+
+START_FLIGHT_ID = 40000  # start here
+MAX_FLIGHT_ID = 50000  # optional upper limit
+base_date = datetime(2017, 9, 20, 0, 0, 0)  # Fixed start date
+
+insert_query = text("""
+    INSERT INTO flights (
+        flight_id,
+        flight_no, 
+        scheduled_departure, 
+        scheduled_arrival, 
+        departure_airport, 
+        arrival_airport, 
+        aircraft_code, 
+        status
+    )
+    VALUES (:flight_id, :flight_no, :sd, :sa, :dep, :arr, :air, 'Scheduled');
+""")
+
+COPY_COLUMNS = "flight_id, flight_no, scheduled_departure, scheduled_arrival, departure_airport, arrival_airport, aircraft_code, status"
 
-    flight_id = 40000  # start here
-    base_date = datetime(2017, 9, 20, 0, 0, 0)  # Fixed start date
+def make_flight(flight_id: int) -> dict:
+    departure_airport = random.choice(departure_airports)
+    arrival_airport = random.choice([a for a in arrival_airports if a != departure_airport])
+    scheduled_departure = base_date + timedelta(hours=(flight_id - START_FLIGHT_ID))
+    return {
+        'flight_id': flight_id,
+        'flight_no': f"FN{random.randint(1000, 9999)}",
+        'sd': scheduled_departure,
+        'sa': scheduled_departure + timedelta(hours=random.randint(1, 5)),
+        'dep': departure_airport,
+        'arr': arrival_airport,
+        'air': random.choice(aircraft_codes)
+    }
+
+def auto_insert_flights(interval: int = 10):
+    flight_id = START_FLIGHT_ID
 
     print("[STARTED] Auto flight insertion loop...")
 
     try:
-        while flight_id <= 50000:  # optional upper limit
-            flight_no = f"FN{random.randint(1000, 9999)}"
-            departure_airport = random.choice(departure_airports)
-            arrival_airport = random.choice([a for a in arrival_airports if a != departure_airport])
-
-            scheduled_departure = base_date + timedelta(hours=(flight_id - 40000))
-            scheduled_arrival = scheduled_departure + timedelta(hours=random.randint(1, 5))
-            aircraft_code = random.choice(aircraft_codes)
-
-            insert_query = text("""
-                INSERT INTO flights (
-                    flight_id,
-                    flight_no, 
-                    scheduled_departure, 
-                    scheduled_arrival, 
-                    departure_airport, 
-                    arrival_airport, 
-                    aircraft_code, 
-                    status
-                )
-                VALUES (:flight_id, :flight_no, :sd, :sa, :dep, :arr, :air, 'Scheduled');
-            """)
+        while flight_id <= MAX_FLIGHT_ID:
+            flight = make_flight(flight_id)
 
             with engine.begin() as conn:
-                conn.execute(insert_query, {
-                    'flight_id': flight_id,
-                    'flight_no': flight_no,
-                    'sd': scheduled_departure,
-                    'sa': scheduled_arrival,
-                    'dep': departure_airport,
-                    'arr': arrival_airport,
-                    'air': aircraft_code
-                })
-
-            print(f"[INSERTED] flight_id={flight_id} {flight_no} ({departure_airport} → {arrival_airport}) at {scheduled_departure:%Y-%m-%d %H:%M:%S}")
+                conn.execute(insert_query, flight)
+
+            print(f"[INSERTED] flight_id={flight_id} {flight['flight_no']} ({flight['dep']} → {flight['arr']}) at {flight['sd']:%Y-%m-%d %H:%M:%S}")
 
             flight_id += 1
             time.sleep(interval)
@@ -63,5 +70,126 @@ def auto_insert_flights(interval: int = 10):
     except Exception as e:
         print(f"[ERROR] {e}")
 
+# ---------------- HIGH-THROUGHPUT MODE ----------------
+VALUES_SQL = f"INSERT INTO flights ({COPY_COLUMNS}) VALUES %s"
+VALUES_TEMPLATE = "(%(flight_id)s, %(flight_no)s, %(sd)s, %(sa)s, %(dep)s, %(arr)s, %(air)s, 'Scheduled')"
+
+def flush_rows(batch):
+    # executemany: one round trip per row, kept to compare against
+    with engine.begin() as conn:
+        conn.execute(insert_query, batch)
+
+def flush_values(batch):
+    from psycopg2.extras import execute_values
+
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            # page_size = whole batch → a single multi-row INSERT statement
+            execute_values(cursor, VALUES_SQL, batch, template=VALUES_TEMPLATE, page_size=len(batch))
+        raw.commit()
+    finally:
+        raw.close()
+
+def flush_copy(batch):
+    buf = io.StringIO()
+    for f in batch:
+        buf.write(f"{f['flight_id']}\t{f['flight_no']}\t{f['sd']:%Y-%m-%d %H:%M:%S}\t{f['sa']:%Y-%m-%d %H:%M:%S}\t"
+                  f"{f['dep']}\t{f['arr']}\t{f['air']}\tScheduled\n")
+    buf.seek(0)
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cursor:
+            cursor.copy_expert(f"COPY flights ({COPY_COLUMNS}) FROM STDIN", buf)
+        raw.commit()
+    finally:
+        raw.close()
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def auto_insert_flights_batched(rate: float, batch_size: int = 100, method: str = "values",
+                                report_every: float = 5.0, start_id: int = START_FLIGHT_ID,
+                                max_id: int = MAX_FLIGHT_ID):
+    """
+    Insert flights at a target `rate` (flights/sec) in batches of up to
+    `batch_size` rows, flushed either as one multi-row INSERT ("values"),
+    through COPY ("copy") or row by row with executemany ("rows", for
+    comparison).
+
+    The limiter is drift-free: batch n is due at start + rows_sent / rate on
+    an absolute clock, so time spent committing is absorbed instead of being
+    added on top of the sleep. When the database falls behind, batches are
+    sent back to back until the schedule is caught up.
+    """
+    flush = {"values": flush_values, "copy": flush_copy, "rows": flush_rows}[method]
+    # never wait longer than ~1s between flushes at low rates
+    batch_size = max(1, min(batch_size, int(rate) or 1))
+
+    print(f"[STARTED] Batched insertion: target {rate:g} flights/s, batch_size={batch_size}, method={method}")
+
+    flight_id = start_id
+    sent = 0
+    latencies = []
+    start = time.perf_counter()
+    last_report, last_sent, last_commit = start, 0, 0
+
+    try:
+        while flight_id <= max_id:
+            n = min(batch_size, max_id - flight_id + 1)
+            due = start + (sent + n) / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            batch = [make_flight(fid) for fid in range(flight_id, flight_id + n)]
+            t0 = time.perf_counter()
+            flush(batch)
+            latencies.append(time.perf_counter() - t0)
+
+            flight_id += n
+            sent += n
+
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                window = sorted(latencies[last_commit:])
+                print(f"[THROUGHPUT] {(sent - last_sent) / (now - last_report):,.1f} flights/s "
+                      f"(target {rate:g}), commit p50={percentile(window, 50) * 1000:.1f} ms "
+                      f"p99={percentile(window, 99) * 1000:.1f} ms, last flight_id={flight_id - 1}")
+                last_report, last_sent, last_commit = now, sent, len(latencies)
+
+        print("Reached the maximum flight_id limit.")
+
+    except KeyboardInterrupt:
+        print("\n[STOPPED] Flight insertion stopped by user.")
+    except Exception as e:
+        print(f"[ERROR] {e}")
+    finally:
+        elapsed = time.perf_counter() - start
+        lat = sorted(latencies)
+        if sent and elapsed > 0:
+            print(f"[SUMMARY] {sent} flights in {elapsed:.2f}s = {sent / elapsed:,.1f} flights/s "
+                  f"(target {rate:g}); {len(lat)} commits, latency p50={percentile(lat, 50) * 1000:.1f} ms "
+                  f"p95={percentile(lat, 95) * 1000:.1f} ms max={lat[-1] * 1000:.1f} ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Simulated live feed of new flights")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between single-row inserts (default mode)")
+    parser.add_argument("--rate", type=float, help="target flights/sec; enables the batched high-throughput mode")
+    parser.add_argument("--batch-size", type=int, default=100, help="rows per commit in batched mode")
+    parser.add_argument("--method", choices=["values", "copy", "rows"], default="values",
+                        help="multi-row INSERT, COPY or per-row executemany for batched mode")
+    parser.add_argument("--start-id", type=int, default=START_FLIGHT_ID)
+    parser.add_argument("--max-id", type=int, default=MAX_FLIGHT_ID)
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    auto_insert_flights(interval=5)
+    args = parse_args()
+    if args.rate:
+        auto_insert_flights_batched(args.rate, batch_size=args.batch_size, method=args.method,
+                                    start_id=args.start_id, max_id=args.max_id)
+    else:
+        auto_insert_flights(interval=args.interval)
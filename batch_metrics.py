@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus instrumentation for the batch entry points (main.py, analytics.py).
+#
+# Stages record their duration and row counts while the job runs; when the job
+# ends, the totals plus the bytes written under charts/ and exports/ are
+# published once, either as a node_exporter textfile-collector file (written
+# atomically: temp file + rename) or to a Pushgateway. prometheus_client is
+# only imported at publish time, so uninstrumented runs don't pay for it.
+
+OUTPUT_DIRS = ("charts", "exports")
+
+# METRICS_TEXTFILE_DIR / METRICS_PUSHGATEWAY enable publishing without CLI flags
+TEXTFILE_DIR = os.environ.get("METRICS_TEXTFILE_DIR")
+PUSHGATEWAY = os.environ.get("METRICS_PUSHGATEWAY")
+
+class BatchMetrics:
+    """Per-stage seconds and rows of one batch run, safe to update from threads."""
+
+    def __init__(self, job):
+        self.job = job
+        self.started = time.time()
+        self.seconds = {}
+        self.rows = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, rows=None):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            if rows is not None:
+                self.rows[stage] = self.rows.get(stage, 0) + rows
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def bytes_written(self, directories=OUTPUT_DIRS):
+        """{directory: bytes} of the files created or modified under each directory during this run."""
+        written = {}
+        for directory in directories:
+            total = 0
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    stat = os.stat(os.path.join(root, name))
+                    if stat.st_mtime >= self.started:
+                        total += stat.st_size
+            written[directory] = total
+        return written
+
+    def registry(self, duration, success):
+        from prometheus_client import CollectorRegistry, Gauge
+
+        # the label is `batch`, not `job`: the Pushgateway grouping key and
+        # Prometheus' scrape target already own `job`
+        registry = CollectorRegistry()
+        stage_seconds = Gauge("cloudjet_batch_stage_duration_seconds", "Seconds spent per stage of the last run",
+                              ["batch", "stage"], registry=registry)
+        stage_rows = Gauge("cloudjet_batch_stage_rows", "Rows returned or written per stage of the last run",
+                           ["batch", "stage"], registry=registry)
+        written = Gauge("cloudjet_batch_bytes_written", "Bytes written per output directory in the last run",
+                        ["batch", "directory"], registry=registry)
+        run_seconds = Gauge("cloudjet_batch_duration_seconds", "Wall-clock seconds of the last run",
+                            ["batch"], registry=registry)
+        run_success = Gauge("cloudjet_batch_success", "1 if the last run finished without an exception",
+                            ["batch"], registry=registry)
+        last_run = Gauge("cloudjet_batch_last_run_timestamp_seconds", "Unix time the last run finished",
+                         ["batch"], registry=registry)
+
+        with self._lock:
+            for stage, seconds in self.seconds.items():
+                stage_seconds.labels(self.job, stage).set(seconds)
+            for stage, rows in self.rows.items():
+                stage_rows.labels(self.job, stage).set(rows)
+        for directory, size in self.bytes_written().items():
+            written.labels(self.job, directory).set(size)
+        run_seconds.labels(self.job).set(duration)
+        run_success.labels(self.job).set(int(success))
+        last_run.labels(self.job).set(time.time())
+        return registry
+
+    def publish(self, duration, success, textfile_dir=None, pushgateway=None):
+        registry = self.registry(duration, success)
+        if textfile_dir:
+            from prometheus_client import write_to_textfile
+
+            os.makedirs(textfile_dir, exist_ok=True)
+            path = os.path.join(textfile_dir, f"cloudjet_{self.job}.prom")
+            # writes a temp file next to `path` and renames it over the old one
+            write_to_textfile(path, registry)
+            print(f"[Metrics] wrote {path}")
+        if pushgateway:
+            from prometheus_client import push_to_gateway
+
+            push_to_gateway(pushgateway, job=f"cloudjet_{self.job}", registry=registry)
+            print(f"[Metrics] pushed to {pushgateway}")
+
+# the run in progress; stays a no-op sink outside of run()
+current = BatchMetrics("unconfigured")
+
+def record(stage, seconds, rows=None):
+    current.record(stage, seconds, rows)
+
+def stage(name):
+    return current.stage(name)
+
+@contextmanager
+def run(job, textfile_dir=None, pushgateway=None):
+    """
+    Instrument one batch run of `job` and publish its metrics when it ends,
+    even if it fails. Without a textfile directory or gateway (argument or
+    environment) nothing is published.
+    """
+    global current
+    current = BatchMetrics(job)
+    textfile_dir = textfile_dir or TEXTFILE_DIR
+    pushgateway = pushgateway or PUSHGATEWAY
+    start = time.perf_counter()
+    success = False
+    try:
+        yield current
+        success = True
+    finally:
+        if textfile_dir or pushgateway:
+            try:
+                current.publish(time.perf_counter() - start, success, textfile_dir, pushgateway)
+            except Exception as e:
+                # metrics must never turn a finished batch into a failed one
+                print(f"[Metrics] could not publish: {e}")
@@ -0,0 +1,279 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import psycopg2
+
+import sql_catalog
+
+# Query latency regression benchmark.
+#
+# For every catalog entry (queries.sql, analytics.py, Superset datasets) it
+# records cold and warm latency percentiles, row counts, shared-buffer hits /
+# reads and the EXPLAIN (ANALYZE, BUFFERS) plan, appends the run to a JSON
+# history file and fails when a query regresses past --threshold compared
+# with the stored baseline run.
+
+DEFAULT_HISTORY = os.path.join(sql_catalog.BASE_DIR, "bench", "query_history.json")
+
+# ---------------- DISPOSABLE POSTGRESQL ----------------
+class EphemeralPostgres:
+    """Throwaway cluster in a temp dir (initdb + pg_ctl), removed on exit."""
+
+    def __init__(self, pg_bin=None):
+        self.pg_bin = pg_bin
+        self.datadir = None
+        self.port = None
+
+    def _bin(self, name):
+        path = os.path.join(self.pg_bin, name) if self.pg_bin else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"{name} not found; pass --pg-bin or use --dsn")
+        return path
+
+    @property
+    def dsn(self):
+        return f"postgresql://postgres@127.0.0.1:{self.port}/postgres"
+
+    def start(self):
+        self.datadir = tempfile.mkdtemp(prefix="cloudjet_bench_")
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        subprocess.run([self._bin("initdb"), "-D", self.datadir, "-U", "postgres", "-A", "trust"],
+                       check=True, capture_output=True)
+        self._pg_ctl("start", "-w", "-o", f"-p {self.port} -k {self.datadir} -c listen_addresses=127.0.0.1")
+        return self
+
+    def _pg_ctl(self, *args):
+        subprocess.run([self._bin("pg_ctl"), "-D", self.datadir, "-l", os.path.join(self.datadir, "log"), *args],
+                       check=True, capture_output=True)
+
+    def restart(self):
+        # empties shared_buffers for a colder "cold" run (the OS page cache stays warm)
+        self._pg_ctl("restart", "-w", "-o", f"-p {self.port} -k {self.datadir} -c listen_addresses=127.0.0.1")
+
+    def stop(self):
+        if self.datadir:
+            try:
+                self._pg_ctl("stop", "-m", "fast")
+            finally:
+                shutil.rmtree(self.datadir, ignore_errors=True)
+                self.datadir = None
+
+def run_setup(dsn, setup_files, flights_csv=None):
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            for path in setup_files:
+                with open(path) as f:
+                    cursor.execute(f.read())
+                print(f"[Setup] {path}")
+        conn.commit()
+    finally:
+        conn.close()
+    if flights_csv:
+        from load_flights import load_file
+        rows, seconds = load_file(flights_csv, uri=dsn)
+        print(f"[Setup] {flights_csv}: {rows} rows in {seconds:.2f}s")
+
+# ---------------- MEASUREMENT ----------------
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    # nearest rank
+    idx = min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))
+    return values[idx]
+
+def summarize(latencies):
+    return {f"p{p}": round(percentile(latencies, p) * 1000, 3) for p in (50, 95, 99)}
+
+def execute(conn, sql):
+    start = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+        rows = len(cursor.fetchall())
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    return elapsed, rows
+
+def explain(conn, sql):
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0][0]
+    conn.rollback()
+    top = plan["Plan"]
+    return plan, {
+        "shared_hit_blocks": top.get("Shared Hit Blocks", 0),
+        "shared_read_blocks": top.get("Shared Read Blocks", 0),
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+    }
+
+def bench_entry(entry, dsn, cold_runs, warm_runs, restart=None):
+    """Cold runs each use a fresh connection (and a restarted server with `restart`)."""
+    cold = []
+    rows = None
+    for _ in range(cold_runs):
+        if restart:
+            restart()
+        conn = psycopg2.connect(dsn)
+        try:
+            elapsed, rows = execute(conn, entry.sql)
+            cold.append(elapsed)
+        finally:
+            conn.close()
+
+    conn = psycopg2.connect(dsn)
+    try:
+        warm = []
+        for _ in range(warm_runs):
+            elapsed, rows = execute(conn, entry.sql)
+            warm.append(elapsed)
+        plan, buffers = explain(conn, entry.sql)
+    finally:
+        conn.close()
+
+    return {
+        "source": entry.source,
+        "rows": rows,
+        "cold_ms": summarize(cold) if cold else None,
+        "warm_ms": summarize(warm),
+        **buffers,
+        "plan": plan,
+    }
+
+# ---------------- HISTORY ----------------
+def load_history(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"baseline": None, "runs": []}
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(history, f, indent=1, default=str)
+    os.replace(tmp, path)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=sql_catalog.BASE_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+def find_regressions(baseline, results, threshold, min_ms):
+    """Queries whose warm p50 grew by more than `threshold` (fraction) and `min_ms`."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or "error" in before or "error" in result:
+            continue
+        old, new = before["warm_ms"]["p50"], result["warm_ms"]["p50"]
+        # a 0 ms baseline (timer resolution) has no meaningful ratio; min_ms decides alone
+        if (new > old * (1 + threshold) or old <= 0) and new - old >= min_ms:
+            regressions.append((name, old, new))
+    return regressions
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query latency regression benchmark with EXPLAIN ANALYZE capture")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--dsn", help="database to benchmark (default: config.DB_URI)")
+    target.add_argument("--ephemeral", action="store_true", help="start a disposable local PostgreSQL cluster")
+    parser.add_argument("--pg-bin", help="directory with initdb/pg_ctl for --ephemeral")
+    parser.add_argument("--scale", type=float, default=0.05,
+                        help="--ephemeral: load generate_data.py's schema and data at this scale factor (0 = empty)")
+    parser.add_argument("--setup", nargs="*", default=[], help="SQL files run before benchmarking (schema, data)")
+    parser.add_argument("--load-flights", metavar="CSV", help="COPY a flights CSV in after --setup")
+    parser.add_argument("--restart-cold", action="store_true", help="restart the ephemeral server before each cold run")
+    parser.add_argument("--sources", nargs="*", default=list(sql_catalog.SOURCES), choices=list(sql_catalog.SOURCES))
+    parser.add_argument("--only", nargs="*", help="benchmark entries whose name contains any of these")
+    parser.add_argument("--cold-runs", type=int, default=1)
+    parser.add_argument("--warm-runs", type=int, default=10)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--label", help="free-form label stored with the run")
+    parser.add_argument("--set-baseline", action="store_true", help="make this run the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed warm p50 growth vs baseline (0.2 = 20%%)")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore regressions smaller than this")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    entries = sql_catalog.collect(args.sources, args.only)
+
+    server = None
+    if args.ephemeral:
+        server = EphemeralPostgres(args.pg_bin).start()
+        dsn = server.dsn
+        print(f"[Ephemeral] PostgreSQL on port {server.port}")
+    else:
+        if args.dsn:
+            dsn = args.dsn
+        else:
+            import config
+            dsn = config.DB_URI
+
+    results = {}
+    try:
+        if server and args.scale > 0:
+            # the new cluster is empty; give it the eight tables and synthetic rows
+            import generate_data
+            generate_data.generate(args.scale, dsn=dsn, create_schema=True, constraints=True,
+                                   csv_path=os.path.join(sql_catalog.BASE_DIR, "flights.csv"))
+        if args.setup or args.load_flights:
+            run_setup(dsn, args.setup, args.load_flights)
+        restart = server.restart if (server and args.restart_cold) else None
+        for entry in entries:
+            try:
+                result = bench_entry(entry, dsn, args.cold_runs, args.warm_runs, restart)
+            except psycopg2.Error as e:
+                results[entry.name] = {"source": entry.source, "error": str(e).strip()}
+                print(f"[ERROR] {entry.name}: {str(e).strip().splitlines()[0]}")
+                continue
+            results[entry.name] = result
+            cold = f"{result['cold_ms']['p50']:.1f}" if result["cold_ms"] else "-"
+            print(f"{entry.name:<60} rows={result['rows']:<7} cold={cold:>8} ms  "
+                  f"warm p50={result['warm_ms']['p50']:.1f} p95={result['warm_ms']['p95']:.1f} ms  "
+                  f"hit={result['shared_hit_blocks']} read={result['shared_read_blocks']}")
+    finally:
+        if server:
+            server.stop()
+
+    history = load_history(args.history)
+    run = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "label": args.label,
+        "target": "ephemeral" if args.ephemeral else "dsn",
+        "results": results,
+    }
+    history["runs"].append(run)
+    baseline_idx = history.get("baseline")
+    if args.set_baseline or baseline_idx is None:
+        history["baseline"] = len(history["runs"]) - 1
+        print(f"[Baseline] run {history['baseline']} stored as baseline")
+        regressions = []
+    else:
+        baseline = history["runs"][baseline_idx]
+        regressions = find_regressions(baseline, results, args.threshold, args.min_ms)
+    save_history(args.history, history)
+    print(f"[History] {args.history} ({len(history['runs'])} runs)")
+
+    for name, old, new in regressions:
+        growth = f"+{(new / old - 1) * 100:.0f}%" if old > 0 else f"+{new - old:.1f} ms"
+        print(f"[REGRESSION] {name}: warm p50 {old:.1f} ms → {new:.1f} ms ({growth})")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup-time check for the analytics.py CLI: `--help` must not pull in any
+# heavy library, and a single-chart run must not import plotly or openpyxl.
+
+HEAVY_MODULES = ["pandas", "numpy", "matplotlib", "plotly", "sqlalchemy", "openpyxl"]
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics.py")
+
+def run_timed(args, repeat):
+    """Median wall-clock of `python -X importtime <args>` and the modules the last run imported."""
+    times, stderr = [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", SCRIPT, *args],
+                              capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        stderr = proc.stderr
+        if proc.returncode != 0:
+            raise RuntimeError(f"analytics.py {' '.join(args)} failed:\n{stderr[-2000:]}")
+    return statistics.median(times), imported_modules(stderr)
+
+def imported_modules(importtime_stderr):
+    # lines look like: "import time:       123 |        456 |   pandas.core"
+    modules = set()
+    for line in importtime_stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            modules.add(name.split(".")[0])
+    return modules
+
+def check(label, args, budget, forbidden, repeat):
+    seconds, modules = run_timed(args, repeat)
+    leaked = sorted(m for m in forbidden if m in modules)
+    ok = seconds <= budget and not leaked
+    status = "OK" if ok else "FAIL"
+    print(f"[{status}] {label}: median {seconds * 1000:.0f} ms (budget {budget * 1000:.0f} ms)"
+          + (f", unexpected imports: {', '.join(leaked)}" if leaked else ""))
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startup-time benchmark for the analytics.py CLI")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--help-budget", type=float, default=0.5, help="seconds allowed for `--help`")
+    parser.add_argument("--chart-budget", type=float, default=5.0, help="seconds allowed for a single chart")
+    parser.add_argument("--chart", default="bar", help="chart used for the single-chart run")
+    parser.add_argument("--with-db", action="store_true",
+                        help="also time a real single-chart run (needs the database from config.py)")
+    args = parser.parse_args()
+
+    ok = check("analytics.py --help", ["--help"], args.help_budget, HEAVY_MODULES, args.repeat)
+    if args.with_db:
+        ok &= check(f"analytics.py charts {args.chart}",
+                    ["--no-cache", "charts", args.chart, "--workers", "1"],
+                    args.chart_budget, ["plotly", "openpyxl"], args.repeat)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,147 @@
+import argparse
+import time
+
+# Incrementally maintained "flights per departure date and status" rollup.
+#
+# Statement-level triggers with transition tables apply the delta of every
+# INSERT / UPDATE / DELETE on flights, so the cost of keeping the rollup
+# current is proportional to the rows touched, not to the size of flights.
+# DATE() follows the TimeZone of the writing session, like the original
+# GROUP BY DATE(scheduled_departure) did for the reading session.
+#
+# Superset datasets can read it the same way analytics.py does:
+#   SELECT dep_date, SUM(total_flights) AS total_flights
+#   FROM flights_daily_rollup GROUP BY dep_date ORDER BY dep_date
+
+ROLLUP_TABLE = "flights_daily_rollup"
+
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        dep_date date NOT NULL,
+        status text NOT NULL,
+        total_flights bigint NOT NULL,
+        PRIMARY KEY (dep_date, status)
+    )
+"""
+
+# delta of one transition table, signed +1 (new rows) or -1 (old rows)
+APPLY_DELTA = """
+    INSERT INTO {table} (dep_date, status, total_flights)
+    SELECT DATE(scheduled_departure), COALESCE(status, 'Unknown'), {sign} * COUNT(*)
+    FROM {rows}
+    WHERE scheduled_departure IS NOT NULL
+    GROUP BY 1, 2
+    ON CONFLICT (dep_date, status)
+    DO UPDATE SET total_flights = {table}.total_flights + EXCLUDED.total_flights
+"""
+
+CREATE_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION {ROLLUP_TABLE}_apply() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            {APPLY_DELTA.format(table=ROLLUP_TABLE, rows="old_rows", sign=-1)};
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            {APPLY_DELTA.format(table=ROLLUP_TABLE, rows="new_rows", sign=1)};
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+# transition tables are only allowed on single-event triggers
+TRIGGERS = {
+    "ins": "AFTER INSERT ON flights REFERENCING NEW TABLE AS new_rows",
+    "upd": "AFTER UPDATE ON flights REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "del": "AFTER DELETE ON flights REFERENCING OLD TABLE AS old_rows",
+}
+
+LIVE_AGGREGATE = """
+    SELECT DATE(scheduled_departure) AS dep_date, COALESCE(status, 'Unknown') AS status,
+           COUNT(*) AS total_flights
+    FROM flights
+    WHERE scheduled_departure IS NOT NULL
+    GROUP BY 1, 2
+"""
+
+def daily_flights_sql(limit=None) -> str:
+    """Same shape as the analytics "line" query, served from the rollup."""
+    limit_clause = f"LIMIT {int(limit)}" if limit is not None else ""
+    return f"""
+        SELECT dep_date, SUM(total_flights) AS total_flights
+        FROM {ROLLUP_TABLE}
+        GROUP BY dep_date
+        HAVING SUM(total_flights) > 0
+        ORDER BY dep_date
+        {limit_clause};
+    """
+
+def install(engine):
+    """Create the rollup table and triggers, then populate it from scratch."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(CREATE_TABLE)
+        conn.exec_driver_sql(CREATE_FUNCTION)
+        for suffix, spec in TRIGGERS.items():
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {ROLLUP_TABLE}_{suffix} ON flights")
+            conn.exec_driver_sql(f"CREATE TRIGGER {ROLLUP_TABLE}_{suffix} {spec} "
+                                 f"FOR EACH STATEMENT EXECUTE PROCEDURE {ROLLUP_TABLE}_apply()")
+    print(f"[ROLLUP] Installed {ROLLUP_TABLE} and triggers on flights")
+    rebuild(engine)
+
+def uninstall(engine):
+    with engine.begin() as conn:
+        for suffix in TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {ROLLUP_TABLE}_{suffix} ON flights")
+        conn.exec_driver_sql(f"DROP FUNCTION IF EXISTS {ROLLUP_TABLE}_apply()")
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {ROLLUP_TABLE}")
+    print(f"[ROLLUP] Removed {ROLLUP_TABLE}")
+
+def rebuild(engine):
+    """Recompute the rollup from flights. Writers are blocked for the duration."""
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("LOCK TABLE flights IN SHARE MODE")
+        conn.exec_driver_sql(f"TRUNCATE {ROLLUP_TABLE}")
+        result = conn.exec_driver_sql(
+            f"INSERT INTO {ROLLUP_TABLE} (dep_date, status, total_flights) {LIVE_AGGREGATE}")
+    print(f"[ROLLUP] Rebuilt {result.rowcount} rows in {time.perf_counter() - start:.2f}s")
+
+def check(engine, show=20):
+    """Compare the rollup with a live GROUP BY over flights. Returns True when consistent."""
+    diff_sql = f"""
+        SELECT COALESCE(l.dep_date, r.dep_date) AS dep_date,
+               COALESCE(l.status, r.status) AS status,
+               COALESCE(l.total_flights, 0) AS live,
+               COALESCE(r.total_flights, 0) AS rollup
+        FROM ({LIVE_AGGREGATE}) l
+        FULL OUTER JOIN {ROLLUP_TABLE} r ON l.dep_date = r.dep_date AND l.status = r.status
+        WHERE COALESCE(l.total_flights, 0) <> COALESCE(r.total_flights, 0)
+        ORDER BY 1, 2
+    """
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(diff_sql).fetchall()
+    if not rows:
+        print(f"[ROLLUP] {ROLLUP_TABLE} is consistent with flights")
+        return True
+    print(f"[ROLLUP] {len(rows)} mismatching (dep_date, status) groups:")
+    for row in rows[:show]:
+        print(f"  {row.dep_date} {row.status}: live={row.live} rollup={row.rollup}")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the flights_daily_rollup table")
+    parser.add_argument("command", choices=["install", "rebuild", "check", "uninstall"])
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine
+    from config import DB_URI
+    engine = create_engine(DB_URI)
+    if args.command == "install":
+        install(engine)
+    elif args.command == "rebuild":
+        rebuild(engine)
+    elif args.command == "check":
+        raise SystemExit(0 if check(engine) else 1)
+    else:
+        uninstall(engine)
@@ -0,0 +1,433 @@
+import argparse
+import csv
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+# Deterministic synthetic data for all eight airline tables at a given scale
+# factor. SF=1 has the demo dataset's ≈33k flights but fuller planes
+# (≈1.8M ticket_flights); SF=100 is ≈180M ticket_flights. book_ref is six
+# base-36 characters, which caps the scale at MAX_SCALE (≈1640).
+#
+# Flights are generated in independent chunks seeded with (seed, chunk), so
+# any chunk can be produced by any process in any order and the output is
+# the same for the same seed. Every chunk owns its key ranges (flight_id,
+# ticket_no, book_ref), which keeps referential integrity without any
+# coordination between processes.
+
+FLIGHTS_PER_SF = 33121
+FLIGHTS_PER_CHUNK = 5000
+# book_ref space reserved per chunk: a 5,000-flight chunk makes ≈75-79k
+# bookings, so this is ~2.5x headroom; book_refs() asserts it is never exceeded
+BOOKINGS_PER_CHUNK = 200_000
+MAX_CHUNKS = 36 ** 6 // BOOKINGS_PER_CHUNK  # chunks before book_refs would wrap
+MAX_SCALE = MAX_CHUNKS * FLIGHTS_PER_CHUNK / FLIGHTS_PER_SF
+START_DATE = np.datetime64("2017-07-15T00:00:00")
+
+# code: (model, range, business, comfort, economy seats, flight-share weight, duration hours)
+AIRCRAFTS = {
+    "773": ("Boeing 777-300", 11100, 30, 48, 324, 0.02, (3.0, 9.0)),
+    "763": ("Boeing 767-300", 7900, 30, 0, 192, 0.04, (2.5, 8.0)),
+    "SU9": ("Sukhoi Superjet-100", 3000, 12, 0, 85, 0.26, (1.0, 3.5)),
+    "320": ("Airbus A320-200", 5700, 20, 0, 120, 0.02, (1.5, 5.0)),
+    "321": ("Airbus A321-200", 5600, 28, 0, 142, 0.06, (1.5, 5.0)),
+    "319": ("Airbus A319-100", 6700, 20, 0, 96, 0.04, (1.5, 5.5)),
+    "733": ("Boeing 737-300", 4200, 12, 0, 118, 0.04, (1.5, 4.5)),
+    "CN1": ("Cessna 208 Caravan", 1200, 0, 0, 12, 0.27, (0.5, 2.0)),
+    "CR2": ("Bombardier CRJ-200", 2700, 0, 0, 50, 0.25, (0.75, 2.5)),
+}
+
+KNOWN_CITIES = {
+    "SVO": ("Sheremetyevo International Airport", "Moscow"),
+    "DME": ("Domodedovo International Airport", "Moscow"),
+    "VKO": ("Vnukovo International Airport", "Moscow"),
+    "LED": ("Pulkovo Airport", "St. Petersburg"),
+    "KZN": ("Kazan International Airport", "Kazan"),
+    "ROV": ("Rostov-on-Don Airport", "Rostov"),
+    "AER": ("Sochi International Airport", "Sochi"),
+    "SVX": ("Koltsovo Airport", "Yekaterinburg"),
+    "OVB": ("Tolmachevo Airport", "Novosibirsk"),
+    "UFA": ("Ufa International Airport", "Ufa"),
+    "KUF": ("Kurumoch International Airport", "Samara"),
+    "PEE": ("Bolshoye Savino Airport", "Perm"),
+    "VVO": ("Vladivostok International Airport", "Vladivostok"),
+    "KJA": ("Yemelyanovo Airport", "Krasnoyarsk"),
+    "IKT": ("Irkutsk Airport", "Irkutsk"),
+}
+
+FARE_CLASSES = np.array(["Business", "Comfort", "Economy"])
+FARE_MULTIPLIER = np.array([3.2, 1.6, 1.0])
+FARE_FILL = np.array([0.8, 0.9, 1.0])  # premium cabins fill a little less
+
+FIRST_NAMES = np.array(["ALEKSANDR", "SERGEY", "VLADIMIR", "ELENA", "TATYANA", "ANDREY", "NATALIYA",
+                        "OLGA", "DMITRIY", "IRINA", "ALEKSEY", "SVETLANA", "MARIYA", "NIKOLAY", "ANNA"])
+LAST_NAMES = np.array(["IVANOV", "KUZNECOV", "POPOV", "VASILEV", "PETROV", "SMIRNOV", "MIKHAYLOV",
+                       "FEDOROV", "SOKOLOV", "YAKOVLEV", "POPOVA", "IVANOVA", "KUZNECOVA", "ORLOV", "VOLKOV"])
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS aircrafts_data (aircraft_code char(3), model text, range integer);
+    CREATE TABLE IF NOT EXISTS airports_data (airport_code char(3), airport_name text, city text,
+                                              coordinates point, timezone text);
+    CREATE TABLE IF NOT EXISTS seats (aircraft_code char(3), seat_no varchar(4), fare_conditions varchar(10));
+    CREATE TABLE IF NOT EXISTS flights (flight_id integer, flight_no char(6),
+                                        scheduled_departure timestamptz, scheduled_arrival timestamptz,
+                                        departure_airport char(3), arrival_airport char(3),
+                                        status varchar(20), aircraft_code char(3),
+                                        actual_departure timestamptz, actual_arrival timestamptz);
+    CREATE TABLE IF NOT EXISTS bookings (book_ref char(6), book_date timestamptz, total_amount numeric(10,2));
+    CREATE TABLE IF NOT EXISTS tickets (ticket_no char(13), book_ref char(6), passenger_id varchar(20),
+                                        passenger_name text, contact_data jsonb);
+    CREATE TABLE IF NOT EXISTS ticket_flights (ticket_no char(13), flight_id integer,
+                                               fare_conditions varchar(10), amount numeric(10,2));
+    CREATE TABLE IF NOT EXISTS boarding_passes (ticket_no char(13), flight_id integer,
+                                                boarding_no integer, seat_no varchar(4));
+"""
+
+# added after the load: building them once is much cheaper than maintaining them per row
+CONSTRAINTS = """
+    ALTER TABLE aircrafts_data ADD PRIMARY KEY (aircraft_code);
+    ALTER TABLE airports_data ADD PRIMARY KEY (airport_code);
+    ALTER TABLE seats ADD PRIMARY KEY (aircraft_code, seat_no),
+        ADD FOREIGN KEY (aircraft_code) REFERENCES aircrafts_data;
+    ALTER TABLE flights ADD PRIMARY KEY (flight_id),
+        ADD FOREIGN KEY (aircraft_code) REFERENCES aircrafts_data,
+        ADD FOREIGN KEY (departure_airport) REFERENCES airports_data,
+        ADD FOREIGN KEY (arrival_airport) REFERENCES airports_data;
+    ALTER TABLE bookings ADD PRIMARY KEY (book_ref);
+    ALTER TABLE tickets ADD PRIMARY KEY (ticket_no), ADD FOREIGN KEY (book_ref) REFERENCES bookings;
+    ALTER TABLE ticket_flights ADD PRIMARY KEY (ticket_no, flight_id),
+        ADD FOREIGN KEY (ticket_no) REFERENCES tickets, ADD FOREIGN KEY (flight_id) REFERENCES flights;
+    ALTER TABLE boarding_passes ADD PRIMARY KEY (ticket_no, flight_id),
+        ADD UNIQUE (flight_id, seat_no), ADD FOREIGN KEY (ticket_no, flight_id) REFERENCES ticket_flights;
+"""
+
+TABLES = ["aircrafts_data", "airports_data", "seats", "flights", "bookings", "tickets",
+          "ticket_flights", "boarding_passes"]
+
+# ---------------- DIMENSIONS ----------------
+def airport_codes(csv_path="flights.csv", seed=0):
+    """The 104 airport codes used by flights.csv, or synthetic ones if it is missing."""
+    if os.path.exists(csv_path):
+        codes = pd.read_csv(csv_path, usecols=["departure_airport", "arrival_airport"])
+        return sorted(set(codes["departure_airport"]) | set(codes["arrival_airport"]))
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    extra = {"".join(rng.choice(letters, 3)) for _ in range(200)} - set(KNOWN_CITIES)
+    return sorted(set(KNOWN_CITIES) | set(sorted(extra)[:104 - len(KNOWN_CITIES)]))
+
+def dimension_tables(codes, seed=0):
+    rng = np.random.default_rng([seed, 0])
+    aircrafts = pd.DataFrame([(code, spec[0], spec[1]) for code, spec in AIRCRAFTS.items()],
+                             columns=["aircraft_code", "model", "range"])
+    airports = pd.DataFrame({
+        "airport_code": codes,
+        "airport_name": [KNOWN_CITIES.get(c, (f"{c} Airport", ""))[0] for c in codes],
+        "city": [KNOWN_CITIES.get(c, ("", f"City {c}"))[1] for c in codes],
+        "coordinates": [f"({lon:.4f},{lat:.4f})" for lon, lat in
+                        zip(rng.uniform(20, 170, len(codes)), rng.uniform(42, 70, len(codes)))],
+        "timezone": "Europe/Moscow",
+    })
+    rows = []
+    for code, (_, _, business, comfort, economy, _, _) in AIRCRAFTS.items():
+        row = 1
+        for fare, count in zip(FARE_CLASSES, (business, comfort, economy)):
+            # 4 seats per row in premium cabins (1A..1D), 6 in economy (10A..10F)
+            per_row = 4 if fare != "Economy" else 6
+            for k in range(count):
+                rows.append((code, f"{row + k // per_row}{'ABCDEF'[k % per_row]}", fare))
+            row += -(-count // per_row)
+    seats = pd.DataFrame(rows, columns=["aircraft_code", "seat_no", "fare_conditions"])
+    return {"aircrafts_data": aircrafts, "airports_data": airports, "seats": seats}
+
+def route_table(codes, seed=0, n_routes=700):
+    """Fixed (SF-independent) routes: flight_no, airports, aircraft, duration, departure time of day."""
+    rng = np.random.default_rng([seed, 1])
+    # hub-heavy airport popularity (Zipf-like), Moscow and St. Petersburg first
+    shuffled = rng.permutation(np.array(codes))
+    is_hub = np.isin(shuffled, ["SVO", "DME", "VKO", "LED"])
+    ranked = np.concatenate([shuffled[is_hub], shuffled[~is_hub]])
+    weights = 1 / np.arange(1, len(ranked) + 1) ** 0.8
+    weights /= weights.sum()
+    dep = ranked[rng.choice(len(ranked), n_routes, p=weights)]
+    arr = ranked[rng.choice(len(ranked), n_routes, p=weights)]
+    while (clash := dep == arr).any():
+        arr[clash] = ranked[rng.choice(len(ranked), clash.sum(), p=weights)]
+
+    aircraft_codes = np.array(list(AIRCRAFTS))
+    shares = np.array([spec[5] for spec in AIRCRAFTS.values()])
+    aircraft = aircraft_codes[rng.choice(len(aircraft_codes), n_routes, p=shares / shares.sum())]
+    lo = np.array([AIRCRAFTS[a][6][0] for a in aircraft])
+    hi = np.array([AIRCRAFTS[a][6][1] for a in aircraft])
+    minutes = (rng.uniform(lo, hi) * 12).round() * 5  # 5-minute steps
+    return pd.DataFrame({
+        "flight_no": [f"PG{i:04d}" for i in range(1, n_routes + 1)],
+        "departure_airport": dep, "arrival_airport": arr, "aircraft_code": aircraft,
+        "duration_min": minutes.astype(np.int64),
+        "dep_minute": (rng.integers(6 * 12, 23 * 12, n_routes) * 5).astype(np.int64),
+        "base_fare": (minutes / 60 * rng.uniform(2500, 4500, n_routes) / 100).round() * 100,
+    })
+
+# ---------------- FACT CHUNKS ----------------
+def ticket_numbers(chunk, local):
+    return np.char.add(f"{chunk:06d}", np.char.zfill(local.astype(str), 7))
+
+def book_refs(chunk, local):
+    """Six base-36 characters, unique across chunks (as long as chunk < MAX_CHUNKS)."""
+    number = chunk * BOOKINGS_PER_CHUNK + local
+    assert chunk < MAX_CHUNKS and (len(local) == 0 or local.max() < BOOKINGS_PER_CHUNK), "book_ref space exhausted"
+    digits = np.empty((len(number), 6), dtype="<U1")
+    alphabet = np.array(list("0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    for pos in range(5, -1, -1):
+        digits[:, pos] = alphabet[number % 36]
+        number = number // 36
+    return digits.view("<U6").ravel()
+
+def timestamps(values):
+    return np.datetime_as_string(values, unit="s", timezone="UTC")
+
+def generate_chunk(chunk, n_flights, routes, seats, days, seed):
+    """Flights chunk `chunk` and every booking, ticket, leg and boarding pass on it."""
+    rng = np.random.default_rng([seed, 2, chunk])
+    first_id = chunk * FLIGHTS_PER_CHUNK + 1
+
+    # -- flights: a route and a day each
+    route = rng.integers(0, len(routes), n_flights)
+    r = routes.iloc[route].reset_index(drop=True)
+    day = rng.integers(0, days, n_flights)
+    sched_dep = START_DATE + (day * 1440 + r["dep_minute"].to_numpy()).astype("timedelta64[m]")
+    sched_arr = sched_dep + r["duration_min"].to_numpy().astype("timedelta64[m]")
+
+    # the dataset "now" sits three quarters into the period
+    now = START_DATE + np.timedelta64(int(days * 0.75 * 1440), "m")
+    delay = rng.exponential(4, n_flights).round().astype(np.int64).astype("timedelta64[m]")
+    act_dep = sched_dep + delay
+    act_arr = sched_arr + delay
+    status = np.full(n_flights, "Scheduled", dtype="<U9")
+    status[sched_dep < now + np.timedelta64(1, "D")] = "On Time"
+    status[(sched_dep < now + np.timedelta64(1, "D")) & (rng.random(n_flights) < 0.07)] = "Delayed"
+    status[act_dep <= now] = "Departed"
+    status[act_arr <= now] = "Arrived"
+    status[(sched_dep <= now) & (rng.random(n_flights) < 0.015)] = "Cancelled"
+    departed = np.isin(status, ["Departed", "Arrived"])
+    arrived = status == "Arrived"
+
+    flights = pd.DataFrame({
+        "flight_id": np.arange(first_id, first_id + n_flights),
+        "flight_no": r["flight_no"].to_numpy(),
+        "scheduled_departure": timestamps(sched_dep),
+        "scheduled_arrival": timestamps(sched_arr),
+        "departure_airport": r["departure_airport"].to_numpy(),
+        "arrival_airport": r["arrival_airport"].to_numpy(),
+        "status": status,
+        "aircraft_code": r["aircraft_code"].to_numpy(),
+        "actual_departure": np.where(departed, timestamps(act_dep), None),
+        "actual_arrival": np.where(arrived, timestamps(act_arr), None),
+    })
+
+    # -- occupied seats: every seat of every flight is taken with its load factor
+    seat_start = seats.groupby("aircraft_code", sort=False).indices
+    starts = np.array([seat_start[a][0] for a in r["aircraft_code"]])
+    capacity = np.array([len(seat_start[a]) for a in r["aircraft_code"]])
+    slot_flight = np.repeat(np.arange(n_flights), capacity)
+    slot_seat = np.repeat(starts, capacity) + (np.arange(capacity.sum()) - np.repeat(np.cumsum(capacity) - capacity, capacity))
+    fare_idx = seats["fare_idx"].to_numpy()[slot_seat]
+    load = np.where(status == "Cancelled", 0.0, rng.beta(8, 3, n_flights))
+    taken = rng.random(len(slot_seat)) < load[slot_flight] * FARE_FILL[fare_idx]
+    leg_flight, leg_seat, leg_fare = slot_flight[taken], slot_seat[taken], fare_idx[taken]
+
+    # -- boarding order within each flight, then interleave flights rank by rank so
+    #    consecutive legs (which become one ticket) are on different flights
+    key = rng.random(len(leg_flight))
+    order = np.lexsort((key, leg_flight))
+    leg_flight, leg_seat, leg_fare = leg_flight[order], leg_seat[order], leg_fare[order]
+    first_of_flight = np.r_[0, np.flatnonzero(np.diff(leg_flight)) + 1]
+    counts = np.diff(np.r_[first_of_flight, len(leg_flight)])
+    boarding_no = np.arange(len(leg_flight)) - np.repeat(first_of_flight, counts) + 1
+    flight_shuffle = rng.permutation(n_flights)
+    order = np.lexsort((flight_shuffle[leg_flight], boarding_no))
+    leg_flight, leg_seat, leg_fare, boarding_no = (leg_flight[order], leg_seat[order],
+                                                   leg_fare[order], boarding_no[order])
+
+    # -- tickets of 1-4 legs; drop the rare second leg on the same flight
+    n_legs = len(leg_flight)
+    lengths = rng.choice([1, 2, 3, 4], size=n_legs, p=[0.15, 0.35, 0.3, 0.2])
+    lengths = lengths[:np.searchsorted(np.cumsum(lengths), n_legs) + 1]
+    leg_ticket = np.repeat(np.arange(len(lengths)), lengths)[:n_legs]
+    _, first = np.unique(leg_ticket.astype(np.int64) * (n_flights + 1) + leg_flight, return_index=True)
+    keep = np.zeros(n_legs, dtype=bool)
+    keep[first] = True
+    leg_flight, leg_seat, leg_fare, boarding_no, leg_ticket = (leg_flight[keep], leg_seat[keep], leg_fare[keep],
+                                                               boarding_no[keep], leg_ticket[keep])
+    n_tickets = int(leg_ticket.max()) + 1 if len(leg_ticket) else 0
+
+    amount = (r["base_fare"].to_numpy()[leg_flight] * FARE_MULTIPLIER[leg_fare]).round(-2)
+    ticket_no = ticket_numbers(chunk, leg_ticket)
+    ticket_flights = pd.DataFrame({
+        "ticket_no": ticket_no,
+        "flight_id": first_id + leg_flight,
+        "fare_conditions": FARE_CLASSES[leg_fare],
+        "amount": amount,
+    })
+    boarded = departed[leg_flight]
+    boarding_passes = pd.DataFrame({
+        "ticket_no": ticket_no[boarded],
+        "flight_id": first_id + leg_flight[boarded],
+        "boarding_no": boarding_no[boarded],
+        "seat_no": seats["seat_no"].to_numpy()[leg_seat[boarded]],
+    })
+
+    # -- bookings of 1-3 tickets, made 1-60 days before the earliest leg
+    per_booking = rng.choice([1, 2, 3], size=n_tickets, p=[0.7, 0.2, 0.1])
+    per_booking = per_booking[:np.searchsorted(np.cumsum(per_booking), n_tickets) + 1]
+    ticket_booking = np.repeat(np.arange(len(per_booking)), per_booking)[:n_tickets]
+    n_bookings = int(ticket_booking.max()) + 1 if n_tickets else 0
+    refs = book_refs(chunk, np.arange(n_bookings))
+
+    ticket_total = np.bincount(leg_ticket, weights=amount, minlength=n_tickets)
+    # earliest departure per ticket / booking, in epoch seconds
+    never = np.iinfo(np.int64).max
+    ticket_first_dep = np.full(n_tickets, never)
+    np.minimum.at(ticket_first_dep, leg_ticket, sched_dep[leg_flight].astype(np.int64))
+    booking_first_dep = np.full(n_bookings, never)
+    np.minimum.at(booking_first_dep, ticket_booking, ticket_first_dep)
+    book_date = (booking_first_dep - rng.integers(1, 61 * 1440, n_bookings) * 60).astype("datetime64[s]")
+
+    bookings = pd.DataFrame({
+        "book_ref": refs,
+        "book_date": timestamps(book_date),
+        "total_amount": np.bincount(ticket_booking, weights=ticket_total, minlength=n_bookings).round(2),
+    })
+    phones = rng.integers(10**9, 10**10 - 1, n_tickets)
+    tickets = pd.DataFrame({
+        "ticket_no": ticket_numbers(chunk, np.arange(n_tickets)),
+        "book_ref": refs[ticket_booking],
+        "passenger_id": np.char.add(np.char.zfill(rng.integers(0, 9999, n_tickets).astype(str), 4),
+                                    np.char.add(" ", np.char.zfill(rng.integers(0, 999999, n_tickets).astype(str), 6))),
+        "passenger_name": np.char.add(np.char.add(FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), n_tickets)], " "),
+                                      LAST_NAMES[rng.integers(0, len(LAST_NAMES), n_tickets)]),
+        "contact_data": np.char.add(np.char.add('{"phone": "+7', phones.astype(str)), '"}'),
+    })
+    return {"flights": flights, "bookings": bookings, "tickets": tickets,
+            "ticket_flights": ticket_flights, "boarding_passes": boarding_passes}
+
+# ---------------- OUTPUT ----------------
+def to_csv_buffer(df):
+    buf = io.StringIO()
+    df.to_csv(buf, header=False, index=False, na_rep=r"\N", quoting=csv.QUOTE_MINIMAL)
+    buf.seek(0)
+    return buf
+
+def copy_tables(dsn, tables):
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            for table, df in tables.items():
+                cursor.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN "
+                                   f"WITH (FORMAT csv, NULL '\\N')", to_csv_buffer(df))
+        conn.commit()
+    finally:
+        conn.close()
+
+def write_tables(out_dir, tables, suffix):
+    for table, df in tables.items():
+        os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+        df.to_csv(os.path.join(out_dir, table, f"{table}_{suffix}.csv"), index=False, na_rep=r"\N")
+
+def run_chunk(chunk, n_flights, routes, seats, days, seed, dsn, out_dir):
+    start = time.perf_counter()
+    tables = generate_chunk(chunk, n_flights, routes, seats, days, seed)
+    generated = time.perf_counter()
+    if dsn:
+        copy_tables(dsn, tables)
+    else:
+        write_tables(out_dir, tables, f"{chunk:06d}")
+    return chunk, {t: len(df) for t, df in tables.items()}, generated - start, time.perf_counter() - generated
+
+def generate(scale, seed=42, days=365, workers=None, dsn=None, out_dir=None, create_schema=False,
+             constraints=False, csv_path="flights.csv"):
+    if scale > MAX_SCALE:
+        raise ValueError(f"scale {scale:g} exceeds {MAX_SCALE:.0f}: the six-character book_refs would repeat")
+    start = time.perf_counter()
+    codes = airport_codes(csv_path, seed)
+    dims = dimension_tables(codes, seed)
+    routes = route_table(codes, seed)
+    seats = dims["seats"].copy()
+    seats["fare_idx"] = seats["fare_conditions"].map({f: i for i, f in enumerate(FARE_CLASSES)})
+
+    if dsn:
+        import psycopg2
+        conn = psycopg2.connect(dsn)
+        try:
+            with conn.cursor() as cursor:
+                if create_schema:
+                    cursor.execute(SCHEMA)
+            conn.commit()
+        finally:
+            conn.close()
+        copy_tables(dsn, dims)
+    else:
+        write_tables(out_dir, dims, "dim")
+
+    total_flights = int(round(FLIGHTS_PER_SF * scale))
+    chunks = [(c, min(FLIGHTS_PER_CHUNK, total_flights - c * FLIGHTS_PER_CHUNK))
+              for c in range(-(-total_flights // FLIGHTS_PER_CHUNK))]
+    totals = {t: len(df) for t, df in dims.items()}
+    print(f"[Generate] SF={scale:g} seed={seed}: {total_flights} flights in {len(chunks)} chunks, "
+          f"{workers or os.cpu_count()} processes → {'COPY' if dsn else out_dir}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, c, n, routes, seats, days, seed, dsn, out_dir) for c, n in chunks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            chunk, counts, gen_s, write_s = future.result()
+            for table, n in counts.items():
+                totals[table] = totals.get(table, 0) + n
+            if done % max(1, len(chunks) // 20) == 0 or done == len(chunks):
+                elapsed = time.perf_counter() - start
+                print(f"[Chunk {done}/{len(chunks)}] {totals.get('ticket_flights', 0):,} ticket_flights, "
+                      f"{totals.get('ticket_flights', 0) / elapsed:,.0f} rows/s (last: gen {gen_s:.2f}s, write {write_s:.2f}s)")
+
+    if dsn and constraints:
+        import psycopg2
+        print("[Generate] Adding primary and foreign keys…")
+        conn = psycopg2.connect(dsn)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(CONSTRAINTS)
+                cursor.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    for table in TABLES:
+        print(f"  {table:<16} {totals.get(table, 0):>14,}")
+    print(f"[Done] {sum(totals.values()):,} rows in {elapsed:.1f}s")
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic scale-factor generator for the airline tables")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 ≈ demo flight count (≈1.8M ticket_flights), 100 ≈ 180M ticket_flights; at most ≈1640")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="length of the flight schedule")
+    parser.add_argument("--workers", type=int, help="generator processes (default: CPU count)")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--dsn", help="COPY into this database (default: config.DB_URI)")
+    target.add_argument("--out", metavar="DIR", help="write CSV files per table and chunk instead of loading")
+    parser.add_argument("--create-schema", action="store_true", help="create the eight tables if missing")
+    parser.add_argument("--constraints", action="store_true", help="add primary/foreign keys after loading")
+    args = parser.parse_args()
+
+    dsn = None
+    if not args.out:
+        if args.dsn:
+            dsn = args.dsn
+        else:
+            import config
+            dsn = config.DB_URI
+    generate(args.scale, seed=args.seed, days=args.days, workers=args.workers, dsn=dsn, out_dir=args.out,
+             create_schema=args.create_schema, constraints=args.constraints)
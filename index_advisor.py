@@ -0,0 +1,321 @@
+import argparse
+import re
+import statistics
+import sys
+from collections import namedtuple
+
+import psycopg2
+
+import sql_catalog
+
+# Index advisor for every statement in sql_catalog (queries.sql, analytics.py,
+# Superset datasets).
+#
+# 1. candidates are read off the SQL: join keys, equality filters on literals
+#    (as plain, composite and partial indexes), IS NOT NULL filters and
+#    DATE(...) expressions. DATE(timestamptz) depends on the session time zone
+#    and cannot be indexed, so for those the candidate is the immutable
+#    (col AT TIME ZONE '<server TimeZone>')::date together with the matching
+#    rewrite of the statements
+# 2. each candidate is scored by the planner-cost reduction it brings to the
+#    statements on its table, using hypopg hypothetical indexes when the
+#    extension is available, or by building it and timing EXPLAIN ANALYZE
+#    before/after otherwise (--measure)
+# 3. with --apply the useful ones are created for real and the per-query
+#    speedup is reported
+
+# rewrite: (column, time zone) of a DATE(timestamptz) the statements must be rewritten for
+Candidate = namedtuple("Candidate", ["table", "columns", "where", "reason", "rewrite"], defaults=[None])
+
+TABLE_ALIAS = re.compile(r"\b(?:from|join)\s+(\w+)(?:\s+(?:as\s+)?(?!on\b|where\b|join\b|left\b|right\b|inner\b|group\b|order\b)(\w+))?",
+                         re.IGNORECASE)
+JOIN_EQ = re.compile(r"\b(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)")
+LITERAL_EQ = re.compile(r"\b(?:(\w+)\.)?(\w+)\s*=\s*('(?:[^']|'')*')")
+NOT_NULL = re.compile(r"\b(?:(\w+)\.)?(\w+)\s+is\s+not\s+null", re.IGNORECASE)
+DATE_EXPR = re.compile(r"\bdate\s*\(\s*(?:(\w+)\.)?(\w+)\s*\)", re.IGNORECASE)
+
+KEYWORDS = {"select", "and", "or", "on", "where", "case", "when", "then", "else", "end", "not"}
+
+def alias_map(sql, known=None):
+    """{alias or table name: table} for the FROM/JOIN items of `sql`, limited to `known` tables."""
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        # EXTRACT(... FROM col) matches the pattern too; `known` weeds those out
+        if known is not None and table.lower() not in known:
+            continue
+        aliases[table.lower()] = table.lower()
+        if alias:
+            aliases[alias.lower()] = table.lower()
+    return aliases
+
+def resolve(aliases, alias, column):
+    if alias:
+        return aliases.get(alias.lower())
+    tables = set(aliases.values())
+    # unqualified column: only unambiguous in a single-table query
+    return next(iter(tables)) if len(tables) == 1 else None
+
+def candidates_for(sql, known=None, timestamptz=(), timezone="UTC"):
+    """
+    Index candidates suggested by the predicates of one statement.
+    `timestamptz` holds the (table, column) pairs of that type, whose DATE()
+    becomes an AT TIME ZONE `timezone` expression plus a rewrite.
+    """
+    aliases = alias_map(sql, known)
+    found = []
+    join_cols = {}
+    for l_alias, l_col, r_alias, r_col in JOIN_EQ.findall(sql):
+        for alias, col in ((l_alias, l_col), (r_alias, r_col)):
+            table = aliases.get(alias.lower())
+            if table:
+                found.append(Candidate(table, (col.lower(),), None, "join key"))
+                join_cols.setdefault(table, []).append(col.lower())
+    for alias, col, literal in LITERAL_EQ.findall(sql):
+        table = resolve(aliases, alias, col)
+        if not table or col.lower() in KEYWORDS:
+            continue
+        col = col.lower()
+        found.append(Candidate(table, (col,), None, "equality filter"))
+        for join_col in join_cols.get(table, []):
+            if join_col != col:
+                found.append(Candidate(table, (col, join_col), None, "filter + join key"))
+                found.append(Candidate(table, (join_col,), f"{col} = {literal}", "partial on filter"))
+    for alias, col in NOT_NULL.findall(sql):
+        table = resolve(aliases, alias, col)
+        if table:
+            found.append(Candidate(table, (col.lower(),), f"{col.lower()} IS NOT NULL", "IS NOT NULL filter"))
+    for alias, col in DATE_EXPR.findall(sql):
+        table = resolve(aliases, alias, col)
+        if not table:
+            continue
+        col = col.lower()
+        if (table, col) in timestamptz:
+            found.append(Candidate(table, (f"(({col} AT TIME ZONE '{timezone}')::date)",), None,
+                                   "DATE() expression, rewritten", (col, timezone)))
+        else:
+            found.append(Candidate(table, (f"(date({col}))",), None, "DATE() expression"))
+    return found
+
+def rewrite_sql(sql, candidate, known=None):
+    """`sql` with DATE(col) on the candidate's table replaced by the expression its index is built on."""
+    if not candidate.rewrite:
+        return sql
+    column, timezone = candidate.rewrite
+    aliases = alias_map(sql, known)
+
+    def replace(match):
+        alias, col = match.group(1), match.group(2)
+        if col.lower() != column or resolve(aliases, alias, col) != candidate.table:
+            return match.group(0)
+        qualified = f"{alias}.{col}" if alias else col
+        return f"({qualified} AT TIME ZONE '{timezone}')::date"
+
+    return DATE_EXPR.sub(replace, sql)
+
+def index_sql(candidate, name=None, concurrently=False):
+    where = f" WHERE {candidate.where}" if candidate.where else ""
+    name = f"{name} " if name else ""
+    conc = "CONCURRENTLY " if concurrently else ""
+    return f"CREATE INDEX {conc}{name}ON {candidate.table} ({', '.join(candidate.columns)}){where}"
+
+def index_name(candidate):
+    cols = "_".join(re.sub(r"\W+", "", c) for c in candidate.columns)
+    suffix = f"_{sql_catalog.slugify(candidate.where)}" if candidate.where else ""
+    return f"idx_{candidate.table}_{cols}{suffix}"[:63]
+
+# ---------------- DATABASE HELPERS ----------------
+def table_names(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+        return {row[0] for row in cursor.fetchall()}
+
+def existing_indexes(conn):
+    """{table: [(leading columns...), ...]} for the public schema."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = 'public'")
+        rows = cursor.fetchall()
+    indexes = {}
+    for table, indexdef in rows:
+        match = re.search(r"\((.*)\)", indexdef)
+        if match and " WHERE " not in indexdef:
+            cols = tuple(c.strip().strip('"').lower() for c in match.group(1).split(","))
+            indexes.setdefault(table, []).append(cols)
+    return indexes
+
+def covered(candidate, indexes):
+    if candidate.where:
+        return False
+    n = len(candidate.columns)
+    return any(cols[:n] == candidate.columns for cols in indexes.get(candidate.table, []))
+
+def plan_cost(conn, sql):
+    with conn.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0][0]["Plan"]
+    return plan["Total Cost"], plan
+
+def execution_ms(conn, sql, runs):
+    times = []
+    for _ in range(runs):
+        with conn.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+            times.append(cursor.fetchone()[0][0]["Execution Time"])
+    return statistics.median(times)
+
+def uses_index(plan, name):
+    if name in plan.get("Index Name", ""):
+        return True
+    return any(uses_index(child, name) for child in plan.get("Plans", []))
+
+def timestamptz_columns(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT table_name, column_name FROM information_schema.columns "
+                       "WHERE table_schema = 'public' AND data_type = 'timestamp with time zone'")
+        return {(table, column) for table, column in cursor.fetchall()}
+
+def server_timezone(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT current_setting('TimeZone')")
+        return cursor.fetchone()[0]
+
+def has_hypopg(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'hypopg'")
+        if not cursor.fetchone():
+            return False
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS hypopg")
+    return True
+
+# ---------------- EVALUATION ----------------
+def evaluate_hypothetical(conn, candidate, statements, baseline, known=None):
+    """Planner-cost reduction per statement (rewritten if the candidate needs it) with `candidate` as a hypopg index."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT indexname FROM hypopg_create_index(%s)", (index_sql(candidate),))
+        hypo_name = cursor.fetchone()[0]
+    try:
+        gains = {}
+        for entry in statements:
+            cost, plan = plan_cost(conn, rewrite_sql(entry.sql, candidate, known))
+            if uses_index(plan, hypo_name) and cost < baseline[entry.name]:
+                gains[entry.name] = (baseline[entry.name], cost)
+        return gains
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT hypopg_reset()")
+
+def evaluate_measured(conn, candidate, statements, runs, keep=False, known=None):
+    """
+    Build the index, time every statement on its table before and after (the
+    after run rewritten if the candidate needs it), drop unless `keep`.
+    """
+    before = {e.name: execution_ms(conn, e.sql, runs) for e in statements}
+    name = index_name(candidate)
+    with conn.cursor() as cursor:
+        cursor.execute(index_sql(candidate, name))
+        cursor.execute(f"ANALYZE {candidate.table}")
+    try:
+        gains = {}
+        for entry in statements:
+            sql = rewrite_sql(entry.sql, candidate, known)
+            after = execution_ms(conn, sql, runs)
+            _, plan = plan_cost(conn, sql)
+            if uses_index(plan, name) and after < before[entry.name]:
+                gains[entry.name] = (before[entry.name], after)
+        return gains
+    finally:
+        if not keep:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Propose and evaluate indexes for the project's SQL")
+    parser.add_argument("--dsn", help="database to analyze (default: config.DB_URI)")
+    parser.add_argument("--sources", nargs="*", default=list(sql_catalog.SOURCES), choices=list(sql_catalog.SOURCES))
+    parser.add_argument("--only", nargs="*", help="statements whose name contains any of these")
+    parser.add_argument("--measure", action="store_true",
+                        help="build each candidate and time EXPLAIN ANALYZE instead of using hypopg")
+    parser.add_argument("--runs", type=int, default=3, help="EXPLAIN ANALYZE runs per measurement")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="minimum relative improvement to recommend")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.dsn:
+        dsn = args.dsn
+    else:
+        import config
+        dsn = config.DB_URI
+    entries = sql_catalog.collect(args.sources, args.only)
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        valid, baseline = [], {}
+        for entry in entries:
+            try:
+                baseline[entry.name] = plan_cost(conn, entry.sql)[0]
+                valid.append(entry)
+            except psycopg2.Error as e:
+                print(f"[SKIP] {entry.name}: {str(e).strip().splitlines()[0]}")
+
+        known = table_names(conn)
+        indexes = existing_indexes(conn)
+        timestamptz, timezone = timestamptz_columns(conn), server_timezone(conn)
+        candidates = {}
+        for entry in valid:
+            for candidate in candidates_for(entry.sql, known, timestamptz, timezone):
+                if not covered(candidate, indexes):
+                    candidates.setdefault(candidate[:3], candidate)
+        print(f"[Advisor] {len(valid)} statements, {len(candidates)} candidate indexes")
+
+        hypothetical = not args.measure and has_hypopg(conn)
+        if not args.measure and not hypothetical:
+            print("[Advisor] hypopg not available — falling back to build-and-measure")
+        mode = "planner cost (hypopg)" if hypothetical else "EXPLAIN ANALYZE ms"
+
+        recommended = []
+        for candidate in candidates.values():
+            statements = [e for e in valid if candidate.table in alias_map(e.sql, known).values()]
+            try:
+                if hypothetical:
+                    gains = evaluate_hypothetical(conn, candidate, statements, baseline, known)
+                else:
+                    gains = evaluate_measured(conn, candidate, statements, args.runs, known=known)
+            except psycopg2.Error as e:
+                print(f"[SKIP] {index_sql(candidate)}: {str(e).strip().splitlines()[0]}")
+                continue
+            gains = {n: g for n, g in gains.items() if (g[0] - g[1]) / g[0] >= args.min_gain}
+            if not gains:
+                continue
+            recommended.append((candidate, gains))
+            print(f"\n{index_sql(candidate)};  -- {candidate.reason}")
+            for name, (before, after) in sorted(gains.items(), key=lambda g: g[1][1] / g[1][0]):
+                print(f"    {name:<60} {before:>12.1f} → {after:>12.1f} {mode} ({before / after:.1f}x)")
+            if candidate.rewrite:
+                column, timezone = candidate.rewrite
+                print(f"    -- only used once these statements read DATE({column}) as "
+                      f"({column} AT TIME ZONE '{timezone}')::date (same result for TimeZone={timezone})")
+
+        if not recommended:
+            print("\n[Advisor] no index improves any statement by the required margin")
+            return 0
+
+        if args.apply:
+            print("\n[Apply] creating recommended indexes")
+            for candidate, gains in recommended:
+                statements = [e for e in valid if e.name in gains]
+                try:
+                    measured = evaluate_measured(conn, candidate, statements, args.runs, keep=True, known=known)
+                except psycopg2.Error as e:
+                    print(f"[ERROR] {index_sql(candidate)}: {str(e).strip().splitlines()[0]}")
+                    continue
+                print(f"[Created] {index_name(candidate)}")
+                for name, (before, after) in measured.items():
+                    print(f"    {name:<60} {before:>10.1f} ms → {after:>10.1f} ms ({before / after:.1f}x)")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
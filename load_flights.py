@@ -0,0 +1,108 @@
+import argparse
+import csv
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import config
+from main import get_conn_from_uri
+
+# flights.csv is a PostgreSQL CSV dump: quoted fields, "\N" for NULL and
+# "+03" offsets on timestamps, which COPY parses natively.
+NULL_MARKER = r"\N"
+
+def read_header(path):
+    with open(path, newline="") as f:
+        return next(csv.reader(f))
+
+def iter_chunks(path, rows_per_chunk):
+    """Yield the data lines of `path` as in-memory buffers of at most `rows_per_chunk` lines."""
+    with open(path, newline="") as f:
+        next(f)  # header
+        while True:
+            lines = list(islice(f, rows_per_chunk))
+            if not lines:
+                return
+            yield io.StringIO("".join(lines)), len(lines)
+
+def copy_sql(table, columns):
+    cols = ", ".join(columns)
+    # a quoted "\N" is not NULL in CSV mode unless the column is FORCE_NULL
+    return (f"COPY {table} ({cols}) FROM STDIN WITH "
+            f"(FORMAT csv, NULL '{NULL_MARKER}', FORCE_NULL ({cols}))")
+
+def upsert_sql(columns):
+    cols = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != "flight_id")
+    # DISTINCT ON keeps one row per flight_id so a chunk never updates the same row twice
+    return (f"INSERT INTO flights ({cols}) "
+            f"SELECT DISTINCT ON (flight_id) {cols} FROM flights_staging "
+            f"ON CONFLICT (flight_id) DO UPDATE SET {updates}")
+
+def load_file(path, mode="append", rows_per_chunk=50000, uri=None):
+    """
+    Stream one CSV file into `flights` through COPY, `rows_per_chunk` lines at a time.
+
+    mode="append" copies straight into flights; mode="upsert" copies each chunk
+    into a temporary staging table and merges it with ON CONFLICT (flight_id).
+    The whole file is loaded in a single transaction. Returns (rows, seconds).
+    """
+    columns = read_header(path)
+    conn = get_conn_from_uri(uri or config.DB_URI)
+    start = time.perf_counter()
+    rows = 0
+    try:
+        with conn.cursor() as cursor:
+            if mode == "upsert":
+                cursor.execute("CREATE TEMP TABLE flights_staging "
+                               "(LIKE flights INCLUDING DEFAULTS) ON COMMIT DROP")
+                target = "flights_staging"
+            else:
+                target = "flights"
+
+            for buf, n in iter_chunks(path, rows_per_chunk):
+                cursor.copy_expert(copy_sql(target, columns), buf)
+                if mode == "upsert":
+                    cursor.execute(upsert_sql(columns))
+                    cursor.execute("TRUNCATE flights_staging")
+                rows += n
+                print(f"[COPY] {path}: {rows} rows")
+        conn.commit()
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE flights")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return rows, time.perf_counter() - start
+
+def load_files(paths, mode="append", rows_per_chunk=50000, workers=1):
+    """Load several files, in parallel processes when workers > 1."""
+    start = time.perf_counter()
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(load_file, paths, [mode] * len(paths), [rows_per_chunk] * len(paths)))
+    else:
+        results = [load_file(p, mode, rows_per_chunk) for p in paths]
+
+    for path, (rows, seconds) in zip(paths, results):
+        print(f"[LOADED] {path} — {rows} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+    total = sum(r for r, _ in results)
+    elapsed = time.perf_counter() - start
+    print(f"[DONE] {total} rows from {len(paths)} file(s) in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Bulk-load flights CSV dumps into the flights table via COPY")
+    parser.add_argument("files", nargs="*", default=["flights.csv"])
+    parser.add_argument("--mode", choices=["append", "upsert"], default="append",
+                        help="append with plain COPY, or upsert on flight_id through a staging table")
+    parser.add_argument("--chunk-rows", type=int, default=50000, help="CSV lines sent per COPY")
+    parser.add_argument("--workers", type=int, default=1, help="load multiple files in parallel processes")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    load_files(args.files, mode=args.mode, rows_per_chunk=args.chunk_rows, workers=args.workers)
@@ -1,11 +1,18 @@
+import argparse
+import csv
+import os
+import time
 import psycopg2
 import sqlparse
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.pool import ThreadedConnectionPool
 from urllib.parse import urlparse
+import batch_metrics
 import config
 
-def get_conn_from_uri(uri):
+def get_conn_kwargs(uri):
     result = urlparse(uri)
-    return psycopg2.connect(
+    return dict(
         dbname=result.path.lstrip('/'),
         user=result.username,
         password=result.password,
@@ -13,42 +20,312 @@ def get_conn_from_uri(uri):
         port=result.port
     )
 
-def execute_queries_from_file(cursor, filepath):
+def get_conn_from_uri(uri):
+    return psycopg2.connect(**get_conn_kwargs(uri))
+
+def is_select_query(query):
+    lines = query.splitlines()
+    for line in lines:
+        stripped = line.strip().lower()
+        if stripped == '' or stripped.startswith('--'):
+            continue
+        return stripped.startswith('select') or stripped.startswith('with')
+    return False
+
+def read_statements(filepath):
     with open(filepath, 'r') as file:
         sql_file = file.read()
-    
-    statements = sqlparse.split(sql_file)
+    return [query.strip() for query in sqlparse.split(sql_file)]
+
+def execute_queries_from_file(cursor, filepath):
+    statements = read_statements(filepath)
     print(f"Total queries found: {len(statements)}\n")
     
-    def is_select_query(query):
-        lines = query.splitlines()
-        for line in lines:
-            stripped = line.strip().lower()
-            if stripped == '' or stripped.startswith('--'):
-                continue
-            return stripped.startswith('select') or stripped.startswith('with')
-        return False
-    
     for i, query in enumerate(statements, start=1):
-        query = query.strip()
         if not query:
             print(f"Skipping empty query {i}")
             continue
         
         print(f"\n--- Executing Query {i} ---\n{query}\n")
+        start = time.perf_counter()
         try:
             cursor.execute(query)
             if is_select_query(query):
                 rows = cursor.fetchall()
                 for row in rows:
                     print(row)
+                batch_metrics.record(f"query_{i:02d}", time.perf_counter() - start, len(rows))
             else:
                 print("Query executed.")
+                batch_metrics.record(f"query_{i:02d}", time.perf_counter() - start, max(cursor.rowcount, 0))
         except Exception as e:
             print(f"Error executing query {i}: {e}")
 
-def main():
-    print("Starting script...")
+# ---------------- PARALLEL MODE ----------------
+def run_select(pool, query):
+    """Run one read-only statement on a pooled connection; returns (rows, seconds, error)."""
+    conn = pool.getconn()
+    start = time.perf_counter()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+        return rows, time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, e
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+def execute_queries_parallel(uri, filepath, workers=4):
+    """
+    Fan the SELECT statements of `filepath` out over a bounded connection pool
+    of `workers` connections. Non-SELECT statements still run afterwards, in
+    order, on a single connection. Results are printed in file order.
+    """
+    statements = read_statements(filepath)
+    print(f"Total queries found: {len(statements)} (workers={workers})\n")
+
+    selects = [(i, q) for i, q in enumerate(statements, start=1) if q and is_select_query(q)]
+    others = [(i, q) for i, q in enumerate(statements, start=1) if q and not is_select_query(q)]
+
+    pool = ThreadedConnectionPool(1, workers, **get_conn_kwargs(uri))
+    report = []
+    wall_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(i, q, executor.submit(run_select, pool, q)) for i, q in selects]
+            # results are collected in submission (= file) order
+            for i, query, future in futures:
+                rows, elapsed, error = future.result()
+                print(f"\n--- Query {i} ({elapsed * 1000:.1f} ms) ---\n{query}\n")
+                if error is not None:
+                    print(f"Error executing query {i}: {error}")
+                    report.append((i, elapsed, None, query))
+                    continue
+                for row in rows:
+                    print(row)
+                report.append((i, elapsed, len(rows), query))
+
+        if others:
+            conn = pool.getconn()
+            try:
+                with conn.cursor() as cursor:
+                    for i, query in others:
+                        print(f"\n--- Executing Query {i} ---\n{query}\n")
+                        start = time.perf_counter()
+                        try:
+                            cursor.execute(query)
+                            conn.commit()
+                            print("Query executed.")
+                            report.append((i, time.perf_counter() - start, cursor.rowcount, query))
+                        except Exception as e:
+                            conn.rollback()
+                            print(f"Error executing query {i}: {e}")
+                            report.append((i, time.perf_counter() - start, None, query))
+            finally:
+                pool.putconn(conn)
+    finally:
+        pool.closeall()
+
+    print_latency_report(report, time.perf_counter() - wall_start)
+
+# ---------------- STREAMING MODE ----------------
+# PostgreSQL type OID → Arrow type; anything else (and unconstrained numeric)
+# is written as text so no batch can disagree with the schema
+PG_ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32", 26: "int64",
+    700: "float32", 701: "float64", 17: "binary",
+    1082: "date32",
+}
+
+def arrow_field(column):
+    """Arrow field of one cursor.description entry, plus a converter for values Arrow can't take as-is."""
+    import json
+    import pyarrow as pa
+
+    name, oid = column[0], column[1]
+    if oid in PG_ARROW_TYPES:
+        return pa.field(name, getattr(pa, PG_ARROW_TYPES[oid])()), None
+    if oid == 1114:
+        return pa.field(name, pa.timestamp("us")), None
+    if oid == 1184:
+        return pa.field(name, pa.timestamp("us", tz="UTC")), None
+    if oid == 1083:
+        return pa.field(name, pa.time64("us")), None
+    if oid == 1186:
+        return pa.field(name, pa.duration("us")), None
+    if oid == 1700 and column[4] is not None and column[5] is not None and 0 < column[4] <= 38:
+        # numeric(p, s) — the precision is fixed by the column, not by the values in a batch
+        return pa.field(name, pa.decimal128(column[4], column[5])), None
+    if oid in (114, 3802):
+        return pa.field(name, pa.string()), json.dumps
+    return pa.field(name, pa.string()), str
+
+class StreamWriter:
+    """Incremental CSV / Parquet writer that only ever holds one batch."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._file = None
+        self._writer = None
+        self._converters = None
+
+    def parquet_schema(self, description):
+        import pyarrow as pa
+
+        fields, self._converters = zip(*[arrow_field(column) for column in description])
+        return pa.schema(fields)
+
+    def write(self, description, batch):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, self.parquet_schema(description))
+            schema = self._writer.schema
+            arrays = [
+                pa.array([v if v is None or convert is None else convert(v) for v in col], type=field.type)
+                for col, field, convert in zip(zip(*batch), schema, self._converters)
+            ]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        else:
+            if self._writer is None:
+                self._file = open(self.path, "w", newline="")
+                self._writer = csv.writer(self._file)
+                self._writer.writerow([d[0] for d in description])
+            self._writer.writerows(batch)
+
+    def close(self, description=None):
+        if self._writer is None and description is not None:
+            # empty result: still emit a header-only / schema-only file
+            if self.fmt == "csv":
+                with open(self.path, "w", newline="") as f:
+                    csv.writer(f).writerow([d[0] for d in description])
+            else:
+                import pyarrow.parquet as pq
+                pq.write_table(self.parquet_schema(description).empty_table(), self.path)
+        if self.fmt == "parquet" and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+def stream_select(conn, i, query, export_dir, fmt="csv", batch_size=10000):
+    """
+    Run `query` through a named (server-side) cursor and write it to
+    `export_dir` batch by batch, so client memory is bounded by `batch_size`
+    rows. Returns (rows, seconds, path).
+    """
+    path = os.path.join(export_dir, f"query_{i:02d}.{fmt}")
+    start = time.perf_counter()
+    writer = StreamWriter(path, fmt)
+    rows = 0
+    description = None
+    try:
+        with conn.cursor(name=f"stream_query_{i}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if description is None and cursor.description is not None:
+                    description = cursor.description
+                if not batch:
+                    break
+                writer.write(description, batch)
+                rows += len(batch)
+    finally:
+        writer.close(description)
+        conn.rollback()
+    return rows, time.perf_counter() - start, path
+
+def execute_queries_streaming(uri, filepath, export_dir, fmt="csv", batch_size=10000, workers=1):
+    """
+    Stream every SELECT in `filepath` to one file per query in `export_dir`
+    instead of printing it, using up to `workers` pooled connections.
+    """
+    os.makedirs(export_dir, exist_ok=True)
+    statements = read_statements(filepath)
+    selects = [(i, q) for i, q in enumerate(statements, start=1) if q and is_select_query(q)]
+    print(f"Streaming {len(selects)} SELECT queries to {export_dir}/ as {fmt} "
+          f"(batch_size={batch_size}, workers={workers})\n")
+
+    def run(item):
+        i, query = item
+        conn = pool.getconn()
+        try:
+            return stream_select(conn, i, query, export_dir, fmt, batch_size), None
+        except Exception as e:
+            return None, e
+        finally:
+            pool.putconn(conn)
+
+    pool = ThreadedConnectionPool(1, workers, **get_conn_kwargs(uri))
+    report = []
+    wall_start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (i, query), (result, error) in zip(selects, executor.map(run, selects)):
+                if error is not None:
+                    print(f"Error streaming query {i}: {error}")
+                    report.append((i, 0.0, None, query))
+                    continue
+                rows, elapsed, path = result
+                rate = rows / elapsed if elapsed else 0.0
+                print(f"[Streamed] query {i} → {path} — {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+                report.append((i, elapsed, rows, query))
+    finally:
+        pool.closeall()
+
+    print_latency_report(report, time.perf_counter() - wall_start)
+
+def first_comment(query):
+    for line in query.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('--'):
+            return stripped.lstrip('-').strip()
+        if stripped:
+            return stripped
+    return ""
+
+def print_latency_report(report, wall_seconds):
+    report = sorted(report, key=lambda r: r[0])
+    total = sum(r[1] for r in report)
+    print("\n--- Latency Report ---")
+    print(f"{'#':>3}  {'ms':>10}  {'share':>6}  {'rows':>8}  {'rows/s':>10}  statement")
+    for i, elapsed, rows, query in report:
+        batch_metrics.record(f"query_{i:02d}", elapsed, rows)
+        share = elapsed / total * 100 if total else 0.0
+        rows_str = "error" if rows is None else str(rows)
+        rate_str = f"{rows / elapsed:,.0f}" if rows and elapsed else "-"
+        print(f"{i:>3}  {elapsed * 1000:>10.1f}  {share:>5.1f}%  {rows_str:>8}  {rate_str:>10}  {first_comment(query)[:60]}")
+    print(f"Sum of statement latencies: {total * 1000:.1f} ms, wall clock: {wall_seconds * 1000:.1f} ms")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the SQL statements from queries.sql")
+    parser.add_argument("--file", default="queries.sql", help="SQL file to execute")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="run SELECT statements concurrently over a pool of N connections")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream SELECT results through server-side cursors to files instead of printing")
+    parser.add_argument("--export-dir", default="exports/queries", help="output directory for --stream")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="file format for --stream")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows fetched per round trip for --stream")
+    parser.add_argument("--metrics-textfile-dir",
+                        help="write run metrics for node_exporter's textfile collector here (or METRICS_TEXTFILE_DIR)")
+    parser.add_argument("--metrics-pushgateway", help="push run metrics to this Pushgateway (or METRICS_PUSHGATEWAY)")
+    return parser.parse_args()
+
+def run_batch(args):
+    if args.stream:
+        execute_queries_streaming(config.DB_URI, args.file, args.export_dir, fmt=args.format,
+                                  batch_size=args.batch_size, workers=args.workers)
+        return
+
+    if args.workers > 1:
+        execute_queries_parallel(config.DB_URI, args.file, workers=args.workers)
+        return
+
     conn = get_conn_from_uri(config.DB_URI)
     cursor = conn.cursor()
     
@@ -56,11 +333,18 @@ def main():
     cursor.execute("SELECT 1;")
     print(f"Test query output: {cursor.fetchone()}")
     
-    execute_queries_from_file(cursor, 'queries.sql')
+    execute_queries_from_file(cursor, args.file)
     
     conn.commit()
     cursor.close()
     conn.close()
 
+def main():
+    args = parse_args()
+    print("Starting script...")
+
+    with batch_metrics.run("main", args.metrics_textfile_dir, args.metrics_pushgateway):
+        run_batch(args)
+
 if __name__ == "__main__":
     main()
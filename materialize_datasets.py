@@ -0,0 +1,274 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import sqlparse
+import yaml
+from psycopg2 import sql as pgsql
+from psycopg2.pool import ThreadedConnectionPool
+
+import sql_catalog
+from main import get_conn_kwargs
+
+# Materialized views for the Superset virtual datasets.
+#
+# Every aggregate dataset query becomes `mv_<dataset slug>`. When the query's
+# shape guarantees unique rows — every GROUP BY expression is an output column,
+# an aggregate without GROUP BY (one row), or SELECT DISTINCT — the view gets a
+# unique index on those columns so it can be refreshed CONCURRENTLY without
+# blocking dashboard reads. The key never comes from the data alone: a key that
+# only happens to be unique today would make a later refresh fail. Other views
+# fall back to a plain REFRESH. `rewrite` writes copies of the dataset YAMLs
+# whose SQL reads from the views that exist.
+
+AGGREGATE_CALL = re.compile(r"\b(count|sum|avg|min|max|array_agg|string_agg|bool_and|bool_or)\s*\(", re.IGNORECASE)
+GROUP_BY = re.compile(r"\bgroup\s+by\b", re.IGNORECASE)
+
+def view_name(entry):
+    return f"mv_{entry.name.split(':', 1)[1]}"[:63]
+
+def is_aggregate(sql):
+    return bool(GROUP_BY.search(sql) or AGGREGATE_CALL.search(sql))
+
+SET_OPERATION = re.compile(r"^(union|intersect|except)\b", re.IGNORECASE)
+GROUPING_SETS = re.compile(r"\b(rollup|cube|grouping\s+sets)\b", re.IGNORECASE)
+
+def outer_select(sql):
+    """Non-whitespace tokens of the outermost SELECT (after any WITH), or None for set operations."""
+    statement = sqlparse.parse(sqlparse.format(sql, strip_comments=True))[0]
+    tokens = [t for t in statement.tokens if not t.is_whitespace]
+    if any(t.ttype in sqlparse.tokens.Keyword and SET_OPERATION.match(t.normalized) for t in tokens):
+        return None
+    starts = [i for i, t in enumerate(tokens) if t.ttype is sqlparse.tokens.DML and t.normalized == "SELECT"]
+    return tokens[starts[-1]:] if starts else None
+
+def items_of(token):
+    if isinstance(token, sqlparse.sql.IdentifierList):
+        return list(token.get_identifiers())
+    return [token]
+
+def select_items(tokens):
+    """SELECT list items (tokens) of an outer_select(), or None for SELECT *."""
+    for token in tokens[1:]:
+        if token.ttype is sqlparse.tokens.Wildcard:
+            return None
+        if token.ttype in sqlparse.tokens.Keyword:
+            # DISTINCT sits between SELECT and the list; anything else ends it
+            if token.normalized == "DISTINCT":
+                continue
+            return None
+        return items_of(token)
+    return None
+
+def group_by_items(tokens):
+    """GROUP BY expressions (strings) of an outer_select(), or None without GROUP BY."""
+    for i, token in enumerate(tokens):
+        if token.ttype in sqlparse.tokens.Keyword and token.normalized == "GROUP BY":
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            return [str(t) for t in items_of(following)] if following is not None else []
+    return None
+
+def normalize(expr):
+    return re.sub(r'[\s"]+', "", expr).lower()
+
+def expression_of(item):
+    """The expression of a SELECT item without its alias."""
+    alias = item.get_alias() if isinstance(item, sqlparse.sql.Identifier) else None
+    text = str(item)
+    if alias:
+        text = re.sub(rf'\s+(?:as\s+)?"?{re.escape(alias)}"?\s*$', "", text, flags=re.IGNORECASE)
+    return text
+
+def unique_key(sql, columns):
+    """Output columns the query's shape makes unique, or None when only the current data could tell."""
+    tokens = outer_select(sql)
+    items = select_items(tokens) if tokens else None
+    if not items or len(items) != len(columns):
+        return None
+    groups = group_by_items(tokens)
+    if groups is None:
+        if any(t.ttype in sqlparse.tokens.Keyword and t.normalized == "DISTINCT" for t in tokens[1:2]):
+            return list(columns)
+        if any(AGGREGATE_CALL.search(str(i)) and " over " not in str(i).lower() for i in items):
+            # aggregate without GROUP BY: exactly one row
+            return [columns[0]]
+        return None
+    if not groups or any(GROUPING_SETS.search(g) for g in groups):
+        return None
+    keys = []
+    for group in groups:
+        if group.strip().isdigit() and 0 < int(group) <= len(columns):
+            match = columns[int(group) - 1]
+        else:
+            match = next((col for col, item in zip(columns, items)
+                          if normalize(group) in (normalize(expression_of(item)), normalize(col))), None)
+        if match is None:
+            # grouped on something that is not in the output: rows may repeat
+            return None
+        if match not in keys:
+            keys.append(match)
+    return keys
+
+# ---------------- DATABASE ----------------
+def view_columns(cursor, view):
+    cursor.execute(pgsql.SQL("SELECT * FROM {} LIMIT 0").format(pgsql.Identifier(view)))
+    return [d[0] for d in cursor.description]
+
+def is_unique(cursor, view, keys):
+    cursor.execute(pgsql.SQL("SELECT NOT EXISTS (SELECT 1 FROM {} GROUP BY {} HAVING count(*) > 1)").format(
+        pgsql.Identifier(view), pgsql.SQL(", ").join(map(pgsql.Identifier, keys))))
+    return cursor.fetchone()[0]
+
+def has_unique_index(cursor, view):
+    cursor.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            WHERE c.relname = %s AND i.indisunique AND i.indpred IS NULL
+        )
+    """, (view,))
+    return cursor.fetchone()[0]
+
+def create_view(conn, entry):
+    """Create (or recreate) the view for `entry`; returns the unique key columns or None."""
+    view = view_name(entry)
+    with conn.cursor() as cursor:
+        cursor.execute(pgsql.SQL("DROP MATERIALIZED VIEW IF EXISTS {}").format(pgsql.Identifier(view)))
+        cursor.execute(pgsql.SQL("CREATE MATERIALIZED VIEW {} AS ").format(pgsql.Identifier(view)).as_string(conn)
+                       + entry.sql)
+        columns = view_columns(cursor, view)
+        keys = unique_key(entry.sql, columns)
+        # the data check only guards against a misread query; it never picks the key
+        if keys and not is_unique(cursor, view, keys):
+            print(f"[WARN] {view}: rows repeat on ({', '.join(keys)}); using plain refresh")
+            keys = None
+        if keys:
+            cursor.execute(pgsql.SQL("CREATE UNIQUE INDEX {} ON {} ({})").format(
+                pgsql.Identifier(f"{view}_key"[:63]), pgsql.Identifier(view),
+                pgsql.SQL(", ").join(map(pgsql.Identifier, keys))))
+        cursor.execute(pgsql.SQL("ANALYZE {}").format(pgsql.Identifier(view)))
+    return keys
+
+def refresh_view(pool, view):
+    """REFRESH one view, CONCURRENTLY when it has a unique index. Returns (mode, seconds)."""
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        start = time.perf_counter()
+        with conn.cursor() as cursor:
+            concurrent = has_unique_index(cursor, view)
+            mode = "CONCURRENTLY " if concurrent else ""
+            cursor.execute(pgsql.SQL(f"REFRESH MATERIALIZED VIEW {mode}{{}}").format(pgsql.Identifier(view)))
+        return ("concurrent" if concurrent else "plain"), time.perf_counter() - start
+    finally:
+        pool.putconn(conn)
+
+def existing_views(pool):
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT matviewname FROM pg_matviews WHERE schemaname = 'public' AND matviewname LIKE 'mv\\_%'")
+            return sorted(row[0] for row in cursor.fetchall())
+    finally:
+        pool.putconn(conn)
+
+# ---------------- COMMANDS ----------------
+def aggregate_entries():
+    entries = sql_catalog.superset_datasets()
+    return [e for e in entries if is_aggregate(e.sql)], [e for e in entries if not is_aggregate(e.sql)]
+
+def create_all(pool):
+    entries, skipped = aggregate_entries()
+    for entry in skipped:
+        print(f"[SKIP] {entry.name}: not an aggregate query")
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        for entry in entries:
+            start = time.perf_counter()
+            try:
+                keys = create_view(conn, entry)
+            except Exception as e:
+                print(f"[ERROR] {view_name(entry)}: {str(e).strip().splitlines()[0]}")
+                continue
+            refresh = f"concurrent, key ({', '.join(keys)})" if keys else "plain refresh"
+            print(f"[Created] {view_name(entry):<60} {time.perf_counter() - start:6.2f}s  {refresh}")
+    finally:
+        pool.putconn(conn)
+
+def refresh_all(pool, views, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {view: executor.submit(refresh_view, pool, view) for view in views}
+        for view, future in futures.items():
+            try:
+                mode, seconds = future.result()
+                print(f"[Refresh] {view:<60} {seconds:6.2f}s  {mode}")
+            except Exception as e:
+                print(f"[ERROR] {view}: {str(e).strip().splitlines()[0]}")
+    print(f"[Refresh] {len(views)} views in {time.perf_counter() - start:.2f}s")
+
+def refresh_loop(pool, workers, interval):
+    """Refresh every view each `interval` seconds (measured from the start of a round)."""
+    next_run = time.monotonic()
+    while True:
+        refresh_all(pool, existing_views(pool), workers)
+        next_run += interval
+        time.sleep(max(0.0, next_run - time.monotonic()))
+
+def drop_all(pool):
+    views = existing_views(pool)
+    conn = pool.getconn()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            for view in views:
+                cursor.execute(pgsql.SQL("DROP MATERIALIZED VIEW {}").format(pgsql.Identifier(view)))
+                print(f"[Dropped] {view}")
+    finally:
+        pool.putconn(conn)
+
+def rewrite_datasets(out_dir, views):
+    """Copy each aggregate dataset YAML whose view is in `views` under `out_dir` (same relative path), reading from it."""
+    entries, _ = aggregate_entries()
+    for entry in entries:
+        if view_name(entry) not in views:
+            print(f"[SKIP] {entry.name}: {view_name(entry)} does not exist (run create first)")
+            continue
+        with open(entry.path, encoding="utf-8") as f:
+            dataset = yaml.safe_load(f)
+        dataset["sql"] = f"SELECT * FROM {view_name(entry)}"
+        target = os.path.join(out_dir, os.path.relpath(entry.path, sql_catalog.BASE_DIR))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            yaml.safe_dump(dataset, f, sort_keys=False, allow_unicode=True)
+        print(f"[Rewrite] {os.path.relpath(target)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialized views for the Superset datasets")
+    parser.add_argument("command", choices=["create", "refresh", "rewrite", "drop"])
+    parser.add_argument("--workers", type=int, default=4, help="concurrent refreshes")
+    parser.add_argument("--interval", type=float, help="refresh: repeat every N seconds")
+    parser.add_argument("--out-dir", default="superset_mv", help="rewrite: output directory")
+    args = parser.parse_args()
+
+    from config import DB_URI
+    pool = ThreadedConnectionPool(1, max(1, args.workers), **get_conn_kwargs(DB_URI))
+    try:
+        if args.command == "rewrite":
+            rewrite_datasets(args.out_dir, set(existing_views(pool)))
+        elif args.command == "create":
+            create_all(pool)
+        elif args.command == "drop":
+            drop_all(pool)
+        elif args.interval:
+            refresh_loop(pool, args.workers, args.interval)
+        else:
+            refresh_all(pool, existing_views(pool), args.workers)
+    except KeyboardInterrupt:
+        print("\n[Refresh] stopped")
+    finally:
+        pool.closeall()
@@ -0,0 +1,216 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Offline, vectorized versions of the flights-only aggregations in
+# queries.sql / analytics.py / the Superset datasets, answered straight from
+# flights.csv. Each function returns a DataFrame with the same columns
+# run_query returns for the equivalent SQL in OFFLINE_SQL.
+#
+# The busiest-airport aggregations group by city like queries.sql does, so
+# they also need an airports_data dump (airport_code → city), e.g.
+#   \copy airports_data TO 'airports_data.csv' CSV HEADER
+
+TIMESTAMP_COLUMNS = ["scheduled_departure", "scheduled_arrival", "actual_departure", "actual_arrival"]
+
+DTYPES = {
+    "flight_id": "int32",
+    "flight_no": "category",
+    "departure_airport": "category",
+    "arrival_airport": "category",
+    "status": "category",
+    "aircraft_code": "category",
+}
+
+# DATE(timestamptz) depends on the session TimeZone; the dump is in +03
+DEFAULT_TZ = "Europe/Moscow"
+
+def parse_timestamps(values: pd.Series) -> pd.Series:
+    # "+03" is not a valid %z offset, "+03:00" is
+    values = values.str.replace(r"([+-]\d\d)$", r"\1:00", regex=True)
+    return pd.to_datetime(values, format="%Y-%m-%d %H:%M:%S%z", utc=True)
+
+def load_flights(path="flights.csv") -> pd.DataFrame:
+    """Load a PostgreSQL CSV dump of flights into typed columns (\\N → NaN/NaT)."""
+    df = pd.read_csv(path, dtype={**DTYPES, **{c: "string" for c in TIMESTAMP_COLUMNS}},
+                     na_values=[r"\N"], keep_default_na=False)
+    for col in TIMESTAMP_COLUMNS:
+        df[col] = parse_timestamps(df[col])
+    return df
+
+def load_airports(path="airports_data.csv") -> pd.Series:
+    """airport_code → city from a CSV dump of airports_data."""
+    airports = pd.read_csv(path, usecols=["airport_code", "city"], dtype="string",
+                           na_values=[r"\N"], keep_default_na=False)
+    return airports.set_index(airports["airport_code"].str.strip())["city"]
+
+def attach_cities(df, cities):
+    """Add arrival_city / departure_city columns (NaN where the airport is unknown, like the SQL inner join)."""
+    for end in ("arrival", "departure"):
+        df[f"{end}_city"] = df[f"{end}_airport"].astype("string").map(cities).astype("category")
+    return df
+
+# ---------------- AGGREGATIONS ----------------
+def daily_flights(df, limit=30, tz=DEFAULT_TZ):
+    dep = df["scheduled_departure"].dropna().dt.tz_convert(tz).dt.normalize()
+    counts = dep.value_counts(sort=False).sort_index().head(limit)
+    return pd.DataFrame({"dep_date": counts.index.date, "total_flights": counts.to_numpy(dtype=np.int64)})
+
+def _busiest(df, column, value_name, limit):
+    counts = df[column].value_counts(sort=False)
+    counts = counts[counts > 0].sort_values(ascending=False, kind="stable").head(limit)
+    return pd.DataFrame({"city_name": counts.index.astype(str), value_name: counts.to_numpy(dtype=np.int64)})
+
+# both need attach_cities(); queries.sql groups airports by city
+def busiest_arrivals(df, limit=5):
+    return _busiest(df, "arrival_city", "total_arrivals", limit)
+
+def busiest_departures(df, limit=5):
+    return _busiest(df, "departure_city", "total_departures", limit)
+
+def cancelled_flights(df):
+    return pd.DataFrame({"cancelled_flights": [int((df["status"] == "Cancelled").sum())]})
+
+def on_time_flights(df):
+    return pd.DataFrame({"on_time_flights": [int((df["status"] == "On Time").sum())]})
+
+DURATION_CLASSES = np.array(["Short", "Medium", "Long", "Very Long", "Unknown"])
+
+def duration_classes(df):
+    """Flights per duration class, same buckets as the Superset "Duration Classes" dataset."""
+    minutes = ((df["scheduled_arrival"] - df["scheduled_departure"]).dt.total_seconds() / 60).to_numpy()
+    # <=60 Short, <=180 Medium, <=360 Long, >360 Very Long, NaN Unknown
+    codes = np.searchsorted([60, 180, 360], minutes, side="left")
+    codes[np.isnan(minutes)] = 4
+    counts = np.bincount(codes, minlength=len(DURATION_CLASSES))
+    keep = counts > 0
+    return pd.DataFrame({"duration_class": DURATION_CLASSES[keep], "flights": counts[keep]})
+
+AGGREGATIONS = {
+    "daily_flights": daily_flights,
+    "busiest_arrivals": busiest_arrivals,
+    "busiest_departures": busiest_departures,
+    "cancelled_flights": cancelled_flights,
+    "on_time_flights": on_time_flights,
+    "duration_classes": duration_classes,
+}
+
+# aggregations that need the airport cities of attach_cities()
+NEEDS_CITIES = {"busiest_arrivals", "busiest_departures"}
+
+# aggregations that reproduce a queries.sql statement (catalog name → its
+# top `limit` rows); the benchmark checks these against that statement
+# itself rather than against OFFLINE_SQL
+SOURCE_QUERIES = {
+    "busiest_arrivals": ("top_5_busiest_destinations_by_number_of_flights", 5),
+}
+
+# SQL equivalents, used by the benchmark and to check the results match
+OFFLINE_SQL = {
+    "daily_flights": """
+        SELECT DATE(scheduled_departure) AS dep_date, COUNT(*) AS total_flights
+        FROM flights WHERE scheduled_departure IS NOT NULL
+        GROUP BY dep_date ORDER BY dep_date LIMIT 30
+    """,
+    "busiest_arrivals": """
+        SELECT a.city AS city_name, COUNT(f.flight_id) AS total_arrivals
+        FROM flights f JOIN airports_data a ON f.arrival_airport = a.airport_code
+        GROUP BY a.city ORDER BY total_arrivals DESC LIMIT 5
+    """,
+    "busiest_departures": """
+        SELECT a.city AS city_name, COUNT(f.flight_id) AS total_departures
+        FROM flights f JOIN airports_data a ON f.departure_airport = a.airport_code
+        GROUP BY a.city ORDER BY total_departures DESC LIMIT 5
+    """,
+    "cancelled_flights": "SELECT COUNT(*) AS cancelled_flights FROM flights WHERE status = 'Cancelled'",
+    "on_time_flights": "SELECT COUNT(*) AS on_time_flights FROM flights WHERE status = 'On Time'",
+    "duration_classes": """
+        SELECT CASE
+                 WHEN d <= 60 THEN 'Short'
+                 WHEN d <= 180 THEN 'Medium'
+                 WHEN d <= 360 THEN 'Long'
+                 WHEN d > 360 THEN 'Very Long'
+                 ELSE 'Unknown'
+               END AS duration_class,
+               COUNT(*) AS flights
+        FROM (SELECT EXTRACT(epoch FROM (scheduled_arrival - scheduled_departure)) / 60 AS d
+              FROM flights) t
+        GROUP BY 1
+    """,
+}
+
+# ---------------- BENCHMARK ----------------
+def _best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def source_sql(name):
+    """The SQL an aggregation is checked against: its queries.sql statement if it has one, else OFFLINE_SQL."""
+    if name not in SOURCE_QUERIES:
+        return OFFLINE_SQL[name]
+    import sql_catalog
+
+    slug, limit = SOURCE_QUERIES[name]
+    entry = next(e for e in sql_catalog.queries_sql() if e.name.endswith(slug))
+    return f"SELECT * FROM ({entry.sql}) source LIMIT {limit}"
+
+def available(df):
+    """The aggregations `df` can answer (the busiest airports need attach_cities())."""
+    return {name: fn for name, fn in AGGREGATIONS.items()
+            if name not in NEEDS_CITIES or "arrival_city" in df.columns}
+
+def benchmark(df, repeat=5, with_sql=True):
+    """Best-of-`repeat` timings of every aggregation offline and, if reachable, over SQL."""
+    engine = None
+    if with_sql:
+        try:
+            from sqlalchemy import create_engine, text
+            from config import DB_URI
+            engine = create_engine(DB_URI)
+        except Exception as e:
+            print(f"[Benchmark] SQL path unavailable: {e}")
+
+    print(f"{'aggregation':<20} {'offline ms':>11} {'sql ms':>10} {'speedup':>8}  match")
+    for name, fn in available(df).items():
+        offline, result = _best_of(lambda: fn(df), repeat)
+        sql_str, speedup, match = "-", "-", "-"
+        if engine is not None:
+            with engine.connect() as conn:
+                sql, expected = _best_of(lambda: pd.read_sql(text(source_sql(name)), conn), repeat)
+            sql_str = f"{sql * 1000:.1f}"
+            speedup = f"{sql / offline:.1f}x"
+            # ORDER BY ties may come back in a different order from the database
+            key = list(result.columns)
+            match = "yes" if result.sort_values(key).astype(str).reset_index(drop=True).equals(
+                expected.sort_values(key).astype(str).reset_index(drop=True)) else "no"
+        print(f"{name:<20} {offline * 1000:>11.2f} {sql_str:>10} {speedup:>8}  {match}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline flights aggregations over flights.csv")
+    parser.add_argument("--csv", default="flights.csv")
+    parser.add_argument("--airports", default="airports_data.csv",
+                        help="airports_data CSV dump for the city of each airport (busiest_* need it)")
+    parser.add_argument("--benchmark", action="store_true", help="time offline vs SQL")
+    parser.add_argument("--offline-only", action="store_true", help="skip the SQL side of --benchmark")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    flights = load_flights(args.csv)
+    print(f"[Loaded] {len(flights)} flights from {args.csv} in {time.perf_counter() - start:.2f}s")
+    if os.path.exists(args.airports):
+        attach_cities(flights, load_airports(args.airports))
+    else:
+        print(f"[Skipped] {', '.join(sorted(NEEDS_CITIES))}: no airport cities ({args.airports} not found)")
+
+    if args.benchmark:
+        benchmark(flights, with_sql=not args.offline_only)
+    else:
+        for name, fn in available(flights).items():
+            print(f"\n--- {name} ---")
+            print(fn(flights).to_string(index=False))
@@ -1,13 +1,41 @@
 # custom_exporter.py
 
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
-from prometheus_client import start_http_server, Gauge
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+from urllib3.util.retry import Retry
+from prometheus_client import start_http_server, Counter, Gauge, Histogram
 
 # === CONFIGURATION ===
-API_KEY = "bb147ec1b4190fffc5e585d1ddb31c82"
-UPDATE_INTERVAL = 20  # seconds
-PORT = 8000
+API_KEY = os.environ.get("API_KEY", "bb147ec1b4190fffc5e585d1ddb31c82")
+API_BASE_URL = os.environ.get("API_BASE_URL", "https://api.openweathermap.org/data/3.0/onecall")
+UPDATE_INTERVAL = float(os.environ.get("UPDATE_INTERVAL", 20))  # seconds
+PORT = int(os.environ.get("PORT", 8000))
+
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 32))           # concurrent requests
+CONNECT_TIMEOUT = float(os.environ.get("CONNECT_TIMEOUT", 3))      # seconds
+READ_TIMEOUT = float(os.environ.get("READ_TIMEOUT", 5))            # seconds
+MAX_RETRIES = int(os.environ.get("MAX_RETRIES", 2))
+BACKOFF_FACTOR = float(os.environ.get("BACKOFF_FACTOR", 0.5))      # 0.5s, 1s, 2s, ...
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 60))                 # seconds, 0 disables
+CITIES_FILE = os.environ.get("CITIES_FILE")                        # JSON list of {name, lat, lon}
+
+def stale_after_default(cache_ttl, update_interval):
+    """
+    Staleness threshold that tolerates one failed round: a cache hit keeps
+    the original fetch time, so a city is up to `cache_ttl` old when its
+    entry expires and one interval older at the next round after a failure.
+    """
+    return max(3 * update_interval, cache_ttl + 2 * update_interval)
+
+# seconds without a successful update
+STALE_AFTER = float(os.environ.get("STALE_AFTER", stale_after_default(CACHE_TTL, UPDATE_INTERVAL)))
 
 # List of cities with coordinates
 CITIES = [
@@ -17,6 +45,10 @@ CITIES = [
     {"name": "Sydney", "lat": -33.8727, "lon": 151.2057},
 ]
 
+def load_cities(path):
+    with open(path, encoding="utf-8") as f:
+        return [{"name": c["name"], "lat": float(c["lat"]), "lon": float(c["lon"])} for c in json.load(f)]
+
 # === DEFINE PROMETHEUS METRICS WITH CITY LABEL ===
 weather_temp = Gauge("weather_temp_celsius", "Temperature in Celsius", ["city"])
 weather_feels_like = Gauge("weather_feels_like_celsius", "Feels like temperature in Celsius", ["city"])
@@ -30,39 +62,207 @@ weather_sunrise = Gauge("weather_sunrise_timestamp", "Sunrise timestamp", ["city
 weather_sunset = Gauge("weather_sunset_timestamp", "Sunset timestamp", ["city"])
 weather_day_length = Gauge("weather_day_length_seconds", "Length of the day in seconds", ["city"])
 
+WEATHER_GAUGES = [
+    weather_temp, weather_feels_like, weather_pressure, weather_humidity, weather_dew_point, weather_clouds,
+    weather_wind_speed, weather_wind_deg, weather_sunrise, weather_sunset, weather_day_length,
+]
+
+# === EXPORTER SELF-INSTRUMENTATION ===
+fetch_duration = Histogram("weather_fetch_duration_seconds", "Upstream API request latency (cache misses only)",
+                           ["city"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20))
+fetch_success = Counter("weather_fetch_success_total", "Successful city updates", ["city", "source"])
+fetch_failures = Counter("weather_fetch_failures_total", "Failed city updates", ["city", "reason"])
+last_success = Gauge("weather_last_success_timestamp_seconds", "Unix time of the last successful update", ["city"])
+data_stale = Gauge("weather_data_stale", "1 when the city has not been updated for STALE_AFTER seconds", ["city"])
+refresh_duration = Histogram("weather_refresh_duration_seconds", "Duration of one refresh round",
+                             buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 30, 60))
+refresh_pending = Gauge("weather_refresh_pending_cities", "Cities not updated within the last round's deadline")
+
+# === HTTP SESSION AND RESPONSE CACHE ===
+def make_session(pool_size=FETCH_WORKERS, retries=MAX_RETRIES, backoff=BACKOFF_FACTOR):
+    """One keep-alive connection pool shared by all fetch threads, with retry/backoff on transient errors."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ResponseCache:
+    """
+    Thread-safe {key: payload} store whose entries expire `ttl` seconds after
+    being stored; `get` also returns when the payload was fetched.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(payload, fetched_at) or None; fetched_at is (unix time, monotonic time)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1], entry[2]
+        return None
+
+    def put(self, key, payload, fetched_at):
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[key] = (fetched_at[1] + self.ttl, payload, fetched_at)
+
 # === FUNCTION TO FETCH AND UPDATE METRICS ===
-def update_metrics():
-    for city in CITIES:
+# city name -> future still running from an earlier round
+in_flight = {}
+# city name -> monotonic time of its last successful update
+last_updated = {}
+EXPORTER_STARTED = time.monotonic()
+
+def fetch_current(session, cache, city):
+    """
+    The `current` block for one city, from the cache when fresh. Returns
+    (data, cached, fetched_at) with fetched_at = (unix, monotonic) time of the
+    API response the data came from.
+    """
+    key = (city["lat"], city["lon"])
+    cached = cache.get(key)
+    if cached is not None:
+        return cached[0], True, cached[1]
+    params = {
+        "lat": city["lat"],
+        "lon": city["lon"],
+        "exclude": "minutely,hourly,daily,alerts",
+        "appid": API_KEY,
+        "units": "metric",
+    }
+    start = time.perf_counter()
+    try:
+        response = session.get(API_BASE_URL, params=params, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+        response.raise_for_status()
+        current = response.json()["current"]
+    finally:
+        fetch_duration.labels(city=city["name"]).observe(time.perf_counter() - start)
+    fetched_at = (time.time(), time.monotonic())
+    cache.put(key, current, fetched_at)
+    return current, False, fetched_at
+
+def set_metrics(name, current):
+    # Update metrics with city label
+    weather_temp.labels(city=name).set(current['temp'])
+    weather_feels_like.labels(city=name).set(current['feels_like'])
+    weather_pressure.labels(city=name).set(current['pressure'])
+    weather_humidity.labels(city=name).set(current['humidity'])
+    weather_dew_point.labels(city=name).set(current['dew_point'])
+    weather_clouds.labels(city=name).set(current['clouds'])
+    weather_wind_speed.labels(city=name).set(current['wind_speed'])
+    weather_wind_deg.labels(city=name).set(current['wind_deg'])
+    weather_sunrise.labels(city=name).set(current['sunrise'])
+    weather_sunset.labels(city=name).set(current['sunset'])
+    weather_day_length.labels(city=name).set(current['sunset'] - current['sunrise'])
+
+def update_city(session, cache, city):
+    current, cached, fetched_at = fetch_current(session, cache, city)
+    set_metrics(city["name"], current)
+    fetch_success.labels(city=city["name"], source="cache" if cached else "api").inc()
+    # age is counted from the API response, so a cache hit never hides an upstream outage
+    last_success.labels(city=city["name"]).set(fetched_at[0])
+    last_updated[city["name"]] = fetched_at[1]
+    return cached
+
+def failure_reason(error):
+    if isinstance(error, requests.exceptions.Timeout):
+        return "timeout"
+    # once the retries are used up, requests reports timeouts as
+    # ConnectionError(MaxRetryError(reason=ReadTimeoutError(...)))
+    # (NewConnectionError subclasses ConnectTimeoutError but is a refused/failed connect)
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    if isinstance(reason, (ReadTimeoutError, ConnectTimeoutError)) and not isinstance(reason, NewConnectionError):
+        return "timeout"
+    if isinstance(error, requests.exceptions.RetryError):
+        return "retries_exhausted"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "connection"
+    if isinstance(error, requests.exceptions.HTTPError):
+        return f"http_{error.response.status_code}" if error.response is not None else "http"
+    if isinstance(error, (KeyError, TypeError, ValueError)):
+        return "bad_payload"
+    return "other"
+
+def mark_stale(cities, started):
+    """Flag cities without a successful update for STALE_AFTER seconds and drop their weather series."""
+    now = time.monotonic()
+    for city in cities:
+        name = city["name"]
+        stale = now - last_updated.get(name, started) > STALE_AFTER
+        data_stale.labels(city=name).set(int(stale))
+        if stale:
+            for gauge in WEATHER_GAUGES:
+                try:
+                    gauge.remove(name)
+                except KeyError:
+                    pass
+
+def update_metrics(executor, session, cache, cities, deadline=UPDATE_INTERVAL):
+    """
+    Fetch all cities concurrently. Whatever has not finished within `deadline`
+    is reported and left running; those cities are skipped until it completes.
+    """
+    start = time.perf_counter()
+    futures = {}
+    for city in cities:
+        previous = in_flight.get(city["name"])
+        if previous is None or previous.done():
+            future = executor.submit(update_city, session, cache, city)
+            futures[future] = city
+            in_flight[city["name"]] = future
+    done, pending = wait(futures, timeout=deadline)
+
+    updated = cached = failed = 0
+    for future in done:
+        city = futures[future]
         try:
-            url = f"https://api.openweathermap.org/data/3.0/onecall?lat={city['lat']}&lon={city['lon']}&exclude=minutely,hourly,daily,alerts&appid={API_KEY}&units=metric"
-            response = requests.get(url)
-            data = response.json()
-            current = data['current']
-
-            # Update metrics with city label
-            weather_temp.labels(city=city["name"]).set(current['temp'])
-            weather_feels_like.labels(city=city["name"]).set(current['feels_like'])
-            weather_pressure.labels(city=city["name"]).set(current['pressure'])
-            weather_humidity.labels(city=city["name"]).set(current['humidity'])
-            weather_dew_point.labels(city=city["name"]).set(current['dew_point'])
-            weather_clouds.labels(city=city["name"]).set(current['clouds'])
-            weather_wind_speed.labels(city=city["name"]).set(current['wind_speed'])
-            weather_wind_deg.labels(city=city["name"]).set(current['wind_deg'])
-            weather_sunrise.labels(city=city["name"]).set(current['sunrise'])
-            weather_sunset.labels(city=city["name"]).set(current['sunset'])
-            weather_day_length.labels(city=city["name"]).set(current['sunset'] - current['sunrise'])
-
-            print(f"Metrics updated for {city['name']} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            cached += future.result()
+            updated += 1
         except Exception as e:
+            failed += 1
+            fetch_failures.labels(city=city["name"], reason=failure_reason(e)).inc()
             print(f"Error updating metrics for {city['name']}: {e}")
+    for future in pending:
+        fetch_failures.labels(city=futures[future]["name"], reason="deadline").inc()
+        print(f"Timed out updating metrics for {futures[future]['name']}")
+
+    mark_stale(cities, EXPORTER_STARTED)
+    refresh_duration.observe(time.perf_counter() - start)
+    refresh_pending.set(len(pending) + len(cities) - len(futures))
+
+    print(f"Metrics updated for {updated}/{len(cities)} cities ({cached} cached, {failed} failed, "
+          f"{len(pending)} pending, {len(cities) - len(futures)} still in flight) "
+          f"in {time.perf_counter() - start:.2f}s at {time.strftime('%Y-%m-%d %H:%M:%S')}")
 
 # === MAIN LOOP ===
 if __name__ == "__main__":
+    cities = load_cities(CITIES_FILE) if CITIES_FILE else CITIES
+    session = make_session()
+    cache = ResponseCache()
+    executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+
     # Start Prometheus HTTP server
     start_http_server(PORT)
-    print(f"Custom Exporter running on http://localhost:{PORT}/metrics")
+    print(f"Custom Exporter running on http://localhost:{PORT}/metrics ({len(cities)} cities, {API_BASE_URL})")
+    if STALE_AFTER < CACHE_TTL + 2 * UPDATE_INTERVAL:
+        print(f"⚠️ Warning: STALE_AFTER={STALE_AFTER:g}s < CACHE_TTL + 2 × UPDATE_INTERVAL "
+              f"({CACHE_TTL + 2 * UPDATE_INTERVAL:g}s): a single failed refresh after a cache hit marks a city stale")
 
-    # Update metrics continuously
+    # Update metrics every UPDATE_INTERVAL seconds, measured from the start of each round
+    next_run = time.monotonic()
     while True:
-        update_metrics()
-        time.sleep(UPDATE_INTERVAL)
+        update_metrics(executor, session, cache, cities)
+        next_run += UPDATE_INTERVAL
+        time.sleep(max(0.0, next_run - time.monotonic()))
@@ -0,0 +1,104 @@
+# stub_weather_server.py
+#
+# Local stand-in for the OpenWeather One Call endpoint, for exercising
+# custom_exporter.py without an API key or network:
+#
+#   python stub_weather_server.py --port 8081 --delay 0.2 --fail-rate 0.1 --cities 300 --cities-file cities.json
+#   API_BASE_URL=http://localhost:8081/onecall CITIES_FILE=cities.json python custom_exporter.py
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def fake_current(lat, lon):
+    """Deterministic per location, drifting slowly with time."""
+    rng = random.Random(f"{lat:.4f},{lon:.4f}")
+    now = int(time.time())
+    sunrise = now - now % 86400 + rng.randint(4, 8) * 3600
+    temp = round(30 - abs(lat) / 2 + rng.uniform(-5, 5) + (now % 600) / 300, 2)
+    return {
+        "dt": now,
+        "temp": temp,
+        "feels_like": round(temp - rng.uniform(0, 3), 2),
+        "pressure": rng.randint(990, 1030),
+        "humidity": rng.randint(20, 100),
+        "dew_point": round(temp - rng.uniform(2, 10), 2),
+        "clouds": rng.randint(0, 100),
+        "wind_speed": round(rng.uniform(0, 15), 2),
+        "wind_deg": rng.randint(0, 359),
+        "sunrise": sunrise,
+        "sunset": sunrise + rng.randint(9, 15) * 3600,
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive, so the exporter's pooled session reuses its connections
+    # (every response, errors included, carries a Content-Length)
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    fail_rate = 0.0
+    requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with StubHandler.lock:
+            StubHandler.requests += 1
+        if url.path != "/onecall" or "lat" not in query or "lon" not in query:
+            self.send_error(404)
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        if random.random() < self.fail_rate:
+            self.send_error(503)
+            return
+        body = json.dumps({
+            "lat": float(query["lat"][0]),
+            "lon": float(query["lon"][0]),
+            "current": fake_current(float(query["lat"][0]), float(query["lon"][0])),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    # the default listen backlog of 5 makes a 32-worker burst queue on connect
+    request_queue_size = 128
+    daemon_threads = True
+
+def write_cities(path, n, seed=0):
+    rng = random.Random(seed)
+    cities = [{"name": f"City_{i:04d}", "lat": round(rng.uniform(-60, 70), 4), "lon": round(rng.uniform(-180, 180), 4)}
+              for i in range(n)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cities, f, indent=1)
+    print(f"Wrote {n} cities to {path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenWeather One Call server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to sleep per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--cities", type=int, help="also write this many synthetic cities to --cities-file")
+    parser.add_argument("--cities-file", default="cities.json")
+    args = parser.parse_args()
+
+    if args.cities:
+        write_cities(args.cities_file, args.cities)
+    StubHandler.delay = args.delay
+    StubHandler.fail_rate = args.fail_rate
+    server = StubServer(("0.0.0.0", args.port), StubHandler)
+    print(f"Stub weather API on http://localhost:{args.port}/onecall")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nServed {StubHandler.requests} requests")
@@ -0,0 +1,111 @@
+# test_custom_exporter.py
+#
+# Exercises custom_exporter.py against stub_weather_server.py on a local port:
+#
+#   python -m unittest test_custom_exporter        (from this directory)
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import requests
+
+import custom_exporter
+from stub_weather_server import StubHandler, StubServer
+
+CITY = {"name": "Teststadt", "lat": 10.0, "lon": 20.0}
+
+class StubServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/onecall"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.saved = custom_exporter.API_BASE_URL, custom_exporter.READ_TIMEOUT
+        custom_exporter.API_BASE_URL = self.url
+        StubHandler.delay, StubHandler.fail_rate = 0.0, 0.0
+        custom_exporter.last_updated.pop(CITY["name"], None)
+
+    def tearDown(self):
+        custom_exporter.API_BASE_URL, custom_exporter.READ_TIMEOUT = self.saved
+        StubHandler.delay, StubHandler.fail_rate = 0.0, 0.0
+
+    def fetch_error(self, session):
+        cache = custom_exporter.ResponseCache(ttl=0)
+        with self.assertRaises(requests.exceptions.RequestException) as raised:
+            custom_exporter.fetch_current(session, cache, CITY)
+        return raised.exception
+
+    def test_read_timeout_after_retries_is_timeout(self):
+        custom_exporter.READ_TIMEOUT = 0.5
+        StubHandler.delay = 1.5
+        error = self.fetch_error(custom_exporter.make_session(retries=2, backoff=0))
+        # requests wraps it as ConnectionError(MaxRetryError(ReadTimeoutError))
+        self.assertIsInstance(error, requests.exceptions.ConnectionError)
+        self.assertEqual(custom_exporter.failure_reason(error), "timeout")
+
+    def test_read_timeout_without_retries_is_timeout(self):
+        custom_exporter.READ_TIMEOUT = 0.5
+        StubHandler.delay = 1.5
+        error = self.fetch_error(custom_exporter.make_session(retries=0, backoff=0))
+        self.assertEqual(custom_exporter.failure_reason(error), "timeout")
+
+    def test_503_after_retries_is_retries_exhausted(self):
+        StubHandler.fail_rate = 1.0
+        error = self.fetch_error(custom_exporter.make_session(retries=1, backoff=0))
+        self.assertEqual(custom_exporter.failure_reason(error), "retries_exhausted")
+
+    def test_refused_connection_is_connection(self):
+        with ThreadingHTTPServer(("127.0.0.1", 0), StubHandler) as closed:
+            port = closed.server_address[1]
+        custom_exporter.API_BASE_URL = f"http://127.0.0.1:{port}/onecall"
+        error = self.fetch_error(custom_exporter.make_session(retries=0, backoff=0))
+        self.assertEqual(custom_exporter.failure_reason(error), "connection")
+
+    def test_cache_hit_keeps_the_fetch_time(self):
+        session = custom_exporter.make_session(retries=0)
+        cache = custom_exporter.ResponseCache(ttl=60)
+        last_success = custom_exporter.last_success.labels(city=CITY["name"])
+
+        self.assertFalse(custom_exporter.update_city(session, cache, CITY))
+        fetched_wall = last_success._value.get()
+        fetched_mono = custom_exporter.last_updated[CITY["name"]]
+
+        time.sleep(0.05)
+        self.assertTrue(custom_exporter.update_city(session, cache, CITY))
+        self.assertEqual(last_success._value.get(), fetched_wall)
+        self.assertEqual(custom_exporter.last_updated[CITY["name"]], fetched_mono)
+
+    def test_cached_city_survives_one_failed_round(self):
+        ttl, interval = 0.3, 0.15
+        saved = custom_exporter.STALE_AFTER
+        custom_exporter.STALE_AFTER = custom_exporter.stale_after_default(ttl, interval)
+        self.addCleanup(setattr, custom_exporter, "STALE_AFTER", saved)
+        session = custom_exporter.make_session(retries=0)
+        cache = custom_exporter.ResponseCache(ttl=ttl)
+        stale = custom_exporter.data_stale.labels(city=CITY["name"])
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            custom_exporter.update_metrics(executor, session, cache, [CITY])
+            # last cache hit just before expiry, then the refetch a round later fails
+            time.sleep(ttl + interval)
+            StubHandler.fail_rate = 1.0
+            custom_exporter.update_metrics(executor, session, cache, [CITY])
+            self.assertEqual(stale._value.get(), 0)
+
+            # a second failed round is one too many
+            time.sleep(1.5 * interval)
+            custom_exporter.update_metrics(executor, session, cache, [CITY])
+            self.assertEqual(stale._value.get(), 1)
+
+if __name__ == "__main__":
+    unittest.main()
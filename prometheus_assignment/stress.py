@@ -1,30 +1,298 @@
-import threading
-import time
+import argparse
 import multiprocessing
+import os
+import queue
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+# Load generator for the monitoring stack, one *process* per worker so it is
+# not limited to a single core by the GIL.
+#
+#   cpu  burns every core for --duration seconds (node_exporter dashboards)
+#   db   replays a weighted mix of the SELECTs in queries.sql plus
+#        autoRefresh.py-style flight inserts against PostgreSQL at a target
+#        total QPS, with --concurrency connections (database dashboards)
+#
+# Workers send their latencies to the parent once a second; the parent prints
+# a live p50/p95/p99 / throughput / error line every --report-every seconds
+# and a per-statement summary at the end. Throughput is shown twice: attempted
+# (every statement sent) and achieved (only those that succeeded).
+#
+# Inserted flight_ids start above the current max(flight_id), so a rerun
+# never collides with an earlier one; --cleanup deletes the run's rows.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 # Duration to run the stress test (in seconds)
 DURATION = 315  # 5 minutes
 
+# same routes and aircraft as the autoRefresh.py feed
+DEPARTURE_AIRPORTS = ['SVO', 'LED', 'DME', 'ULY', 'IAR', 'MQF', 'NYM', 'EGO', 'NFG']
+ARRIVAL_AIRPORTS = ['KZN', 'ROV', 'KUF', 'KVX', 'IJK', 'RTW', 'PEE']
+AIRCRAFT_CODES = ['773', '319', '320', '319', 'CN1']
+BASE_DATE = datetime(2017, 9, 20)
+
+INSERT_SQL = """
+    INSERT INTO flights (flight_id, flight_no, scheduled_departure, scheduled_arrival,
+                         departure_airport, arrival_airport, aircraft_code, status)
+    VALUES (%(flight_id)s, %(flight_no)s, %(sd)s, %(sa)s, %(dep)s, %(arr)s, %(air)s, 'Scheduled')
+"""
+
+# ---------------- CPU MODE ----------------
 # Function to keep CPU busy
-def cpu_stress():
-    end_time = time.time() + DURATION
+def cpu_stress(duration):
+    end_time = time.time() + duration
     while time.time() < end_time:
         x = 0
         for i in range(1000000):
             x += i*i
 
-# Get the number of CPU cores
-num_cores = multiprocessing.cpu_count()
+def run_cpu(processes, duration):
+    print(f"CPU stress: {processes} processes for {duration}s")
+    with multiprocessing.Pool(processes) as pool:
+        pool.map(cpu_stress, [duration] * processes)
+    print("CPU stress test complete!")
+
+# ---------------- DB MODE ----------------
+def load_workload(path, insert_weight, weights):
+    """[(name, sql or None for an insert, weight)] from the SELECTs of `path`."""
+    import sqlparse
+
+    with open(path, encoding="utf-8") as f:
+        statements = [s.strip() for s in sqlparse.split(f.read()) if s.strip()]
+    workload = []
+    for i, statement in enumerate(statements, start=1):
+        body = "\n".join(line for line in statement.splitlines() if not line.strip().startswith("--")).strip()
+        if not body.lower().startswith(("select", "with")):
+            continue
+        title = next((line.strip().lstrip("-").strip() for line in statement.splitlines()
+                      if line.strip().startswith("--")), f"statement {i}")
+        weight = weights.get(i, 1.0)
+        if weight > 0:
+            workload.append((f"q{i:02d} {title[:40]}", statement.rstrip(";"), weight))
+    if insert_weight > 0:
+        workload.append(("insert flight", None, insert_weight))
+    return workload
+
+def make_flight(rng, flight_id):
+    departure = BASE_DATE + timedelta(minutes=rng.randrange(365 * 24 * 60))
+    return {
+        'flight_id': flight_id,
+        'flight_no': f"FN{rng.randint(1000, 9999)}",
+        'sd': departure,
+        'sa': departure + timedelta(hours=rng.randint(1, 5)),
+        'dep': rng.choice(DEPARTURE_AIRPORTS),
+        'arr': rng.choice(ARRIVAL_AIRPORTS),
+        'air': rng.choice(AIRCRAFT_CODES),
+    }
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+def db_worker(index, dsn, workload, rate, duration, insert_start_id, statement_timeout, results, seed):
+    """One connection issuing statements at `rate`/s on an absolute schedule; ships (name, latency, error) batches."""
+    import psycopg2
+
+    rng = random.Random(seed + index)
+    names = [w[0] for w in workload]
+    cum_weights = []
+    total = 0.0
+    for _, _, weight in workload:
+        total += weight
+        cum_weights.append(total)
+    sql_by_name = {name: sql for name, sql, _ in workload}
+
+    conn = psycopg2.connect(dsn, options=f"-c statement_timeout={statement_timeout}")
+    conn.autocommit = True
+    next_id = insert_start_id
+    batch = []
+    sent = 0
+    start = time.perf_counter()
+    last_flush = start
+    try:
+        while True:
+            due = start + sent / rate
+            if due - start >= duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rng.choices(names, cum_weights=cum_weights)[0]
+            sql = sql_by_name[name]
+            t0 = time.perf_counter()
+            error = None
+            try:
+                with conn.cursor() as cursor:
+                    if sql is None:
+                        cursor.execute(INSERT_SQL, make_flight(rng, next_id))
+                        next_id += 1
+                    else:
+                        cursor.execute(sql)
+                        cursor.fetchall()
+            except psycopg2.Error as e:
+                error = type(e).__name__
+                if conn.closed:
+                    conn = psycopg2.connect(dsn, options=f"-c statement_timeout={statement_timeout}")
+                    conn.autocommit = True
+            batch.append((name, time.perf_counter() - t0, error))
+            sent += 1
+            now = time.perf_counter()
+            if now - last_flush >= 1.0:
+                results.put(batch)
+                batch, last_flush = [], now
+    finally:
+        if batch:
+            results.put(batch)
+        results.put(None)
+        conn.close()
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def add(self, batch):
+        for name, latency, error in batch:
+            if error is None:
+                self.latencies[name].append(latency)
+            else:
+                self.errors[name][error] += 1
+
+    def all_latencies(self):
+        return sorted(l for values in self.latencies.values() for l in values)
+
+    def error_count(self):
+        return sum(sum(c.values()) for c in self.errors.values())
+
+def line(label, latencies, errors, seconds):
+    ok = len(latencies)
+    attempted = (ok + errors) / seconds if seconds else 0
+    achieved = ok / seconds if seconds else 0
+    return (f"{label:<48} {attempted:>8.1f} sent/s {achieved:>8.1f} ok/s  p50 {percentile(latencies, 50) * 1000:>8.1f}  "
+            f"p95 {percentile(latencies, 95) * 1000:>8.1f}  p99 {percentile(latencies, 99) * 1000:>8.1f} ms  "
+            f"errors {errors}")
+
+def next_flight_id(dsn):
+    """First flight_id above every existing flight, so inserts never collide with earlier runs."""
+    import psycopg2
+
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT coalesce(max(flight_id), 0) + 1 FROM flights")
+        return cursor.fetchone()[0]
+
+def delete_flights(dsn, first_id, last_id):
+    import psycopg2
+
+    with psycopg2.connect(dsn) as conn, conn.cursor() as cursor:
+        cursor.execute("DELETE FROM flights WHERE flight_id BETWEEN %s AND %s", (first_id, last_id))
+        return cursor.rowcount
+
+def run_db(args):
+    dsn = args.dsn or os.environ.get("DATABASE_URL")
+    if not dsn:
+        sys.path.insert(0, ROOT)
+        from config import DB_URI
+        # SQLAlchemy URLs may name a driver (postgresql+psycopg2://), libpq does not
+        dsn = re.sub(r"^postgresql\+\w+://", "postgresql://", DB_URI)
+    weights = {}
+    for item in args.weight:
+        index, weight = item.split("=")
+        weights[int(index)] = float(weight)
+    workload = load_workload(args.file, args.insert_weight, weights)
+    if not workload:
+        raise SystemExit("No statements to replay")
+
+    print(f"DB stress: {len(workload)} statement kinds, target {args.qps:g} qps over "
+          f"{args.concurrency} processes for {args.duration}s")
+    for name, _, weight in workload:
+        print(f"  {weight:>5g}  {name}")
+    inserts = any(sql is None for _, sql, _ in workload)
+    first_id = 0
+    if inserts:
+        first_id = args.insert_start_id if args.insert_start_id is not None else next_flight_id(dsn)
+        last_id = first_id + args.concurrency * args.ids_per_worker - 1
+        print(f"  inserted flight_ids: {first_id}..{last_id}")
+
+    results = multiprocessing.Queue()
+    rate = args.qps / args.concurrency
+    workers = [
+        multiprocessing.Process(target=db_worker, args=(i, dsn, workload, rate, args.duration,
+                                                        first_id + i * args.ids_per_worker,
+                                                        args.statement_timeout, results, args.seed))
+        for i in range(args.concurrency)
+    ]
+    for w in workers:
+        w.start()
+
+    total, window = Stats(), Stats()
+    running = len(workers)
+    start = last_report = time.perf_counter()
+    try:
+        while running:
+            try:
+                batch = results.get(timeout=0.5)
+            except queue.Empty:
+                batch = []
+            if batch is None:
+                running -= 1
+                continue
+            total.add(batch)
+            window.add(batch)
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print(line(f"[{now - start:6.0f}s] all", window.all_latencies(), window.error_count(),
+                           now - last_report))
+                window, last_report = Stats(), now
+    except KeyboardInterrupt:
+        print("\nStopping workers...")
+        for w in workers:
+            w.terminate()
+    for w in workers:
+        w.join()
 
-# Create a thread for each core
-threads = []
-for _ in range(num_cores):
-    t = threading.Thread(target=cpu_stress)
-    t.start()
-    threads.append(t)
+    elapsed = time.perf_counter() - start
+    print(f"\n--- Summary ({elapsed:.1f}s, target {args.qps:g} qps) ---")
+    for name, _, _ in workload:
+        latencies = sorted(total.latencies.get(name, []))
+        print(line(name, latencies, sum(total.errors[name].values()), elapsed))
+    print(line("all", total.all_latencies(), total.error_count(), elapsed))
+    for name, counter in total.errors.items():
+        for error, n in counter.most_common():
+            print(f"  {n:>6} x {error} in {name}")
+    if inserts and args.cleanup:
+        print(f"Deleted {delete_flights(dsn, first_id, last_id)} inserted flights")
 
-# Wait for all threads to finish
-for t in threads:
-    t.join()
+def parse_args():
+    parser = argparse.ArgumentParser(description="CPU or database load generator for the monitoring stack")
+    parser.add_argument("mode", nargs="?", choices=["cpu", "db"], default="cpu")
+    parser.add_argument("--duration", type=float, default=DURATION, help="seconds to run")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="cpu mode: processes")
+    parser.add_argument("--dsn", help="db mode: connection string (default: DATABASE_URL or config.DB_URI)")
+    parser.add_argument("--file", default=os.path.join(ROOT, "queries.sql"), help="db mode: statements to replay")
+    parser.add_argument("--qps", type=float, default=50, help="db mode: target statements/s over all workers")
+    parser.add_argument("--concurrency", type=int, default=8, help="db mode: worker processes (= connections)")
+    parser.add_argument("--weight", action="append", default=[], metavar="N=W",
+                        help="db mode: weight of the N-th statement of --file (default 1, 0 drops it)")
+    parser.add_argument("--insert-weight", type=float, default=1.0, help="db mode: weight of flight inserts")
+    parser.add_argument("--insert-start-id", type=int,
+                        help="db mode: first inserted flight_id (default: max(flight_id) + 1)")
+    parser.add_argument("--ids-per-worker", type=int, default=1000000, help="db mode: flight_id range per worker")
+    parser.add_argument("--cleanup", action="store_true", help="db mode: delete the inserted flights at the end")
+    parser.add_argument("--statement-timeout", type=int, default=30000, help="db mode: statement_timeout in ms")
+    parser.add_argument("--report-every", type=float, default=5, help="db mode: seconds between live lines")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
 
-print("CPU stress test complete!")
+if __name__ == "__main__":
+    args = parse_args()
+    if args.mode == "cpu":
+        run_cpu(args.processes, args.duration)
+    else:
+        run_db(args)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+# Tables whose change counters make up the watermark of a query.
+TABLE_PATTERN = re.compile(r"\b(?:from|join)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+
+WATERMARK_SQL = """
+    SELECT relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup
+    FROM pg_stat_user_tables
+    WHERE relname = ANY(:tables)
+    ORDER BY relname
+"""
+
+def normalize_sql(query: str) -> str:
+    """Drop comments, collapse whitespace and lowercase everything outside string literals."""
+    query = re.sub(r"--[^\n]*", " ", query)
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:  # string literal, keep as is
+            normalized.append(part)
+        else:
+            normalized.append(re.sub(r"\s+", " ", part).lower())
+    return "".join(normalized).strip().rstrip(";").strip()
+
+def referenced_tables(query: str):
+    return sorted({t.lower() for t in TABLE_PATTERN.findall(normalize_sql(query))})
+
+class QueryCache:
+    """
+    Two-tier cache for query results keyed on normalized SQL.
+
+    - memory tier: LRU of DataFrames, bounded by `memory_entries`
+    - disk tier: one Parquet file (+ JSON sidecar) per query under `cache_dir`,
+      bounded by `ttl` seconds and `max_bytes`, evicted least-recently-used
+
+    An entry is only reused while the watermark of the tables the query reads
+    is unchanged. The watermark comes from pg_stat_user_tables insert/update/
+    delete counters (plus max(flight_id) for flights), which costs one catalog
+    lookup instead of re-running the joins.
+    """
+
+    def __init__(self, engine, cache_dir="cache/queries", ttl=24 * 3600,
+                 max_bytes=512 * 1024 * 1024, memory_entries=64):
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()  # run_query may be called from several threads
+        self.hits = {"memory": 0, "disk": 0, "miss": 0}
+        try:
+            import pyarrow  # noqa: F401
+            self.disk_enabled = True
+            os.makedirs(cache_dir, exist_ok=True)
+        except ImportError:
+            print("[Cache] pyarrow not installed — on-disk tier disabled")
+            self.disk_enabled = False
+
+    # ---------------- WATERMARK ----------------
+    def watermark(self, conn, query):
+        tables = referenced_tables(query)
+        if not tables:
+            return None
+        rows = conn.execute(text(WATERMARK_SQL), {"tables": tables}).fetchall()
+        mark = [list(r) for r in rows]
+        if "flights" in tables:
+            mark.append(["flights.max_flight_id", conn.execute(text("SELECT max(flight_id) FROM flights")).scalar()])
+        return json.loads(json.dumps(mark, default=str))
+
+    # ---------------- LOOKUP ----------------
+    def get(self, query, runner):
+        """Return the cached DataFrame for `query`, or run `runner(conn, query)` and store it."""
+        key = hashlib.sha256(normalize_sql(query).encode()).hexdigest()
+        with self.engine.connect() as conn:
+            mark = self.watermark(conn, query)
+            now = time.time()
+
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry and entry[0] == mark and now - entry[1] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return entry[2].copy()
+
+            df = self._load(key, mark, now)
+            if df is not None:
+                self.hits["disk"] += 1
+            else:
+                self.hits["miss"] += 1
+                df = runner(conn, query)
+                self._store(key, query, mark, now, df)
+
+        self._remember(key, mark, now, df)
+        return df.copy()
+
+    def _remember(self, key, mark, created, df):
+        with self._lock:
+            self._memory[key] = (mark, created, df)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".parquet", base + ".json"
+
+    def _load(self, key, mark, now):
+        if not self.disk_enabled:
+            return None
+        data_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("watermark") != mark or now - meta.get("created", 0) >= self.ttl:
+            self._remove(key)
+            return None
+        import pandas as pd
+        try:
+            df = pd.read_parquet(data_path)
+        except Exception:
+            self._remove(key)
+            return None
+        os.utime(meta_path)  # LRU: mtime of the sidecar is the last access
+        return df
+
+    def _store(self, key, query, mark, created, df):
+        if not self.disk_enabled:
+            return
+        data_path, meta_path = self._paths(key)
+        try:
+            df.to_parquet(data_path + ".tmp", index=False)
+            os.replace(data_path + ".tmp", data_path)
+        except Exception as e:
+            print(f"[Cache] could not persist result: {e}")
+            return
+        with open(meta_path, "w") as f:
+            json.dump({"sql": normalize_sql(query), "watermark": mark, "created": created}, f)
+        self._evict()
+
+    def _remove(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            data_path, meta_path = self._paths(key)
+            try:
+                size = os.path.getsize(data_path)
+                accessed = os.path.getmtime(meta_path)
+                with open(meta_path) as f:
+                    created = json.load(f).get("created", 0)
+            except (OSError, ValueError):
+                self._remove(key)
+                continue
+            if now - created >= self.ttl:
+                self._remove(key)
+                continue
+            entries.append((accessed, key, size))
+            total += size
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def clear(self):
+        self._memory.clear()
+        if self.disk_enabled:
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
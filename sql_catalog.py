@@ -0,0 +1,85 @@
+import glob
+import os
+import re
+from collections import namedtuple
+
+import sqlparse
+import yaml
+
+# Every named SQL statement the project runs: queries.sql, the `queries`
+# dict in analytics.py and the `sql:` of the Superset dataset exports.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CatalogEntry = namedtuple("CatalogEntry", ["name", "source", "sql", "path"])
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+def clean_sql(sql):
+    return sql.replace("\r\n", "\n").strip().rstrip(";").strip()
+
+def is_select(sql):
+    for line in sql.splitlines():
+        stripped = line.strip().lower()
+        if stripped == "" or stripped.startswith("--"):
+            continue
+        return stripped.startswith("select") or stripped.startswith("with")
+    return False
+
+def queries_sql(path=os.path.join(BASE_DIR, "queries.sql")):
+    """SELECT statements of queries.sql, named after their leading comment."""
+    with open(path) as f:
+        statements = sqlparse.split(f.read())
+    entries = []
+    for i, statement in enumerate(statements, start=1):
+        if not is_select(statement):
+            continue
+        title = next((line.strip().lstrip("-").strip() for line in statement.splitlines()
+                      if line.strip().startswith("--")), f"query {i}")
+        entries.append(CatalogEntry(f"queries_sql:{i:02d}_{slugify(title)}", "queries.sql",
+                                    clean_sql(statement), path))
+    return entries
+
+def analytics_queries():
+    """The chart queries of analytics.py (importing it is cheap, see its CLI)."""
+    from analytics import queries
+    return [CatalogEntry(f"analytics:{name}", "analytics.py", clean_sql(sql),
+                         os.path.join(BASE_DIR, "analytics.py"))
+            for name, sql in queries.items()]
+
+def superset_datasets(root=BASE_DIR):
+    """Virtual (SQL) datasets of every `* - Apache Superset/datasets/*/*.yaml` export."""
+    entries = []
+    pattern = os.path.join(root, "* - Apache Superset", "datasets", "*", "*.yaml")
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            dataset = yaml.safe_load(f)
+        sql = (dataset or {}).get("sql")
+        if not sql or not is_select(clean_sql(sql)):
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        entries.append(CatalogEntry(f"superset:{slugify(stem)}", "superset", clean_sql(sql), path))
+    return entries
+
+SOURCES = {
+    "queries.sql": queries_sql,
+    "analytics": analytics_queries,
+    "superset": superset_datasets,
+}
+
+def collect(sources=tuple(SOURCES), only=None):
+    """
+    All catalog entries from `sources`. `only` keeps entries whose name
+    contains any of the given substrings.
+    """
+    entries = []
+    for source in sources:
+        entries.extend(SOURCES[source]())
+    if only:
+        entries = [e for e in entries if any(o in e.name for o in only)]
+    return entries
+
+if __name__ == "__main__":
+    for entry in collect():
+        print(f"{entry.name:<70} {os.path.relpath(entry.path, BASE_DIR)}")